@@ -2,7 +2,9 @@
 
 from .database import engine
 from .models import Base
+from .migrations import ensure_indexes
 
 print("Ensuring auth tables exist...")
 Base.metadata.create_all(bind=engine)
+ensure_indexes(engine, Base.metadata)
 print("Auth tables ready.")
@@ -1,38 +1,50 @@
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import EmailStr
 from . import models, schemas, utils
-from .database import SessionLocal, get_db
+from .database import get_async_db
 
 router = APIRouter()
 
+async def _user_by_email(db: AsyncSession, email: str):
+    result = await db.execute(select(models.User).where(models.User.email == email))
+    return result.scalars().first()
+
 @router.post("/signup")
-def signup(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def signup(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
     if user.password != user.confirm_password:
         raise HTTPException(status_code=400, detail="Passwords do not match")
 
-    existing_user = db.query(models.User).filter(models.User.email == user.email).first()
+    existing_user = await _user_by_email(db, user.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already exists")
 
     new_user = models.User(
         email=user.email,
         username=user.username,
-        hashed_password=utils.hash_password(user.password),
+        hashed_password=await utils.ahash_password(user.password),
         oauth_provider=""
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
     return {"msg": "User created successfully"}
 
-@router.post("/login")
-def login(user: schemas.UserLogin, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
-    if not db_user or not utils.verify_password(user.password, db_user.hashed_password):
+@router.post("/login", dependencies=[Depends(utils.login_concurrency_limit)])
+async def login(user: schemas.UserLogin, db: AsyncSession = Depends(get_async_db)):
+    db_user = await _user_by_email(db, user.email)
+    if not db_user:
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+
+    valid, new_hash = await utils.averify_and_update_password(user.password, db_user.hashed_password)
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid email or password")
+    if new_hash:
+        db_user.hashed_password = new_hash
+        await db.commit()
+        utils.invalidate_user(db_user.email)
 
-    token = utils.create_token({"sub": db_user.email})
+    token = utils.create_token({"sub": db_user.email, "uid": db_user.id})
 
     return {
         "access_token": token,
@@ -44,8 +56,8 @@ def login(user: schemas.UserLogin, db: Session = Depends(get_db)):
     }
 
 @router.post("/forgot-password")
-def forgot_password(email: EmailStr, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == email).first()
+async def forgot_password(email: EmailStr, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_async_db)):
+    user = await _user_by_email(db, email)
     if not user:
         raise HTTPException(status_code=404, detail="Email not registered")
 
@@ -59,7 +71,7 @@ def forgot_password(email: EmailStr, background_tasks: BackgroundTasks, db: Sess
     return {"msg": "Password reset email sent"}
 
 @router.post("/reset-password")
-def reset_password(data: schemas.ResetPassword, db: Session = Depends(get_db)):
+async def reset_password(data: schemas.ResetPassword, db: AsyncSession = Depends(get_async_db)):
     if data.new_password != data.confirm_password:
         raise HTTPException(status_code=400, detail="Passwords do not match")
 
@@ -67,10 +79,11 @@ def reset_password(data: schemas.ResetPassword, db: Session = Depends(get_db)):
     if not email:
         raise HTTPException(status_code=400, detail="Invalid or expired token")
 
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = await _user_by_email(db, email)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    user.hashed_password = utils.hash_password(data.new_password)
-    db.commit()
+    user.hashed_password = await utils.ahash_password(data.new_password)
+    await db.commit()
+    utils.invalidate_user(email)
     return {"msg": "Password reset successful"}
@@ -1,4 +1,6 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
 from dotenv import load_dotenv
@@ -7,10 +9,81 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
+# Drivers used for the async engine, keyed by backend name.
+ASYNC_DRIVERS = {
+    "postgresql": "asyncpg",
+    "sqlite": "aiosqlite",
+    "mysql": "aiomysql",
+}
+# libpq query parameters asyncpg understands, and its name for each.
+ASYNCPG_PARAMS = {"sslmode": "ssl", "connect_timeout": "timeout", "target_session_attrs": "target_session_attrs"}
+# Query parameters aiomysql takes under the same name.
+AIOMYSQL_PARAMS = {"charset"}
+
+
+def _pool_options(url) -> dict:
+    options = {"pool_pre_ping": True}
+    # SQLite's in-memory/singleton pools take no sizing arguments.
+    if url.get_backend_name() != "sqlite":
+        options.update(
+            pool_size=int(os.getenv("DB_POOL_SIZE", 10)),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", 20)),
+            pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", 30)),
+            pool_recycle=int(os.getenv("DB_POOL_RECYCLE", 1800)),
+        )
+    return options
+
+
+def _async_url(url):
+    """``url`` rewritten for its async driver, plus any connect_args that driver needs.
+
+    Query parameters the async driver would misread are translated or
+    rejected; ``ASYNC_DATABASE_URL`` overrides the derived URL entirely.
+    """
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise RuntimeError(f"No async driver for {backend} databases; set ASYNC_DATABASE_URL explicitly.")
+    url = url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+    connect_args, unsupported = {}, []
+    if backend == "postgresql":
+        for name, value in url.query.items():
+            if name in ASYNCPG_PARAMS:
+                connect_args[ASYNCPG_PARAMS[name]] = float(value) if name == "connect_timeout" else value
+            elif name == "application_name":
+                connect_args["server_settings"] = {"application_name": value}
+            else:
+                unsupported.append(name)
+        url = url.set(query={})
+    elif backend == "mysql":
+        unsupported = [name for name in url.query if name not in AIOMYSQL_PARAMS]
+    # SQLite parameters mean the same to pysqlite and aiosqlite.
+
+    if unsupported:
+        raise RuntimeError(
+            f"DATABASE_URL parameters not supported by {ASYNC_DRIVERS[backend]}: {', '.join(sorted(unsupported))}; "
+            "set ASYNC_DATABASE_URL explicitly."
+        )
+    return url, connect_args
+
+
+_url = make_url(DATABASE_URL.replace("postgres://", "postgresql://", 1))
+
+engine = create_engine(_url, **_pool_options(_url))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+if os.getenv("ASYNC_DATABASE_URL"):
+    _async, _connect_args = make_url(os.getenv("ASYNC_DATABASE_URL")), {}
+else:
+    _async, _connect_args = _async_url(_url)
+
+async_engine = create_async_engine(_async, connect_args=_connect_args, **_pool_options(_async))
+# expire_on_commit=False: handlers read attributes after commit without
+# triggering implicit (and, under asyncio, illegal) lazy loads.
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession,
+                                       autoflush=False, expire_on_commit=False)
+
 
 # Dependency to get DB session
 def get_db():
@@ -18,4 +91,9 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,127 @@
+"""Encryption of stored provider API keys.
+
+``FERNET_SECRET`` holds one or more comma-separated Fernet keys. The first
+one encrypts; all of them decrypt, so a key is rotated by prepending a new
+one, running ``python -m auth.keys rotate`` and then dropping the old key.
+"""
+import base64
+import hashlib
+import logging
+import os
+import sys
+
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from sqlalchemy import func, select
+
+from .cache import TTLCache
+from .database import SessionLocal
+from .models import ApiKey, Pipeline
+
+logger = logging.getLogger("auth.keys")
+
+
+def _load_fernet() -> MultiFernet:
+    secrets = [s.strip() for s in os.getenv("FERNET_SECRET", "").split(",") if s.strip()]
+    if not secrets:
+        secret_key = os.getenv("SECRET_KEY")
+        if secret_key:
+            # Stable across workers and restarts, unlike a generated key.
+            logger.warning("[keys] FERNET_SECRET not set, deriving the encryption key from SECRET_KEY")
+            secrets = [base64.urlsafe_b64encode(hashlib.sha256(secret_key.encode()).digest()).decode()]
+        else:
+            logger.warning("[keys] FERNET_SECRET and SECRET_KEY not set, stored API keys will not survive a restart")
+            secrets = [Fernet.generate_key().decode()]
+    return MultiFernet([Fernet(s.encode()) for s in secrets])
+
+
+fernet = _load_fernet()
+
+# Decrypted provider keys by (user_id, provider), and session -> user lookups.
+provider_key_cache = TTLCache(
+    maxsize=int(os.getenv("PROVIDER_KEY_CACHE_SIZE", 1024)),
+    ttl=float(os.getenv("PROVIDER_KEY_CACHE_TTL_SECONDS", 60)),
+)
+_session_users = TTLCache(maxsize=4096, ttl=300)
+
+
+def encrypt_api_key(plain_key: str) -> str:
+    return fernet.encrypt(plain_key.encode()).decode()
+
+
+def decrypt_api_key(encrypted_key: str) -> str:
+    return fernet.decrypt(encrypted_key.encode()).decode()
+
+
+def invalidate_provider_key(user_id: int, provider: str) -> None:
+    provider_key_cache.pop((user_id, provider.lower()))
+
+
+def get_provider_key(user_id: int, provider: str):
+    """Most recently stored key of ``user_id`` for ``provider``, decrypted; ``None`` if there is none."""
+    cache_key = (user_id, provider.lower())
+    cached = provider_key_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    with SessionLocal() as db:
+        encrypted = db.execute(
+            select(ApiKey.key)
+            .where(ApiKey.user_id == user_id, func.lower(ApiKey.provider) == provider.lower())
+            .order_by(ApiKey.id.desc())
+            .limit(1)
+        ).scalar()
+    if encrypted is None:
+        return None
+
+    try:
+        plain = decrypt_api_key(encrypted)
+    except InvalidToken:
+        logger.error(f"[keys] Stored {provider} key of user {user_id} cannot be decrypted with FERNET_SECRET")
+        return None
+    provider_key_cache.set(cache_key, plain)
+    return plain
+
+
+def get_session_provider_key(session_id: str, provider: str):
+    """Stored ``provider`` key of the user owning the pipeline with ``session_id``."""
+    if not provider:
+        return None
+    user_id = _session_users.get(session_id)
+    if user_id is None:
+        with SessionLocal() as db:
+            user_id = db.execute(
+                select(Pipeline.user_id).where(Pipeline.session_id == session_id).limit(1)
+            ).scalar()
+        if user_id is None:
+            return None
+        _session_users.set(session_id, user_id)
+    return get_provider_key(user_id, provider)
+
+
+def reencrypt_all(batch_size: int = 500) -> int:
+    """Re-encrypt every stored key with the primary Fernet key; returns the number of rows rotated."""
+    rotated, last_id = 0, 0
+    while True:
+        with SessionLocal() as db:
+            rows = db.execute(
+                select(ApiKey).where(ApiKey.id > last_id).order_by(ApiKey.id).limit(batch_size)
+            ).scalars().all()
+            if not rows:
+                break
+            for row in rows:
+                try:
+                    row.key = fernet.rotate(row.key.encode()).decode()
+                    rotated += 1
+                except InvalidToken:
+                    logger.error(f"[keys] API key {row.id} cannot be decrypted with any configured key")
+            last_id = rows[-1].id
+            db.commit()
+    provider_key_cache.clear()
+    return rotated
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rotate"]:
+        sys.exit("usage: python -m auth.keys rotate")
+    logging.basicConfig(level=logging.INFO)
+    print(f"Re-encrypted {reencrypt_all()} API keys.")
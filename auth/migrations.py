@@ -0,0 +1,21 @@
+import logging
+
+from sqlalchemy.exc import SQLAlchemyError
+
+logger = logging.getLogger("auth.migrations")
+
+
+def ensure_indexes(engine, metadata) -> None:
+    """Create indexes declared on models that pre-date them.
+
+    ``create_all`` only creates indexes together with new tables, so tables
+    from earlier deployments get their indexes here. Existing indexes are
+    skipped; an index that cannot be built (e.g. a unique index over
+    duplicate rows) is logged and left for manual cleanup.
+    """
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except SQLAlchemyError as exc:
+                logger.error(f"[migrations] Could not create index {index.name}: {exc}")
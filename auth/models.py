@@ -6,7 +6,7 @@ from sqlalchemy import Column, String, DateTime, ForeignKey
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
 from datetime import datetime
 
 class User(Base):
@@ -35,6 +35,13 @@ class Pipeline(Base):
     session_id = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Agent names are unique per user; also serves the name lookup in create_pipeline.
+        Index("uq_pipelines_user_name", "user_id", "name", unique=True),
+        # Keyset pagination of a user's pipelines, newest first.
+        Index("ix_pipelines_user_created", "user_id", "created_at", "id"),
+    )
+
 class ApiKey(Base):
     __tablename__ = "api_keys"
     id = Column(Integer, primary_key=True, index=True)
@@ -42,3 +49,7 @@ class ApiKey(Base):
     provider = Column(String)
     key = Column(String)  # Encrypted
     created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_api_keys_user_id", "user_id", "id"),
+    )
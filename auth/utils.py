@@ -1,17 +1,22 @@
+import ipaddress
 import os
 import smtplib
+import threading
 from datetime import datetime, timedelta
 from email.mime.text import MIMEText
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 
-from .database import get_db
+from common import passwords
+from .cache import TTLCache
+from .database import AsyncSessionLocal, get_async_db
 from .models import User
-from cryptography.fernet import Fernet
+from .keys import encrypt_api_key, decrypt_api_key  # noqa: F401  (re-exported)
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
@@ -20,15 +25,75 @@ EMAIL_SENDER = os.getenv("EMAIL_SENDER")
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
 FRONTEND_RESET_URL = os.getenv("FRONTEND_RESET_URL", "http://localhost/index.html")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+LOGIN_MAX_CONCURRENCY_PER_IP = int(os.getenv("LOGIN_MAX_CONCURRENCY_PER_IP", 10))
+# Peers whose X-Forwarded-For is believed, e.g. the reverse proxy in front of the API.
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(p.strip(), strict=False)
+    for p in os.getenv("TRUSTED_PROXIES", "127.0.0.1,::1").split(",") if p.strip()
+]
 
 oauth2_scheme = HTTPBearer()
 
+# Users resolved from a token subject; short-lived so other workers' profile
+# changes show up quickly, and invalidated locally on profile/password updates.
+user_cache = TTLCache(
+    maxsize=int(os.getenv("USER_CACHE_SIZE", 1024)),
+    ttl=float(os.getenv("USER_CACHE_TTL_SECONDS", 30)),
+)
+
+# bcrypt runs on a dedicated process pool (see common.passwords) so hashing
+# never competes with request handling for this process's CPU.
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return passwords.hash_password(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return passwords.verify_and_update(plain_password, hashed_password)[0]
+
+verify_and_update_password = passwords.verify_and_update
+ahash_password = passwords.ahash_password
+averify_and_update_password = passwords.averify_and_update
+
+_login_slots = {}
+_login_slots_lock = threading.Lock()
+
+def _trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXIES)
+
+def client_ip(request: Request) -> str:
+    """Address of the client, following ``X-Forwarded-For`` back through trusted proxies only."""
+    address = request.client.host if request.client else "unknown"
+    if not _trusted_proxy(address):
+        return address
+    hops = [h.strip() for h in request.headers.get("x-forwarded-for", "").split(",") if h.strip()]
+    # Entries left of the first untrusted hop could have been forged by the client.
+    for hop in reversed(hops):
+        address = hop
+        if not _trusted_proxy(hop):
+            break
+    return address
+
+async def login_concurrency_limit(request: Request):
+    """Allow at most ``LOGIN_MAX_CONCURRENCY_PER_IP`` in-flight logins per client address."""
+    ip = client_ip(request)
+    with _login_slots_lock:
+        if _login_slots.get(ip, 0) >= LOGIN_MAX_CONCURRENCY_PER_IP:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many concurrent login attempts.",
+                headers={"Retry-After": "1"},
+            )
+        _login_slots[ip] = _login_slots.get(ip, 0) + 1
+    try:
+        yield
+    finally:
+        with _login_slots_lock:
+            _login_slots[ip] -= 1
+            if not _login_slots[ip]:
+                del _login_slots[ip]
 
 def create_token(data: dict) -> str:
     to_encode = data.copy()
@@ -70,34 +135,57 @@ Note: This link will expire in 15 minutes."""
     except Exception as e:
         raise RuntimeError(f"Failed to send email: {str(e)}")
 
-def get_current_user(
-    token: HTTPAuthorizationCredentials = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials.",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+async def get_token_claims(token: HTTPAuthorizationCredentials = Depends(oauth2_scheme)) -> dict:
+    """Verified JWT payload; no database access."""
     try:
         payload = jwt.decode(token.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if not email:
-            raise credentials_exception
     except JWTError:
-        raise credentials_exception
+        raise _credentials_exception()
+    if not payload.get("sub"):
+        raise _credentials_exception()
+    return payload
+
+def _snapshot(user: User) -> User:
+    """Detached copy of ``user`` that can be cached and merged into any session."""
+    columns = {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+    copy = User(**columns)
+    make_transient_to_detached(copy)
+    return copy
+
+def invalidate_user(email: str) -> None:
+    user_cache.pop(email)
+
+async def get_current_user(
+    claims: dict = Depends(get_token_claims),
+    db: AsyncSession = Depends(get_async_db)
+) -> User:
+    email = claims["sub"]
+    cached = user_cache.get(email)
+    if cached is not None:
+        return await db.merge(cached, load=False)
 
-    user = db.query(User).filter(User.email == email).first()
+    user = (await db.execute(select(User).where(User.email == email))).scalars().first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    user_cache.set(email, _snapshot(user))
     return user
 
-
-FERNET_SECRET = os.getenv("FERNET_SECRET", Fernet.generate_key().decode())
-fernet = Fernet(FERNET_SECRET.encode())
-
-def encrypt_api_key(plain_key: str) -> str:
-    return fernet.encrypt(plain_key.encode()).decode()
-
-def decrypt_api_key(encrypted_key: str) -> str:
-    return fernet.decrypt(encrypted_key.encode()).decode()
+async def get_current_user_id(claims: dict = Depends(get_token_claims)) -> int:
+    """User id for endpoints that need nothing else; read from the ``uid`` claim when present."""
+    user_id = claims.get("uid")
+    if user_id is not None:
+        return int(user_id)
+
+    # Tokens issued before the claim existed.
+    cached = user_cache.get(claims["sub"])
+    if cached is not None:
+        return cached.id
+    async with AsyncSessionLocal() as db:
+        return (await get_current_user(claims, db)).id
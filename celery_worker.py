@@ -1,17 +1,21 @@
+import os
 from celery import Celery
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
 
 # Create a unified Celery app
 celery_app = Celery(
     "wednes_ai",
-    broker="redis://localhost:6379/0",  # Or read from .env
-    backend="redis://localhost:6379/0"
+    broker=BROKER_URL,
+    backend=os.getenv("CELERY_RESULT_BACKEND", BROKER_URL),
+    include=[
+        "rag_agent_builder.backend.workers.tasks",
+        "sql_agent_builder.backend.workers.tasks",
+    ],
 )
 
-# Auto-discover tasks from both pipelines
-celery_app.autodiscover_tasks([
-    "rag_agent_builder.backend.workers.tasks",
-    "sql_agent_builder.backend.workers.tasks"
-])
-
 if __name__ == "__main__":
     celery_app.worker_main()
@@ -0,0 +1,36 @@
+"""Credentials of a generated agent, kept out of its code and downloads.
+
+Templates read credentials from the environment. A build writes them to
+the agent's ``.env``, which previews load and downloads leave out, next to
+a ``.env.example`` that has the same settings but blank credentials and
+ships in the download instead.
+"""
+import os
+
+# Config fields holding credentials, at any depth; config.json leaves them out.
+SECRET_FIELDS = {"api_key", "llm_key", "password", "db_password", "uri", "db_uri", "pg_uri", "mysql_uri"}
+
+EXAMPLE_HEADER = "# Copy to .env and fill in the credentials.\n"
+
+
+def _line(name: str, value) -> str:
+    return f"{name}={'' if value is None else value}\n"
+
+
+def write_env(out_dir: str, settings: dict, secrets: dict):
+    """Write ``.env`` with ``settings`` and ``secrets``, and ``.env.example`` with blank secrets."""
+    with open(os.path.join(out_dir, ".env"), "w") as fh:
+        fh.writelines(_line(k, v) for k, v in {**secrets, **settings}.items())
+    with open(os.path.join(out_dir, ".env.example"), "w") as fh:
+        fh.write(EXAMPLE_HEADER)
+        fh.writelines(_line(k, None) for k in secrets)
+        fh.writelines(_line(k, v) for k, v in settings.items())
+
+
+def public_config(config):
+    """``config`` without its credentials."""
+    if isinstance(config, dict):
+        return {k: public_config(v) for k, v in config.items() if k not in SECRET_FIELDS}
+    if isinstance(config, list):
+        return [public_config(v) for v in config]
+    return config
@@ -0,0 +1,271 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+import zlib
+from collections import Counter
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import FileResponse
+
+from .paths import data_path, listdir
+
+CHUNK_SIZE = 1024 * 1024
+ARCHIVE_COMPRESSLEVEL = int(os.getenv("ARCHIVE_COMPRESSLEVEL", 6))
+ARCHIVE_CACHE_DIR = os.getenv("ARCHIVE_CACHE_DIR") or data_path("archive_cache")
+ARCHIVE_CACHE_MAX_BYTES = int(os.getenv("ARCHIVE_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+
+# Uploaded datasets; left out of a download with ``include_data=false``.
+DATA_EXTENSIONS = {".csv", ".tsv", ".xlsx", ".xls", ".pdf", ".parquet", ".db", ".sqlite"}
+# Deflating these again costs CPU and saves nothing.
+COMPRESSED_EXTENSIONS = {".zip", ".xlsx", ".docx", ".png", ".jpg", ".jpeg", ".gif", ".webp", ".gz"}
+SKIP_DIRS = {"__pycache__", ".git", "sections"}
+# Build internals and secrets never leave the server: the section manifest,
+# preview output, upload leftovers and the agent's credentials. Agents ship
+# their .env.example instead (see common/agent_env.py).
+SKIP_FILES = {".env", "preview.log"}
+SKIP_SUFFIXES = (".upload", ".link", ".tmp")
+
+
+def is_skipped(name: str) -> bool:
+    return name in SKIP_FILES or name.endswith(SKIP_SUFFIXES)
+
+
+def is_data_file(name: str) -> bool:
+    stem, ext = os.path.splitext(name.lower())
+    return ext in DATA_EXTENSIONS or stem == "data"
+
+
+def archive_manifest(folder: str, include_data: bool = True):
+    """Files to archive as ``(relpath, stat)`` and the build hash over them.
+
+    Only ``stat`` is needed, so the hash is known before a byte is zipped
+    and an unchanged build is answered from the cache or with 304.
+    """
+    files = []
+    for dirpath, dirnames, filenames in os.walk(folder):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS)
+        for name in sorted(filenames):
+            if is_skipped(name) or (not include_data and is_data_file(name)):
+                continue
+            path = os.path.join(dirpath, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((os.path.relpath(path, folder), st))
+
+    digest = hashlib.sha256(f"data={include_data}\n".encode())
+    for rel, st in files:
+        digest.update(f"{rel}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+    return files, digest.hexdigest()[:32]
+
+
+class ArchiveCache:
+    """Zip archives of builds, keyed by build hash, assembled from cached entries.
+
+    Every file is compressed once into ``entries/`` under a key of its inode,
+    size and mtime; an archive is then just those compressed streams copied
+    behind fresh headers. Rebuilding after only ``main.py`` changed
+    recompresses ``main.py`` alone, and datasets hardlinked from the blob
+    store share one compressed entry across sessions. Least recently used
+    files are evicted once the cache exceeds ``max_bytes``, except archives
+    still being sent: ``acquire`` pins one until its ``release``.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = ARCHIVE_CACHE_MAX_BYTES,
+                 compresslevel: int = ARCHIVE_COMPRESSLEVEL):
+        self.directory = directory
+        self.entries_dir = os.path.join(directory, "entries")
+        self.max_bytes = max_bytes
+        self.compresslevel = compresslevel
+        self._lock = threading.Lock()
+        self._in_use = Counter()
+
+    def _archive_path(self, build_hash: str) -> str:
+        return os.path.join(self.directory, f"{build_hash}.zip")
+
+    def _entry(self, path: str, rel: str, st) -> dict:
+        """Compressed copy of ``path``: ``{"data", "crc", "file_size", "compress_size", "compress_type"}``."""
+        compress_type = zipfile.ZIP_STORED if os.path.splitext(rel)[1].lower() in COMPRESSED_EXTENSIONS \
+            else zipfile.ZIP_DEFLATED
+        key = hashlib.sha256(
+            f"{st.st_dev}:{st.st_ino}:{st.st_size}:{st.st_mtime_ns}:{compress_type}:{self.compresslevel}".encode()
+        ).hexdigest()
+        data_path = os.path.join(self.entries_dir, f"{key}.bin")
+        meta_path = os.path.join(self.entries_dir, f"{key}.json")
+        try:
+            with open(meta_path, "r") as fh:
+                meta = json.load(fh)
+            os.utime(data_path)
+            os.utime(meta_path)
+            return {**meta, "data": data_path}
+        except (FileNotFoundError, ValueError):
+            pass
+
+        crc, compress_size = 0, 0
+        compressor = zlib.compressobj(self.compresslevel, zlib.DEFLATED, -15) \
+            if compress_type == zipfile.ZIP_DEFLATED else None
+        os.makedirs(self.entries_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.entries_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as dst, open(path, "rb") as src:
+            for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                crc = zlib.crc32(chunk, crc)
+                out = compressor.compress(chunk) if compressor else chunk
+                dst.write(out)
+                compress_size += len(out)
+            if compressor:
+                out = compressor.flush()
+                dst.write(out)
+                compress_size += len(out)
+        os.replace(tmp_path, data_path)
+
+        meta = {"crc": crc, "file_size": st.st_size, "compress_size": compress_size,
+                "compress_type": compress_type}
+        fd, tmp_path = tempfile.mkstemp(dir=self.entries_dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as fh:
+            json.dump(meta, fh)
+        os.replace(tmp_path, meta_path)
+        return {**meta, "data": data_path}
+
+    def acquire(self, folder: str, files, build_hash: str) -> str:
+        """Path of the archive of ``files`` in ``folder``, assembled on a miss.
+
+        The archive is kept from eviction until ``release`` is called with it.
+        """
+        archive_path = self._archive_path(build_hash)
+        with self._lock:
+            if os.path.exists(archive_path):
+                os.utime(archive_path)
+                self._in_use[archive_path] += 1
+                return archive_path
+
+        os.makedirs(self.entries_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fp, zipfile.ZipFile(fp, "w") as zf:
+                for rel, st in files:
+                    path = os.path.join(folder, rel)
+                    for attempt in range(2):
+                        try:
+                            self._append_raw(zf, fp, path, rel, self._entry(path, rel, st))
+                            break
+                        except FileNotFoundError:
+                            # The source is gone, or its entry was evicted meanwhile: compress again.
+                            if not os.path.exists(path):
+                                break
+                            if attempt:
+                                raise
+            with self._lock:
+                os.replace(tmp_path, archive_path)
+                self._in_use[archive_path] += 1
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        self._evict()
+        return archive_path
+
+    def release(self, archive_path: str):
+        with self._lock:
+            self._in_use[archive_path] -= 1
+            if self._in_use[archive_path] <= 0:
+                del self._in_use[archive_path]
+
+    @staticmethod
+    def _append_raw(zf: zipfile.ZipFile, fp, path: str, rel: str, entry: dict):
+        # zipfile cannot add already compressed data, so write the local header
+        # and data ourselves and register the member for the central directory.
+        info = zipfile.ZipInfo.from_file(path, rel)
+        info.compress_type = entry["compress_type"]
+        info.CRC = entry["crc"]
+        info.file_size = entry["file_size"]
+        info.compress_size = entry["compress_size"]
+        zip64 = max(info.file_size, info.compress_size) > zipfile.ZIP64_LIMIT
+        with open(entry["data"], "rb") as src:
+            info.header_offset = fp.tell()
+            fp.write(info.FileHeader(zip64))
+            shutil.copyfileobj(src, fp, CHUNK_SIZE)
+        zf.filelist.append(info)
+        zf.NameToInfo[info.filename] = info
+        zf.start_dir = fp.tell()
+
+    def _evict(self):
+        with self._lock:
+            files = []
+            for directory in (self.directory, self.entries_dir):
+                for name in listdir(directory):
+                    path = os.path.join(directory, name)
+                    if name.endswith(".tmp") or path in self._in_use or not os.path.isfile(path):
+                        continue
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    files.append((st.st_mtime, st.st_size, path))
+
+            total = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def shared_archive_cache() -> ArchiveCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ArchiveCache(ARCHIVE_CACHE_DIR)
+        return _cache
+
+
+class _ArchiveResponse(FileResponse):
+    """``FileResponse`` that releases its cached archive once sent, or once the client is gone."""
+
+    def __init__(self, cache: ArchiveCache, path: str, **kwargs):
+        super().__init__(path, **kwargs)
+        self._cache = cache
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._cache.release(self.path)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def zip_download(request: Request, folder: str, filename: str, include_data: bool = True) -> Response:
+    """Serve ``folder`` as ``filename`` from the archive cache, or 304 if the client's copy is current."""
+    if not os.path.isdir(folder):
+        raise HTTPException(status_code=404, detail="Folder not found.")
+    files, build_hash = archive_manifest(folder, include_data)
+    if not files:
+        raise HTTPException(status_code=404, detail="Nothing has been built for this session yet.")
+
+    etag = f'"{build_hash}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    cache = shared_archive_cache()
+    archive_path = cache.acquire(folder, files, build_hash)
+    # FileResponse answers Range requests, so interrupted downloads resume.
+    return _ArchiveResponse(cache, archive_path, filename=filename, media_type="application/zip", headers=headers)
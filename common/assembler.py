@@ -0,0 +1,138 @@
+import ast
+
+
+class AssemblyError(Exception):
+    """The components cannot be stitched into the skeleton without an LLM."""
+
+
+def _top_level_names(tree: ast.Module) -> dict:
+    """Names bound at module level, mapped to their defining node."""
+    names = {}
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names[node.name] = node
+        elif isinstance(node, ast.Assign):
+            for target in node.targets:
+                for n in ast.walk(target):
+                    if isinstance(n, ast.Name):
+                        names[n.id] = node
+        elif isinstance(node, (ast.AnnAssign, ast.AugAssign)) and isinstance(node.target, ast.Name):
+            names[node.target.id] = node
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                names[(alias.asname or alias.name).split(".")[0]] = node
+    return names
+
+
+def _accepts(fn, call: ast.Call) -> bool:
+    """Whether ``call`` matches the signature of function definition ``fn``."""
+    a = fn.args
+    positional = a.posonlyargs + a.args
+    if len(call.args) > len(positional) and not a.vararg:
+        return False
+    if any(isinstance(arg, ast.Starred) for arg in call.args) or any(kw.arg is None for kw in call.keywords):
+        return True
+
+    keywords = {kw.arg for kw in call.keywords}
+    named = {p.arg for p in positional[len(call.args):]} | {p.arg for p in a.kwonlyargs}
+    if not a.kwarg and not keywords <= named:
+        return False
+
+    required = positional[len(call.args):len(positional) - len(a.defaults)]
+    required += [p for p, default in zip(a.kwonlyargs, a.kw_defaults) if default is None]
+    return all(p.arg in keywords for p in required)
+
+
+def _segment(lines: list, node) -> str:
+    start = min([d.lineno for d in getattr(node, "decorator_list", [])] + [node.lineno])
+    return "\n".join(lines[start - 1:node.end_lineno])
+
+
+def assemble(skeleton: str, components: list, local_modules: set) -> str:
+    """Inline ``components`` into ``skeleton`` in place of its local-module imports.
+
+    ``components`` is an ordered list of Python sources. Imports are hoisted
+    and de-duplicated; every name the skeleton imports from ``local_modules``
+    must be defined by a component and every call the skeleton makes to such
+    a function must match its signature, otherwise ``AssemblyError`` is raised.
+    """
+    try:
+        skel_tree = ast.parse(skeleton)
+        comp_trees = [(src, ast.parse(src)) for src in components]
+    except SyntaxError as exc:
+        raise AssemblyError(f"Unparseable code: {exc}") from exc
+
+    defined = {}
+    for _, tree in comp_trees:
+        defined.update(_top_level_names(tree))
+
+    def _is_local(node) -> bool:
+        return isinstance(node, ast.ImportFrom) and node.level == 0 and node.module in local_modules
+
+    imports, seen = [], set()
+
+    def _hoist(node):
+        text = ast.unparse(node)
+        if text not in seen:
+            seen.add(text)
+            imports.append(text)
+
+    components_body = []
+    for src, tree in comp_trees:
+        lines = src.splitlines()
+        for node in tree.body:
+            if _is_local(node):
+                continue
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                _hoist(node)
+            else:
+                components_body.append(_segment(lines, node))
+
+    # Resolve the skeleton's local imports against the inlined components.
+    # Skeleton statements ahead of its first local import (e.g. load_dotenv())
+    # run before the component code, the rest after it.
+    aliases, prelude, body = {}, [], []
+    local_seen = False
+    skel_lines = skeleton.splitlines()
+    for node in skel_tree.body:
+        if _is_local(node):
+            local_imports = [node]
+        elif isinstance(node, ast.Try) and node.body and all(_is_local(n) for n in node.body):
+            local_imports = node.body
+        else:
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                _hoist(node)
+            else:
+                (body if local_seen else prelude).append(_segment(skel_lines, node))
+            continue
+        local_seen = True
+
+        missing = [a.name for imp in local_imports for a in imp.names if a.name not in defined]
+        if missing and not isinstance(node, ast.Try):
+            raise AssemblyError(f"Components do not define: {', '.join(missing)}")
+        if missing:
+            # Keep the skeleton's fallback, e.g. a default SYSTEM_PROMPT.
+            body.extend(_segment(skel_lines, n) for n in node.handlers[0].body)
+            continue
+        for imp in local_imports:
+            for a in imp.names:
+                if a.asname and a.asname != a.name:
+                    aliases[a.asname] = a.name
+                    body.append(f"{a.asname} = {a.name}")
+
+    for call in ast.walk(skel_tree):
+        if isinstance(call, ast.Call) and isinstance(call.func, ast.Name):
+            name = aliases.get(call.func.id, call.func.id)
+            fn = defined.get(name)
+            if isinstance(fn, (ast.FunctionDef, ast.AsyncFunctionDef)) and not _accepts(fn, call):
+                raise AssemblyError(f"Call to {call.func.id}() does not match its component signature")
+
+    future = [i for i in imports if i.startswith("from __future__")]
+    others = [i for i in imports if not i.startswith("from __future__")]
+    code = "\n".join(future + others) + "\n\n" + "\n\n".join(prelude + components_body + body) + "\n"
+
+    try:
+        ast.parse(code)
+    except SyntaxError as exc:
+        raise AssemblyError(f"Assembled code does not parse: {exc}") from exc
+    return code
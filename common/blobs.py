@@ -0,0 +1,147 @@
+import errno
+import logging
+import os
+import shutil
+import stat
+import sys
+import threading
+import time
+
+from .paths import data_path
+
+logger = logging.getLogger("blobs")
+
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR") or data_path("blob_store")
+BLOB_GC_INTERVAL_SECONDS = int(os.getenv("BLOB_GC_INTERVAL_SECONDS", 3600))
+
+
+class BlobStore:
+    """Content-addressed (sha256) store for uploaded datasets.
+
+    Sessions reference a blob through a hardlink, so the filesystem's link
+    count is the reference count: a blob whose only link is the store's own
+    is garbage. Blobs are made read-only because every link shares the same
+    inode. When hardlinks are not possible (another filesystem) the file is
+    copied instead.
+    """
+
+    def __init__(self, directory: str, gc_grace: int = 600):
+        self.directory = directory
+        self.gc_grace = gc_grace
+        self._last_gc = 0.0
+        self._lock = threading.Lock()
+
+    def path(self, sha256: str) -> str:
+        return os.path.join(self.directory, sha256[:2], sha256)
+
+    def has(self, sha256: str) -> bool:
+        return os.path.exists(self.path(sha256))
+
+    def refcount(self, sha256: str) -> int:
+        try:
+            return os.stat(self.path(sha256)).st_nlink - 1
+        except FileNotFoundError:
+            return 0
+
+    def linked_in(self, sha256: str, directory: str) -> bool:
+        """Whether a file directly in ``directory`` is a link to blob ``sha256``."""
+        try:
+            blob = os.stat(self.path(sha256))
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return False
+        for name in names:
+            try:
+                st = os.stat(os.path.join(directory, name))
+            except FileNotFoundError:
+                continue
+            if (st.st_ino, st.st_dev) == (blob.st_ino, blob.st_dev):
+                return True
+        return False
+
+    def ingest(self, tmp_path: str, sha256: str) -> str:
+        """Adopt the finished file at ``tmp_path`` as blob ``sha256``; duplicates are discarded."""
+        blob = self.path(sha256)
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        if os.path.exists(blob):
+            os.remove(tmp_path)
+            # Refresh the mtime so a concurrent gc treats the blob as in use.
+            os.utime(blob)
+        else:
+            os.chmod(tmp_path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+            os.replace(tmp_path, blob)
+        self._maybe_gc()
+        return blob
+
+    def link(self, sha256: str, dest_path: str) -> str:
+        """Point ``dest_path`` at blob ``sha256``, atomically replacing any existing file."""
+        blob = self.path(sha256)
+        dest_dir = os.path.dirname(os.path.abspath(dest_path))
+        os.makedirs(dest_dir, exist_ok=True)
+        tmp_path = os.path.join(dest_dir, f".{os.path.basename(dest_path)}.{os.getpid()}.{threading.get_ident()}.link")
+        try:
+            os.link(blob, tmp_path)
+        except OSError as exc:
+            if exc.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+                raise
+            shutil.copyfile(blob, tmp_path)
+        os.replace(tmp_path, dest_path)
+        return dest_path
+
+    def gc(self) -> int:
+        """Remove blobs no session links to; returns the number of bytes freed."""
+        freed, cutoff = 0, time.time() - self.gc_grace
+        for dirpath, _, filenames in os.walk(self.directory):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                    # Skip fresh blobs: an upload may be about to link them.
+                    if st.st_nlink == 1 and st.st_mtime < cutoff:
+                        os.remove(path)
+                        freed += st.st_size
+                except FileNotFoundError:
+                    continue
+        if freed:
+            logger.info(f"[blobs] gc freed {freed} bytes")
+        return freed
+
+    def _maybe_gc(self):
+        """Start a gc in the background once ``BLOB_GC_INTERVAL_SECONDS`` have passed."""
+        with self._lock:
+            if time.time() - self._last_gc < BLOB_GC_INTERVAL_SECONDS:
+                return
+            self._last_gc = time.time()
+
+        def run():
+            try:
+                self.gc()
+            except Exception as exc:
+                logger.error(f"[blobs] gc failed: {exc}")
+
+        threading.Thread(target=run, name="blob-gc", daemon=True).start()
+
+    def adopt(self, tmp_path: str, sha256: str, dest_path: str) -> str:
+        """``ingest`` then ``link``: the usual last step of an upload."""
+        self.ingest(tmp_path, sha256)
+        return self.link(sha256, dest_path)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def shared_blob_store() -> BlobStore:
+    """One store for every builder, so a dataset is kept once however many sessions use it."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = BlobStore(BLOB_STORE_DIR)
+        return _store
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["gc"]:
+        sys.exit("usage: python -m common.blobs gc")
+    logging.basicConfig(level=logging.INFO)
+    print(f"Freed {shared_blob_store().gc()} bytes.")
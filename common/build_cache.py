@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+from .paths import listdir
+
+
+class BuildCache:
+    """Content-addressed store for LLM-generated ``main.py`` files.
+
+    Entries are keyed by a hash of everything that went into the LLM request,
+    so an unchanged agent rebuilds from disk without another round trip.
+    Builds can bypass the cache (and overwrite the entry) or evict it, so a
+    bad generation does not stick. Least recently used entries are evicted once the cache exceeds
+    ``max_bytes``.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 64 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(**parts) -> str:
+        blob = json.dumps(parts, sort_keys=True, ensure_ascii=False).encode()
+        return hashlib.sha256(blob).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.py")
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path, "r") as fh:
+                code = fh.read()
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # Bump mtime so eviction treats the entry as recently used.
+        os.utime(path)
+        with self._lock:
+            self.hits += 1
+        return code
+
+    def put(self, key: str, code: str):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as fh:
+            fh.write(code)
+        os.replace(tmp_path, self._path(key))
+        self._evict()
+
+    def delete(self, key: str) -> bool:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def clear(self) -> int:
+        """Drop every entry; returns how many there were."""
+        removed = 0
+        for name in listdir(self.directory):
+            if name.endswith(".py"):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+    def _evict(self):
+        entries = []
+        for name in listdir(self.directory):
+            if not name.endswith(".py"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "entries": sum(1 for n in listdir(self.directory) if n.endswith(".py")),
+            "max_bytes": self.max_bytes,
+        }
@@ -0,0 +1,133 @@
+import logging
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from .session_store import FileSessionStore, create_session_store
+
+logger = logging.getLogger("build_jobs")
+
+BUILD_JOB_TTL_SECONDS = int(os.getenv("BUILD_JOB_TTL_SECONDS", 24 * 3600))
+BUILD_JOB_PURGE_INTERVAL_SECONDS = int(os.getenv("BUILD_JOB_PURGE_INTERVAL_SECONDS", 600))
+FINISHED_STATUSES = ("succeeded", "failed")
+
+# In-process fallback used when no Celery broker is configured.
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("BUILD_WORKERS", 4)),
+    thread_name_prefix="build",
+)
+
+
+def broker_configured() -> bool:
+    return bool(os.getenv("CELERY_BROKER_URL"))
+
+
+class BuildJobStore:
+    """Persistent build job records (status, progress, result).
+
+    Records go through the same backend as the wizard sessions, so with the
+    sql or redis backend any API worker can report on a job that a Celery
+    worker or another process is running. With a Celery broker the file
+    backend is refused, since remote workers cannot see local files.
+    Finished jobs are deleted ``ttl`` seconds after they finish, swept at
+    most every ``purge_interval`` seconds as new jobs are created.
+    """
+
+    def __init__(self, namespace: str, directory: str, ttl: int = BUILD_JOB_TTL_SECONDS,
+                 purge_interval: int = BUILD_JOB_PURGE_INTERVAL_SECONDS):
+        self._store = create_session_store(f"{namespace}_jobs", directory)
+        if broker_configured() and isinstance(self._store, FileSessionStore):
+            raise RuntimeError(
+                "CELERY_BROKER_URL is set but SESSION_BACKEND=file: Celery workers cannot see this "
+                "process's job and session files. Set SESSION_BACKEND to sql or redis."
+            )
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._next_purge = 0.0
+        self._purge_lock = threading.Lock()
+
+    def create(self, session_id: str, **extra) -> str:
+        job_id = uuid4().hex
+        self._store.update_many(job_id, {
+            "job_id": job_id,
+            "session_id": session_id,
+            "status": "queued",
+            "stage": "queued",
+            "progress": 0,
+            "result": None,
+            "error": None,
+            "created_at": datetime.utcnow().isoformat(),
+            **extra,
+        })
+        self._maybe_purge()
+        return job_id
+
+    def get(self, job_id: str) -> dict:
+        return self._store.get(job_id)
+
+    def update(self, job_id: str, **values):
+        self._store.update_many(job_id, values)
+
+    def run(self, job_id: str, build_fn):
+        """Execute ``build_fn(session_id, progress=..., **options)`` and record the outcome."""
+        job = self.get(job_id)
+        if not job:
+            logger.error(f"[build_jobs] Unknown job {job_id}")
+            return None
+
+        def progress(stage: str, percent: int):
+            self.update(job_id, stage=stage, progress=percent)
+
+        self.update(job_id, status="running", stage="starting", progress=5,
+                    started_at=datetime.utcnow().isoformat())
+        try:
+            result = build_fn(job["session_id"], progress=progress, **(job.get("options") or {}))
+        except Exception as exc:
+            logger.error(f"[build_jobs] Job {job_id} failed: {exc}")
+            traceback.print_exc()
+            self.update(job_id, status="failed", stage="failed", error=str(exc),
+                        finished_at=datetime.utcnow().isoformat())
+            return None
+
+        self.update(job_id, status="succeeded", stage="done", progress=100, result=result,
+                    finished_at=datetime.utcnow().isoformat())
+        return result
+
+    def purge_finished(self) -> int:
+        """Delete jobs that finished more than ``ttl`` seconds ago; returns how many."""
+        cutoff = (datetime.utcnow() - timedelta(seconds=self.ttl)).isoformat()
+
+        def expired(job: dict) -> bool:
+            finished_at = job.get("finished_at") or job.get("created_at") or ""
+            return job.get("status") in FINISHED_STATUSES and finished_at < cutoff
+
+        removed = self._store.purge(expired, older_than=time.time() - self.ttl)
+        if removed:
+            logger.info(f"[build_jobs] Purged {removed} finished jobs")
+        return removed
+
+    def _maybe_purge(self):
+        with self._purge_lock:
+            if time.monotonic() < self._next_purge:
+                return
+            self._next_purge = time.monotonic() + self.purge_interval
+
+        def purge():
+            try:
+                self.purge_finished()
+            except Exception as exc:
+                logger.error(f"[build_jobs] Purge failed: {exc}")
+
+        # Off the request path; a sweep can touch every job record.
+        threading.Thread(target=purge, name="build-jobs-purge", daemon=True).start()
+
+    def submit(self, job_id: str, build_fn, task=None):
+        """Queue the job on Celery when a broker is configured, else run it in-process."""
+        if task is not None and broker_configured():
+            task.delay(job_id)
+        else:
+            _executor.submit(self.run, job_id, build_fn)
@@ -0,0 +1,225 @@
+import asyncio
+import json
+import logging
+import os
+import queue
+import random
+import threading
+
+import httpx
+
+logger = logging.getLogger("llm_client")
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+_END = object()
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class LLMClient:
+    """Pooled client for OpenAI-compatible chat completion endpoints.
+
+    All requests run on one ``httpx.AsyncClient`` owned by a background event
+    loop, so connections (and HTTP/2 sessions) are reused across builds no
+    matter which thread or event loop issues them. ``achat``/``astream`` can be
+    awaited from any event loop; ``chat``/``stream`` are blocking wrappers for
+    sync callers such as the build job threads.
+    """
+
+    def __init__(self, url: str, api_key: str, max_concurrency: int = 8,
+                 max_retries: int = 4, timeout: float = 60.0, http2: bool = None):
+        self.url = url
+        self.api_key = api_key
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.http2 = _http2_available() if http2 is None else http2
+
+        self._loop = None
+        self._client = None
+        self._semaphore = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._loop is not None:
+            return
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def _run():
+                asyncio.set_event_loop(loop)
+                self._client = httpx.AsyncClient(
+                    http2=self.http2,
+                    timeout=httpx.Timeout(self.timeout, connect=10.0),
+                    limits=httpx.Limits(
+                        max_connections=self.max_concurrency * 2,
+                        max_keepalive_connections=self.max_concurrency,
+                        keepalive_expiry=60.0,
+                    ),
+                )
+                self._semaphore = asyncio.Semaphore(self.max_concurrency)
+                ready.set()
+                loop.run_forever()
+
+            threading.Thread(target=_run, name="llm-client", daemon=True).start()
+            ready.wait()
+            self._loop = loop
+
+    def _headers(self, api_key: str = None) -> dict:
+        return {
+            "Authorization": f"Bearer {api_key or self.api_key}",
+            "Content-Type": "application/json",
+        }
+
+    @staticmethod
+    def _backoff(attempt: int, response: httpx.Response = None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), 30.0)
+            except ValueError:
+                pass
+        return min(2 ** attempt, 30) + random.uniform(0, 0.5)
+
+    async def _send(self, payload: dict, api_key: str = None, stream: bool = False) -> httpx.Response:
+        """POST with retries on 429/5xx and transport errors; caller closes the response."""
+        attempt = 0
+        while True:
+            try:
+                request = self._client.build_request("POST", self.url, json=payload, headers=self._headers(api_key))
+                response = await self._client.send(request, stream=stream)
+            except httpx.TransportError as exc:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"[llm_client] {exc!r}, retrying in {delay:.1f}s")
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    if response.is_error:
+                        await response.aread()
+                        await response.aclose()
+                        response.raise_for_status()
+                    return response
+                delay = self._backoff(attempt, response)
+                await response.aclose()
+                logger.warning(f"[llm_client] HTTP {response.status_code}, retrying in {delay:.1f}s")
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def _chat(self, messages: list, model: str, api_key: str = None) -> str:
+        async with self._semaphore:
+            response = await self._send({"model": model, "messages": messages}, api_key)
+            return response.json()["choices"][0]["message"]["content"]
+
+    async def _stream(self, messages: list, model: str, api_key: str = None):
+        async with self._semaphore:
+            payload = {"model": model, "messages": messages, "stream": True}
+            response = await self._send(payload, api_key, stream=True)
+            try:
+                finished = False
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        finished = True
+                        break
+                    choice = json.loads(data)["choices"][0]
+                    delta = choice.get("delta", {}).get("content")
+                    if delta:
+                        yield delta
+                    finished = finished or bool(choice.get("finish_reason"))
+                if not finished:
+                    # A cut connection must not pass for a complete answer.
+                    raise httpx.RemoteProtocolError("LLM stream ended before completion")
+            finally:
+                await response.aclose()
+
+    def _pump(self, messages: list, model: str, api_key: str, put):
+        """Run ``_stream`` on the client loop, handing each delta (then an end marker) to ``put``."""
+        async def _run():
+            try:
+                async for delta in self._stream(messages, model, api_key):
+                    put(delta)
+            except Exception as exc:
+                put(exc)
+            finally:
+                put(_END)
+
+        self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(_run(), self._loop)
+
+    async def achat(self, messages: list, model: str, api_key: str = None) -> str:
+        self._ensure_started()
+        future = asyncio.run_coroutine_threadsafe(self._chat(messages, model, api_key), self._loop)
+        return await asyncio.wrap_future(future)
+
+    async def astream(self, messages: list, model: str, api_key: str = None):
+        caller = asyncio.get_running_loop()
+        items = asyncio.Queue()
+        future = self._pump(messages, model, api_key,
+                            lambda item: caller.call_soon_threadsafe(items.put_nowait, item))
+        try:
+            while True:
+                item = await items.get()
+                if item is _END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            future.cancel()
+
+    def chat(self, messages: list, model: str, api_key: str = None) -> str:
+        self._ensure_started()
+        future = asyncio.run_coroutine_threadsafe(self._chat(messages, model, api_key), self._loop)
+        return future.result()
+
+    def stream(self, messages: list, model: str, api_key: str = None):
+        items = queue.Queue()
+        future = self._pump(messages, model, api_key, items.put)
+        try:
+            while True:
+                item = items.get()
+                if item is _END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            future.cancel()
+
+    def close(self):
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop = None
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def shared_llm_client(url: str, api_key: str) -> LLMClient:
+    """One pooled client per endpoint, shared by every builder in the process."""
+    with _clients_lock:
+        client = _clients.get(url)
+        if client is None:
+            client = _clients[url] = LLMClient(
+                url,
+                api_key,
+                max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", 8)),
+                max_retries=int(os.getenv("LLM_MAX_RETRIES", 4)),
+                timeout=float(os.getenv("LLM_TIMEOUT", 60)),
+            )
+        return client
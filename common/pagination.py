@@ -0,0 +1,37 @@
+import base64
+import json
+
+from fastapi import HTTPException
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(*values) -> str:
+    """Opaque cursor for the sort key of the last row on a page."""
+    raw = json.dumps(values, default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    """Values encoded in ``cursor``; 400 unless it holds exactly ``size`` of them."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        values = None
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def set_next_cursor(response, rows: list, limit: int, key) -> list:
+    """Trim the look-ahead row off ``rows`` and expose the next cursor in ``X-Next-Cursor``.
+
+    ``rows`` is fetched with ``limit + 1``; the extra row only signals that
+    another page exists.
+    """
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(*key(rows[-1]))
+    return rows
@@ -0,0 +1,22 @@
+"""Where the API keeps its runtime state.
+
+Sessions, build jobs and caches, uploads, blobs, archives and images all
+live under ``DATA_DIR`` (``var/`` in the checkout by default, which git
+ignores). Directories are created on first write, not at import.
+"""
+import os
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.abspath(os.getenv("DATA_DIR") or os.path.join(ROOT_DIR, "var"))
+
+
+def data_path(*parts: str) -> str:
+    return os.path.join(DATA_DIR, *parts)
+
+
+def listdir(directory: str) -> list:
+    """``os.listdir``, empty for a directory nothing has been written to yet."""
+    try:
+        return os.listdir(directory)
+    except FileNotFoundError:
+        return []
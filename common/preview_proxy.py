@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import os
+
+import httpx
+import websockets
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import RedirectResponse, StreamingResponse
+from starlette.background import BackgroundTask
+
+from .previews import PREVIEW_UPSTREAM_HOST, shared_preview_supervisor
+
+logger = logging.getLogger("preview_proxy")
+
+PREVIEW_PROXY_MAX_CONNECTIONS = int(os.getenv("PREVIEW_PROXY_MAX_CONNECTIONS", 100))
+
+# Hop-by-hop headers (RFC 9110 7.6.1) apply to one connection and are not forwarded.
+HOP_BY_HOP = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade",
+}
+# The websocket client writes its own handshake; without an Origin the
+# upstream's same-origin check does not apply.
+WS_SKIP = HOP_BY_HOP | {
+    "host", "origin", "sec-websocket-key", "sec-websocket-version",
+    "sec-websocket-extensions", "sec-websocket-protocol",
+}
+
+router = APIRouter()
+previews = shared_preview_supervisor()
+_client = None
+
+
+def _http_client() -> httpx.AsyncClient:
+    """One pooled client for every preview upstream, created on first use."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=PREVIEW_PROXY_MAX_CONNECTIONS,
+                                max_keepalive_connections=PREVIEW_PROXY_MAX_CONNECTIONS // 4),
+            # Streamed responses (event streams, long polls) may idle indefinitely.
+            timeout=httpx.Timeout(10.0, read=None),
+            follow_redirects=False,
+        )
+    return _client
+
+
+def _upstream_path(session_id: str, path: str) -> tuple:
+    """Upstream ``(port, path)`` of a proxied request; 404 without a running preview."""
+    target = previews.proxy_target(session_id)
+    if target is None:
+        raise HTTPException(status_code=404, detail="No running preview for this session.")
+    port, base_path, strip_prefix = target
+    return port, f"/{path}" if strip_prefix else f"{base_path}/{path}"
+
+
+def _forwarded_headers(request_headers, client_host: str, scheme: str, skip) -> list:
+    headers = [(k, v) for k, v in request_headers.items() if k.lower() not in skip]
+    host = request_headers.get("host", "")
+    prior = request_headers.get("x-forwarded-for")
+    headers += [
+        ("x-forwarded-for", f"{prior}, {client_host}" if prior else client_host),
+        ("x-forwarded-proto", scheme),
+        ("x-forwarded-host", host),
+    ]
+    return headers
+
+
+@router.api_route("/previews/{session_id}/app", methods=["GET", "HEAD"], include_in_schema=False)
+def preview_root(session_id: str, request: Request):
+    # Relative asset URLs only resolve under the trailing slash.
+    query = f"?{request.url.query}" if request.url.query else ""
+    return RedirectResponse(url=f"{request.url.path}/{query}", status_code=307)
+
+
+@router.api_route("/previews/{session_id}/app/{path:path}",
+                  methods=["GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
+                  include_in_schema=False)
+async def proxy_http(session_id: str, path: str, request: Request):
+    port, upstream_path = _upstream_path(session_id, path)
+    headers = _forwarded_headers(request.headers, request.client.host if request.client else "",
+                                 request.url.scheme, HOP_BY_HOP)
+    client = _http_client()
+    upstream = client.build_request(
+        request.method,
+        httpx.URL(scheme="http", host=PREVIEW_UPSTREAM_HOST, port=port,
+                  path=upstream_path, query=request.url.query.encode()),
+        headers=headers,
+        content=request.stream() if request.method not in ("GET", "HEAD") else None,
+    )
+    try:
+        response = await client.send(upstream, stream=True)
+    except httpx.RequestError as exc:
+        raise HTTPException(status_code=502, detail=f"Preview is not reachable: {exc.__class__.__name__}")
+
+    return StreamingResponse(
+        response.aiter_raw(),
+        status_code=response.status_code,
+        headers={k: v for k, v in response.headers.items() if k.lower() not in HOP_BY_HOP},
+        background=BackgroundTask(response.aclose),
+    )
+
+
+@router.websocket("/previews/{session_id}/app/{path:path}")
+async def proxy_websocket(websocket: WebSocket, session_id: str, path: str):
+    try:
+        port, upstream_path = _upstream_path(session_id, path)
+    except HTTPException:
+        await websocket.close(code=4404)
+        return
+
+    query = websocket.url.query
+    uri = f"ws://{PREVIEW_UPSTREAM_HOST}:{port}{upstream_path}" + (f"?{query}" if query else "")
+    subprotocols = [p.strip() for p in websocket.headers.get("sec-websocket-protocol", "").split(",") if p.strip()]
+    headers = _forwarded_headers(websocket.headers, websocket.client.host if websocket.client else "",
+                                 "wss" if websocket.url.scheme == "wss" else "ws", WS_SKIP)
+    try:
+        upstream = await websockets.connect(
+            uri, subprotocols=subprotocols or None, additional_headers=headers,
+            compression=None, max_size=None, proxy=None, user_agent_header=None,
+        )
+    except (OSError, asyncio.TimeoutError, websockets.InvalidHandshake) as exc:
+        logger.warning(f"[preview_proxy] websocket to session {session_id} failed: {exc}")
+        await websocket.close(code=1011)
+        return
+
+    await websocket.accept(subprotocol=upstream.subprotocol)
+
+    async def client_to_upstream():
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes") is not None:
+                await upstream.send(message["bytes"])
+            elif message.get("text") is not None:
+                await upstream.send(message["text"])
+
+    async def upstream_to_client():
+        async for message in upstream:
+            if isinstance(message, bytes):
+                await websocket.send_bytes(message)
+            else:
+                await websocket.send_text(message)
+            previews.proxy_target(session_id)
+
+    tasks = [asyncio.create_task(client_to_upstream()), asyncio.create_task(upstream_to_client())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await upstream.close()
+        try:
+            await websocket.close()
+        except (RuntimeError, WebSocketDisconnect):
+            pass
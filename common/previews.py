@@ -0,0 +1,285 @@
+import atexit
+import logging
+import os
+import signal
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+
+from fastapi import HTTPException
+
+from .readiness import PREVIEW_READY_TIMEOUT_SECONDS, wait_until_ready
+from .runner import PREVIEW_WARM_RUNNER, WarmRunner
+
+logger = logging.getLogger("previews")
+
+
+def _port_range(spec: str) -> range:
+    low, _, high = spec.partition("-")
+    return range(int(low), int(high or low) + 1)
+
+
+PREVIEW_PORT_RANGE = _port_range(os.getenv("PREVIEW_PORT_RANGE", "8501-8600"))
+PREVIEW_MAX_CONCURRENCY = int(os.getenv("PREVIEW_MAX_CONCURRENCY", 8))
+PREVIEW_IDLE_TIMEOUT_SECONDS = int(os.getenv("PREVIEW_IDLE_TIMEOUT_SECONDS", 1800))
+PREVIEW_HOST = os.getenv("PREVIEW_HOST", "localhost")
+# Where the reverse proxy reaches the preview processes.
+PREVIEW_UPSTREAM_HOST = os.getenv("PREVIEW_UPSTREAM_HOST", "127.0.0.1")
+
+
+def preview_base_path(session_id: str) -> str:
+    """Path the unified app proxies the preview of ``session_id`` under."""
+    return f"/previews/{session_id}/app"
+
+
+def preview_command(ui: str, port: int, base_path: str):
+    """Command line and extra environment that run ``main.py`` with ``ui`` on ``port``.
+
+    Both frameworks are told they live under ``base_path`` so the URLs they
+    generate go through the proxy.
+    """
+    if ui == "streamlit":
+        return ["streamlit", "run", "main.py", "--server.port", str(port), "--server.headless", "true",
+                "--server.baseUrlPath", base_path.strip("/")], {}
+    if ui == "gradio":
+        # launch() reads both; the templates leave server_port to the env for this.
+        return ["python", "main.py"], {"GRADIO_SERVER_PORT": str(port), "GRADIO_ROOT_PATH": base_path}
+    raise HTTPException(status_code=400, detail="Unknown UI framework in main.py")
+
+
+class PreviewSupervisor:
+    """Preview processes of every builder on this node, one per session.
+
+    Each preview gets a free port from ``ports`` and runs in its own process
+    group so stopping it also stops whatever it spawned. A reaper thread
+    collects exited processes and stops previews nobody has looked at for
+    ``idle_timeout`` seconds.
+    """
+
+    def __init__(self, ports: range = PREVIEW_PORT_RANGE, max_concurrency: int = PREVIEW_MAX_CONCURRENCY,
+                 idle_timeout: int = PREVIEW_IDLE_TIMEOUT_SECONDS, reap_interval: int = 30,
+                 runner: WarmRunner = None):
+        self.runner = runner
+        self.ports = ports
+        self.max_concurrency = max_concurrency
+        self.idle_timeout = idle_timeout
+        self.reap_interval = reap_interval
+        self._previews = {}
+        # Ports reserved by previews being launched, by session.
+        self._starting = {}
+        self._lock = threading.RLock()
+        self._reaper = None
+
+    def _port_free(self, port: int) -> bool:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            try:
+                sock.bind(("0.0.0.0", port))
+            except OSError:
+                return False
+        return True
+
+    def _allocate_port(self) -> int:
+        taken = {p["port"] for p in self._previews.values()} | set(self._starting.values())
+        for port in self.ports:
+            if port not in taken and self._port_free(port):
+                return port
+        raise HTTPException(status_code=503, detail="No free preview port.")
+
+    def start(self, session_id: str, builder: str, agent_path: str, ui: str) -> dict:
+        """(Re)start the preview of ``session_id``; 429 once ``max_concurrency`` previews run."""
+        self.stop(session_id)
+        with self._lock:
+            self._reap()
+            if session_id in self._starting:
+                raise HTTPException(status_code=409, detail="This preview is already starting.")
+            if len(self._previews) + len(self._starting) >= self.max_concurrency:
+                raise HTTPException(status_code=429, detail="Too many previews running, stop one first.")
+            port = self._allocate_port()
+            self._starting[session_id] = port
+
+        # Launched outside the lock: a spawn talks to the runner or forks.
+        try:
+            base_path = preview_base_path(session_id)
+            cmd, extra_env = preview_command(ui, port, base_path)
+
+            log_path = os.path.join(agent_path, "preview.log")
+            with open(log_path, "wb") as log_file:
+                log_file.write(f"[{ui.upper()} Preview] Session: {session_id}\n\n".encode())
+
+            # Forked from the warm runner when there is one, so the heavy
+            # imports are already done; a cold start otherwise.
+            process = self.runner.spawn(cmd, agent_path, extra_env, log_path) if self.runner else None
+            if process is None:
+                with open(log_path, "ab") as log_file:
+                    try:
+                        process = subprocess.Popen(
+                            cmd,
+                            cwd=agent_path,
+                            stdout=log_file,
+                            stderr=subprocess.STDOUT,
+                            env={**os.environ, **extra_env},
+                            start_new_session=True,
+                        )
+                    except OSError as e:
+                        raise HTTPException(status_code=500, detail=f"Failed to launch preview: {e}")
+        finally:
+            with self._lock:
+                del self._starting[session_id]
+
+        now = time.time()
+        with self._lock:
+            self._previews[session_id] = {
+                "session_id": session_id,
+                "builder": builder,
+                "ui": ui,
+                "port": port,
+                "base_path": base_path,
+                "process": process,
+                "log_file": log_path,
+                "started_at": now,
+                "last_seen": now,
+                "ready": False,
+            }
+            self._ensure_reaper()
+        logger.info(f"[previews] {builder} session {session_id} on port {port} (pid {process.pid})")
+        return self.status(session_id)
+
+    def _describe(self, preview: dict) -> dict:
+        code = preview["process"].poll()
+        return {
+            "session_id": preview["session_id"],
+            "builder": preview["builder"],
+            "ui": preview["ui"],
+            "status": "running" if code is None else "exited",
+            "ready": code is None and preview["ready"],
+            "exit_code": code,
+            "pid": preview["process"].pid,
+            "port": preview["port"],
+            "preview_url": f"{preview['base_path']}/",
+            "direct_url": f"http://{PREVIEW_HOST}:{preview['port']}/",
+            "log_file": preview["log_file"],
+            "uptime_seconds": int(time.time() - preview["started_at"]),
+            "idle_seconds": int(time.time() - preview["last_seen"]),
+        }
+
+    def status(self, session_id: str, builder: str = None) -> dict:
+        """State of the preview of ``session_id``; counts as activity for the idle timeout."""
+        with self._lock:
+            preview = self._previews.get(session_id)
+            if preview is None or (builder is not None and preview["builder"] != builder):
+                raise HTTPException(status_code=404, detail="No preview for this session.")
+            preview["last_seen"] = time.time()
+            return self._describe(preview)
+
+    async def wait_ready(self, session_id: str, deadline: float = PREVIEW_READY_TIMEOUT_SECONDS) -> bool:
+        """Wait until the preview of ``session_id`` answers HTTP; false if it exits or ``deadline`` passes."""
+        with self._lock:
+            preview = self._previews.get(session_id)
+        if preview is None:
+            return False
+        path = "/" if preview["ui"] == "gradio" else f"{preview['base_path']}/"
+        ready = await wait_until_ready(preview["port"], process=preview["process"], deadline=deadline, path=path)
+        preview["ready"] = ready
+        return ready
+
+    def proxy_target(self, session_id: str):
+        """``(port, base_path, strip_prefix)`` of a running preview, or ``None``; counts as activity.
+
+        Streamlit serves under its base path itself, Gradio expects the
+        proxy to strip it.
+        """
+        with self._lock:
+            preview = self._previews.get(session_id)
+            if preview is None or preview["process"].poll() is not None:
+                return None
+            preview["last_seen"] = time.time()
+            return preview["port"], preview["base_path"], preview["ui"] == "gradio"
+
+    def list(self, builder: str = None) -> list:
+        with self._lock:
+            return [self._describe(p) for p in self._previews.values()
+                    if builder is None or p["builder"] == builder]
+
+    def stop(self, session_id: str, builder: str = None) -> bool:
+        with self._lock:
+            preview = self._previews.get(session_id)
+            if preview is None or (builder is not None and preview["builder"] != builder):
+                return False
+            del self._previews[session_id]
+        self._terminate(preview["process"])
+        logger.info(f"[previews] stopped session {session_id}")
+        return True
+
+    @staticmethod
+    def _terminate(process: subprocess.Popen, grace: float = 5.0):
+        if process.poll() is not None:
+            return
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+            process.wait(timeout=grace)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+        except ProcessLookupError:
+            process.wait()
+
+    def warm_up(self):
+        """Start the warm runner now; its imports take a while, better not on the first preview."""
+        if self.runner is not None:
+            self.runner.start()
+
+    def stop_all(self):
+        with self._lock:
+            session_ids = list(self._previews)
+        for session_id in session_ids:
+            self.stop(session_id)
+
+    def _reap(self):
+        """Forget exited previews (``poll`` also reaps the zombie) and stop idle ones."""
+        now = time.time()
+        with self._lock:
+            exited = [sid for sid, p in self._previews.items() if p["process"].poll() is not None]
+            for sid in exited:
+                logger.info(f"[previews] session {sid} exited with {self._previews[sid]['process'].returncode}")
+                del self._previews[sid]
+            idle = [sid for sid, p in self._previews.items() if now - p["last_seen"] > self.idle_timeout]
+        for sid in idle:
+            logger.info(f"[previews] stopping idle session {sid}")
+            self.stop(sid)
+
+    def _ensure_reaper(self):
+        if self._reaper is not None and self._reaper.is_alive():
+            return
+
+        def loop():
+            while True:
+                time.sleep(self.reap_interval)
+                try:
+                    self._reap()
+                except Exception as exc:
+                    logger.error(f"[previews] reaper failed: {exc}")
+
+        self._reaper = threading.Thread(target=loop, name="preview-reaper", daemon=True)
+        self._reaper.start()
+
+
+_supervisor = None
+_supervisor_lock = threading.Lock()
+
+
+def shared_preview_supervisor() -> PreviewSupervisor:
+    """One supervisor per process, so the builders share the port range and the concurrency cap."""
+    global _supervisor
+    with _supervisor_lock:
+        if _supervisor is None:
+            runner = None
+            if PREVIEW_WARM_RUNNER:
+                # Started by warm_up() or the first preview, not on import.
+                runner = WarmRunner(os.getenv("PREVIEW_RUNNER_SOCKET") or
+                                    os.path.join(tempfile.gettempdir(), f"preview-runner-{os.getpid()}.sock"))
+                atexit.register(runner.stop)
+            _supervisor = PreviewSupervisor(runner=runner)
+            atexit.register(_supervisor.stop_all)
+        return _supervisor
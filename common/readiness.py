@@ -0,0 +1,44 @@
+import asyncio
+import os
+import time
+
+PREVIEW_READY_TIMEOUT_SECONDS = float(os.getenv("PREVIEW_READY_TIMEOUT_SECONDS", 30))
+
+
+async def probe_http(port: int, host: str = "127.0.0.1", path: str = "/", timeout: float = 2.0) -> bool:
+    """One non-blocking ``GET path``; true if something on ``port`` answers below 500."""
+    writer = None
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    finally:
+        if writer is not None:
+            writer.close()
+    parts = status_line.split()
+    return len(parts) >= 2 and parts[0].startswith(b"HTTP/") and parts[1].isdigit() and int(parts[1]) < 500
+
+
+async def wait_until_ready(port: int, process=None, host: str = "127.0.0.1", path: str = "/",
+                           deadline: float = PREVIEW_READY_TIMEOUT_SECONDS,
+                           initial_delay: float = 0.05, max_delay: float = 0.5) -> bool:
+    """Wait until ``port`` serves HTTP, probing with exponential backoff.
+
+    Returns as soon as a probe succeeds; false once ``deadline`` seconds pass
+    or ``process`` (a ``Popen``) exits first.
+    """
+    give_up = time.monotonic() + deadline
+    delay = initial_delay
+    while True:
+        if process is not None and process.poll() is not None:
+            return False
+        remaining = give_up - time.monotonic()
+        if remaining <= 0:
+            return False
+        if await probe_http(port, host, path, timeout=min(2.0, remaining)):
+            return True
+        await asyncio.sleep(min(delay, max(give_up - time.monotonic(), 0)))
+        delay = min(delay * 2, max_delay)
@@ -0,0 +1,252 @@
+import fcntl
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from uuid import uuid4
+
+from fastapi import APIRouter, Form, Header, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+
+from .paths import listdir
+from .uploads import sniff_mime
+
+RESUMABLE_MAX_BYTES = int(os.getenv("RESUMABLE_MAX_BYTES", 10 * 1024 ** 3))
+RESUMABLE_TTL_SECONDS = int(os.getenv("RESUMABLE_TTL_HOURS", 24)) * 3600
+
+
+class ResumableUploads:
+    """tus-style resumable uploads kept on disk until they are finalized.
+
+    Each upload is one ``<id>.part`` file that PATCH requests append to, so
+    its size is the authoritative offset and finalizing is a rename rather
+    than a re-assembly of chunks. ``<id>.json`` holds the declared length and
+    owner. An interrupted PATCH keeps whatever bytes arrived; the client asks
+    for the offset and resumes from there.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = RESUMABLE_MAX_BYTES,
+                 ttl: int = RESUMABLE_TTL_SECONDS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+    def _part(self, upload_id: str) -> str:
+        return os.path.join(self.directory, f"{upload_id}.part")
+
+    def _info_path(self, upload_id: str) -> str:
+        return os.path.join(self.directory, f"{upload_id}.json")
+
+    def create(self, session_id: str, filename: str, length: int) -> dict:
+        if length <= 0:
+            raise HTTPException(status_code=400, detail="Upload-Length must be positive.")
+        if length > self.max_bytes:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds the {self.max_bytes} byte limit.")
+        self.cleanup()
+
+        upload_id = uuid4().hex
+        info = {
+            "upload_id": upload_id,
+            "session_id": session_id,
+            "filename": filename,
+            "length": length,
+            "created_at": time.time(),
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        open(self._part(upload_id), "wb").close()
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as fh:
+            json.dump(info, fh)
+        os.replace(tmp_path, self._info_path(upload_id))
+        return {**info, "offset": 0}
+
+    def get(self, upload_id: str, session_id: str = None) -> dict:
+        """Upload info with its current ``offset``; 404 if unknown or owned by another session."""
+        if not re.fullmatch(r"[0-9a-f]{32}", upload_id):
+            raise HTTPException(status_code=404, detail="Upload not found")
+        try:
+            with open(self._info_path(upload_id), "r") as fh:
+                info = json.load(fh)
+            info["offset"] = os.path.getsize(self._part(upload_id))
+        except (FileNotFoundError, ValueError):
+            raise HTTPException(status_code=404, detail="Upload not found")
+        if session_id is not None and info["session_id"] != session_id:
+            raise HTTPException(status_code=404, detail="Upload not found")
+        return info
+
+    async def append(self, upload_id: str, offset: int, request: Request) -> int:
+        """Append the request body at ``offset``; returns the new offset."""
+        info = self.get(upload_id)
+        fh = open(self._part(upload_id), "ab")
+        try:
+            try:
+                # One writer per upload, across workers too.
+                fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise HTTPException(status_code=423, detail="Upload is being written by another request.")
+
+            current = os.fstat(fh.fileno()).st_size
+            if offset != current:
+                raise HTTPException(status_code=409, detail=f"Upload-Offset mismatch, expected {current}.",
+                                    headers={"Upload-Offset": str(current)})
+
+            async for chunk in request.stream():
+                if not chunk:
+                    continue
+                if current + len(chunk) > info["length"]:
+                    raise HTTPException(status_code=413, detail="Chunk exceeds the declared Upload-Length.")
+                await run_in_threadpool(fh.write, chunk)
+                current += len(chunk)
+            fh.flush()
+            return current
+        finally:
+            # Flushes whatever arrived before a disconnect, keeping it resumable.
+            fh.close()
+
+    def finalize(self, upload_id: str, dest_path: str, allowed_types=None, session_id: str = None,
+                 blobs=None) -> dict:
+        """Move a complete upload to ``dest_path`` (or into ``blobs``, linked from there) and return its metadata."""
+        info = self.get(upload_id, session_id)
+        if info["offset"] != info["length"]:
+            raise HTTPException(status_code=409, detail=f"Upload incomplete: {info['offset']} of {info['length']} bytes.",
+                                headers={"Upload-Offset": str(info["offset"])})
+
+        part = self._part(upload_id)
+        digest = hashlib.sha256()
+        with open(part, "rb") as fh:
+            mime = sniff_mime(fh.read(4096))
+            if allowed_types and mime not in allowed_types:
+                raise HTTPException(status_code=415, detail=f"Unsupported file content ({mime}).")
+            fh.seek(0)
+            for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+                digest.update(chunk)
+
+        if blobs is not None:
+            blobs.adopt(part, digest.hexdigest(), dest_path)
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+            os.replace(part, dest_path)
+        os.remove(self._info_path(upload_id))
+        return {"path": dest_path, "size": info["length"], "sha256": digest.hexdigest(), "mime": mime}
+
+    def delete(self, upload_id: str, session_id: str = None):
+        self.get(upload_id, session_id)
+        for path in (self._part(upload_id), self._info_path(upload_id)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def cleanup(self):
+        """Drop uploads not touched within ``ttl`` seconds."""
+        cutoff = time.time() - self.ttl
+        for name in listdir(self.directory):
+            upload_id, ext = os.path.splitext(name)
+            if ext != ".json":
+                continue
+            paths = [self._info_path(upload_id), self._part(upload_id)]
+            try:
+                last_activity = max(os.path.getmtime(p) for p in paths if os.path.exists(p))
+            except ValueError:
+                continue
+            if last_activity < cutoff:
+                for path in paths:
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+
+
+def resumable_router(store: ResumableUploads, prefix: str, target, complete, blobs=None) -> APIRouter:
+    """tus-style endpoints under ``prefix`` for uploads into a builder session.
+
+    ``target(session_id, filename)`` validates the session and returns
+    ``(dest_path, allowed_types)``; ``complete(session_id, meta)`` applies a
+    finalized file to the session and returns the response body. With a
+    ``BlobStore`` in ``blobs``, files are stored by hash and a create request
+    carrying the ``sha256`` of a file the session already holds completes
+    immediately without any data being sent. Blobs are shared by every
+    session, so a hash the session does not hold is uploaded like any other
+    file: knowing a hash must not give access to someone else's data.
+    """
+    router = APIRouter(prefix=prefix)
+
+    def _link_existing(sha256: str, length: int, dest_path: str, allowed_types):
+        if not blobs.linked_in(sha256, os.path.dirname(os.path.abspath(dest_path))):
+            return None
+        blob = blobs.path(sha256)
+        try:
+            with open(blob, "rb") as fh:
+                mime = sniff_mime(fh.read(4096))
+            size = os.path.getsize(blob)
+        except FileNotFoundError:
+            return None
+        if size != length:
+            return None
+        if allowed_types and mime not in allowed_types:
+            raise HTTPException(status_code=415, detail=f"Unsupported file content ({mime}).")
+        blobs.link(sha256, dest_path)
+        return {"path": dest_path, "size": size, "sha256": sha256, "mime": mime}
+
+    def _offset_headers(info: dict) -> dict:
+        return {
+            "Upload-Offset": str(info["offset"]),
+            "Upload-Length": str(info["length"]),
+            "Cache-Control": "no-store",
+        }
+
+    @router.post("", status_code=201)
+    def create_upload(
+        request: Request,
+        response: Response,
+        session_id: str = Form(...),
+        filename: str = Form(...),
+        upload_length: int = Header(..., alias="Upload-Length"),
+        sha256: str = Form(None),
+    ):
+        dest_path, allowed_types = target(session_id, filename)
+        if blobs is not None and sha256 and re.fullmatch(r"[0-9a-f]{64}", sha256.lower()):
+            meta = _link_existing(sha256.lower(), upload_length, dest_path, allowed_types)
+            if meta is not None:
+                response.status_code = 200
+                return {**complete(session_id, meta), "deduplicated": True, "sha256": meta["sha256"]}
+
+        info = store.create(session_id, filename, upload_length)
+        response.headers.update(_offset_headers(info))
+        response.headers["Location"] = f"{request.url.path}/{info['upload_id']}"
+        return info
+
+    @router.head("/{upload_id}")
+    def get_upload_offset(upload_id: str):
+        return Response(status_code=204, headers=_offset_headers(store.get(upload_id)))
+
+    @router.get("/{upload_id}")
+    def get_upload(upload_id: str):
+        info = store.get(upload_id)
+        return JSONResponse(content=info, headers=_offset_headers(info))
+
+    @router.patch("/{upload_id}", status_code=204)
+    async def append_upload_chunk(
+        upload_id: str,
+        request: Request,
+        upload_offset: int = Header(..., alias="Upload-Offset"),
+    ):
+        offset = await store.append(upload_id, upload_offset, request)
+        return Response(status_code=204, headers={"Upload-Offset": str(offset)})
+
+    @router.post("/{upload_id}/finalize")
+    def finalize_upload(upload_id: str, session_id: str = Form(...)):
+        info = store.get(upload_id, session_id)
+        dest_path, allowed_types = target(session_id, info["filename"])
+        meta = store.finalize(upload_id, dest_path, allowed_types, session_id, blobs=blobs)
+        return complete(session_id, meta)
+
+    @router.delete("/{upload_id}", status_code=204)
+    def delete_upload(upload_id: str, session_id: str = Form(...)):
+        store.delete(upload_id, session_id)
+        return Response(status_code=204)
+
+    return router
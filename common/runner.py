@@ -0,0 +1,275 @@
+"""Fork server for preview processes.
+
+``python -m common.runner <socket>`` imports the heavy modules generated
+agents share (streamlit, gradio, pandas, sentence-transformers, vector
+clients), then forks a child per preview request. The child inherits the
+imports, so a preview only pays for the agent's own start-up. The API
+talks to it through ``WarmRunner``: a spawn is one JSON line per
+connection in each direction, and a long-lived watch connection receives
+each child's exit code as it is reaped.
+"""
+import importlib
+import json
+import logging
+import os
+import runpy
+import socket
+import subprocess
+import sys
+import threading
+import time
+import traceback
+
+logger = logging.getLogger("runner")
+
+PREVIEW_WARM_RUNNER = os.getenv("PREVIEW_WARM_RUNNER", "1") not in ("0", "false", "no")
+PREVIEW_PRELOAD_MODULES = [m.strip() for m in os.getenv(
+    "PREVIEW_PRELOAD_MODULES",
+    "pandas,numpy,requests,dotenv,streamlit,streamlit.web.cli,gradio,sentence_transformers,"
+    "openai,qdrant_client,sqlalchemy,fitz",
+).split(",") if m.strip()]
+
+
+# --- fork server -------------------------------------------------------------
+
+def _run_argv(argv: list):
+    """Run a preview command line in this process, as the forked child."""
+    if argv[:2] == ["streamlit", "run"]:
+        from streamlit.web import cli
+        sys.argv = argv
+        cli.main()
+    elif argv[0] in ("python", "python3") and len(argv) > 1:
+        sys.argv = argv[1:]
+        runpy.run_path(argv[1], run_name="__main__")
+    else:
+        os.execvp(argv[0], argv)
+
+
+def _child(request: dict):
+    code = 1
+    try:
+        os.setsid()
+        os.chdir(request["cwd"])
+        os.environ.update(request.get("env") or {})
+        log_fd = os.open(request["log"], os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        null_fd = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(null_fd, 0)
+        os.dup2(log_fd, 1)
+        os.dup2(log_fd, 2)
+        sys.path.insert(0, request["cwd"])
+        _run_argv(request["argv"])
+        code = 0
+    except SystemExit as exc:
+        code = exc.code if isinstance(exc.code, int) else (0 if exc.code is None else 1)
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+
+
+def serve(socket_path: str):
+    for name in PREVIEW_PRELOAD_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception as exc:
+            print(f"[runner] preload {name} skipped: {exc}", file=sys.stderr)
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(16)
+    server.settimeout(0.2)
+    parent, watchers = os.getppid(), []
+    # Exits nobody was watching yet; sent to the next watcher that connects.
+    pending = {}
+
+    def notify(pid, code):
+        for watcher in list(watchers):
+            try:
+                watcher.sendall((json.dumps({"pid": pid, "returncode": code}) + "\n").encode())
+            except OSError:
+                watchers.remove(watcher)
+                watcher.close()
+        if not watchers:
+            pending[pid] = code
+
+    def reap():
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            notify(pid, os.waitstatus_to_exitcode(status))
+
+    while os.getppid() == parent:
+        reap()
+        try:
+            conn, _ = server.accept()
+        except socket.timeout:
+            continue
+        conn.settimeout(5.0)
+        with conn.makefile("r") as stream:
+            request = json.loads(stream.readline())
+        if request["op"] == "watch":
+            # Kept open: exits are pushed as they are reaped.
+            watchers.append(conn)
+            for pid, code in list(pending.items()):
+                del pending[pid]
+                notify(pid, code)
+            continue
+        with conn:
+            pid = os.fork()
+            if pid == 0:
+                server.close()
+                for watcher in watchers:
+                    watcher.close()
+                _child(request)
+            conn.sendall((json.dumps({"pid": pid}) + "\n").encode())
+    # The API process is gone; its previews are stopped by its own exit handler.
+    os.remove(socket_path)
+
+
+# --- client --------------------------------------------------------------------
+
+class _ExitWatch:
+    """Exit codes the runner pushes for its children, collected by a thread.
+
+    Once the runner is gone its children are orphans whose exit codes
+    nobody reports, so they count as exited as soon as their pid is free.
+    """
+
+    def __init__(self, socket_path: str):
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(10.0)
+        self._sock.connect(socket_path)
+        self._sock.sendall(b'{"op": "watch"}\n')
+        self._sock.settimeout(None)
+        self.exits = {}
+        self.closed = False
+        threading.Thread(target=self._read, name="runner-watch", daemon=True).start()
+
+    def _read(self):
+        try:
+            with self._sock, self._sock.makefile("r") as stream:
+                for line in stream:
+                    event = json.loads(line)
+                    self.exits[event["pid"]] = event["returncode"]
+        except (OSError, ValueError) as exc:
+            logger.warning(f"[runner] lost exit watch: {exc}")
+        finally:
+            self.closed = True
+
+    def returncode(self, pid: int):
+        code = self.exits.get(pid)
+        if code is None and self.closed:
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                return -1
+            except PermissionError:
+                pass
+        return code
+
+
+class RunnerProcess:
+    """``Popen``-like handle on a preview forked by the runner; ``poll`` does no I/O."""
+
+    def __init__(self, watch: _ExitWatch, pid: int):
+        self.watch = watch
+        self.pid = pid
+        self.returncode = None
+
+    def poll(self):
+        if self.returncode is None:
+            self.returncode = self.watch.returncode(self.pid)
+        return self.returncode
+
+    def wait(self, timeout: float = None):
+        give_up = None if timeout is None else time.monotonic() + timeout
+        while self.poll() is None:
+            if give_up is not None and time.monotonic() > give_up:
+                raise subprocess.TimeoutExpired(f"preview {self.pid}", timeout)
+            time.sleep(0.05)
+        return self.returncode
+
+
+class WarmRunner:
+    """Keeps one fork server alive and asks it for preview processes."""
+
+    def __init__(self, socket_path: str, start_timeout: float = 60.0):
+        self.socket_path = socket_path
+        self.start_timeout = start_timeout
+        self._process = None
+        self._watch = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._process is not None and self._process.poll() is None:
+                return
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            self._process = subprocess.Popen(
+                [sys.executable, "-m", "common.runner", self.socket_path],
+                stdin=subprocess.DEVNULL,
+            )
+            logger.info(f"[runner] fork server started (pid {self._process.pid})")
+
+    def stop(self):
+        with self._lock:
+            if self._process is not None and self._process.poll() is None:
+                self._process.terminate()
+                self._process.wait()
+            self._process = None
+            self._watch = None
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    def request(self, message: dict) -> dict:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(10.0)
+            sock.connect(self.socket_path)
+            with sock.makefile("rw") as stream:
+                stream.write(json.dumps(message) + "\n")
+                stream.flush()
+                return json.loads(stream.readline())
+
+    def _wait_ready(self) -> bool:
+        give_up = time.monotonic() + self.start_timeout
+        while time.monotonic() < give_up:
+            if self._process is None or self._process.poll() is not None:
+                return False
+            if os.path.exists(self.socket_path):
+                return True
+            time.sleep(0.05)
+        return False
+
+    def spawn(self, argv: list, cwd: str, env: dict, log_path: str):
+        """Fork ``argv`` from the warm server; ``None`` if it is not available."""
+        self.start()
+        if not self._wait_ready():
+            logger.warning("[runner] fork server not available, starting preview cold")
+            return None
+        try:
+            with self._lock:
+                # Watch before the first spawn so no exit goes unreported.
+                if self._watch is None or self._watch.closed:
+                    self._watch = _ExitWatch(self.socket_path)
+                watch = self._watch
+            reply = self.request({"op": "spawn", "argv": argv, "cwd": os.path.abspath(cwd),
+                                  "env": env, "log": os.path.abspath(log_path)})
+        except (OSError, ValueError) as exc:
+            logger.warning(f"[runner] spawn failed ({exc}), starting preview cold")
+            return None
+        return RunnerProcess(watch, reply["pid"])
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("usage: python -m common.runner <socket>")
+    serve(sys.argv[1])
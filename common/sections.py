@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+SECTION_RE = re.compile(r"# === ([\w\-/\.]+)\.j2 ===")
+
+
+class SectionManifest:
+    """Rendered component code of one session, one JSON file per section.
+
+    Re-rendering a section replaces only ``sections/<section>.json``; the
+    combined ``all.py`` is materialized from the manifest at build time, so
+    switching a variant never leaves a stale copy behind.
+    """
+
+    def __init__(self, session_dir: str):
+        self.session_dir = session_dir
+        self.directory = os.path.join(session_dir, "sections")
+
+    def _path(self, section: str) -> str:
+        return os.path.join(self.directory, f"{section.replace('/', '_')}.json")
+
+    def get(self, section: str):
+        try:
+            with open(self._path(section), "r") as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            return None
+
+    def put(self, section: str, variant: str, code: str) -> str:
+        digest = hashlib.sha256(code.encode()).hexdigest()
+        current = self.get(section)
+        if current and current["variant"] == variant and current["sha256"] == digest:
+            return digest
+
+        os.makedirs(self.directory, exist_ok=True)
+        entry = {"section": section, "variant": variant, "sha256": digest, "code": code}
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as fh:
+            json.dump(entry, fh)
+        os.replace(tmp_path, self._path(section))
+        return digest
+
+    def entries(self, order=()) -> list:
+        """All sections, those named in ``order`` first and the rest alphabetically."""
+        if not os.path.isdir(self.directory):
+            return []
+        found = {}
+        for fname in os.listdir(self.directory):
+            if fname.endswith(".json"):
+                with open(os.path.join(self.directory, fname), "r") as fh:
+                    entry = json.load(fh)
+                found[entry["section"]] = entry
+
+        rank = {name: i for i, name in enumerate(order)}
+        return sorted(found.values(), key=lambda e: (rank.get(e["section"], len(rank)), e["section"]))
+
+    def combined(self, order=()) -> str:
+        parts = [
+            f"# === {e['section']}/{e['variant']}.j2 ===\n{e['code'].rstrip()}\n"
+            for e in self.entries(order)
+        ]
+        return "\n\n".join(parts)
+
+    def materialize(self, order=()) -> str:
+        """Write the combined code to ``all.py`` and return its path."""
+        all_path = os.path.join(self.session_dir, "all.py")
+        with open(all_path, "w") as fh:
+            fh.write(self.combined(order))
+        return all_path
+
+    def import_legacy(self) -> int:
+        """Seed the manifest from a pre-manifest ``all.py``; the last copy of a section wins."""
+        all_path = os.path.join(self.session_dir, "all.py")
+        if not os.path.exists(all_path):
+            return 0
+
+        blocks, cur, buf = {}, None, []
+        with open(all_path, "r") as fh:
+            for line in fh:
+                m = SECTION_RE.match(line.strip())
+                if m:
+                    if cur:
+                        blocks[cur.split("/")[0]] = (cur, "".join(buf))
+                    cur, buf = m.group(1), []
+                elif cur:
+                    buf.append(line)
+        if cur:
+            blocks[cur.split("/")[0]] = (cur, "".join(buf))
+
+        for section, (name, code) in blocks.items():
+            self.put(section, name.split("/", 1)[1], code.strip() + "\n")
+        return len(blocks)
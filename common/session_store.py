@@ -0,0 +1,302 @@
+import copy
+import json
+import os
+import tempfile
+import threading
+import weakref
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from .paths import listdir
+
+
+class SessionStore(ABC):
+    """Key/value state of one builder wizard session."""
+
+    @abstractmethod
+    def get(self, session_id: str) -> dict:
+        ...
+
+    @abstractmethod
+    def update_many(self, session_id: str, values: dict):
+        ...
+
+    def update(self, session_id: str, key: str, value):
+        self.update_many(session_id, {key: value})
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        ...
+
+    @abstractmethod
+    def purge(self, where, older_than: float = None) -> int:
+        """Delete the sessions for which ``where(data)`` is true; returns how many.
+
+        ``older_than`` (unix time) lets a backend skip sessions written since
+        without loading them.
+        """
+
+
+class FileSessionStore(SessionStore):
+    """JSON-file session store with an in-process LRU cache.
+
+    Every session lives in ``<directory>/<session_id>.json``. Reads are served
+    from the cache as long as the file on disk has not changed (mtime/size),
+    writes go through a per-session lock and are persisted with an atomic
+    write-and-rename so readers never see a half-written file.
+    """
+
+    def __init__(self, directory: str, cache_size: int = 256):
+        self.directory = directory
+        self.cache_size = cache_size
+
+        self._cache = OrderedDict()  # session_id -> (stamp, data)
+        self._cache_lock = threading.Lock()
+        # Held only while someone is writing the session, so idle ones are dropped.
+        self._locks = weakref.WeakValueDictionary()
+        self._locks_guard = threading.Lock()
+
+    def _path(self, session_id: str) -> str:
+        return os.path.join(self.directory, f"{session_id}.json")
+
+    def _lock_for(self, session_id: str) -> threading.RLock:
+        with self._locks_guard:
+            lock = self._locks.get(session_id)
+            if lock is None:
+                lock = self._locks[session_id] = threading.RLock()
+            return lock
+
+    @staticmethod
+    def _stamp(path: str):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _remember(self, session_id: str, stamp, data: dict):
+        with self._cache_lock:
+            self._cache[session_id] = (stamp, data)
+            self._cache.move_to_end(session_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _load(self, session_id: str) -> dict:
+        path = self._path(session_id)
+        stamp = self._stamp(path)
+        if stamp is None:
+            return {}
+
+        with self._cache_lock:
+            cached = self._cache.get(session_id)
+            if cached and cached[0] == stamp:
+                self._cache.move_to_end(session_id)
+                return cached[1]
+
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        self._remember(session_id, stamp, data)
+        return data
+
+    def _persist(self, session_id: str, data: dict):
+        path = self._path(session_id)
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=f".{session_id}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._remember(session_id, self._stamp(path), data)
+
+    def get(self, session_id: str) -> dict:
+        # Callers routinely mutate the returned dict, so never hand out the cached object.
+        return copy.deepcopy(self._load(session_id))
+
+    def update_many(self, session_id: str, values: dict):
+        with self._lock_for(session_id):
+            session = dict(self._load(session_id))
+            session.update(copy.deepcopy(values))
+            self._persist(session_id, session)
+
+    def delete(self, session_id: str):
+        with self._lock_for(session_id):
+            try:
+                os.remove(self._path(session_id))
+            except FileNotFoundError:
+                pass
+            with self._cache_lock:
+                self._cache.pop(session_id, None)
+
+    def purge(self, where, older_than: float = None) -> int:
+        removed = 0
+        for name in listdir(self.directory):
+            if name.startswith(".") or not name.endswith(".json"):
+                continue
+            session_id = name[:-len(".json")]
+            stamp = self._stamp(self._path(session_id))
+            if stamp is None or (older_than is not None and stamp[0] / 1e9 >= older_than):
+                continue
+            try:
+                matches = where(self._load(session_id))
+            except ValueError:
+                continue
+            if matches:
+                self.delete(session_id)
+                removed += 1
+        return removed
+
+
+class SQLSessionStore(SessionStore):
+    """Sessions as JSON rows in the auth database, shared by every worker.
+
+    Updates lock the row (``SELECT ... FOR UPDATE``) so concurrent wizard
+    calls on one session merge instead of clobbering. SQLite ignores row
+    locks, so there the update takes the database write lock up front with
+    ``BEGIN IMMEDIATE``.
+    """
+
+    def __init__(self, namespace: str, engine=None):
+        from sqlalchemy import Column, DateTime, MetaData, String, Table, Text
+
+        if engine is None:
+            from auth.database import engine
+
+        self.namespace = namespace
+        self.engine = engine
+        metadata = MetaData()
+        self.table = Table(
+            "builder_sessions", metadata,
+            Column("namespace", String(32), primary_key=True),
+            Column("session_id", String(64), primary_key=True),
+            Column("data", Text, nullable=False, default="{}"),
+            Column("updated_at", DateTime),
+        )
+        metadata.create_all(engine, checkfirst=True)
+
+    def _where(self, session_id: str):
+        t = self.table
+        return (t.c.namespace == self.namespace) & (t.c.session_id == session_id)
+
+    def get(self, session_id: str) -> dict:
+        from sqlalchemy import select
+
+        with self.engine.connect() as conn:
+            row = conn.execute(select(self.table.c.data).where(self._where(session_id))).first()
+        return json.loads(row[0]) if row else {}
+
+    def update_many(self, session_id: str, values: dict):
+        from datetime import datetime
+        from sqlalchemy import select
+        from sqlalchemy.exc import IntegrityError
+
+        for attempt in range(2):
+            try:
+                with self.engine.begin() as conn:
+                    if conn.dialect.name == "sqlite":
+                        conn.exec_driver_sql("BEGIN IMMEDIATE")
+                    row = conn.execute(
+                        select(self.table.c.data).where(self._where(session_id)).with_for_update()
+                    ).first()
+                    session = json.loads(row[0]) if row else {}
+                    session.update(values)
+                    payload = {"data": json.dumps(session), "updated_at": datetime.utcnow()}
+                    if row:
+                        conn.execute(self.table.update().where(self._where(session_id)).values(**payload))
+                    else:
+                        conn.execute(self.table.insert().values(
+                            namespace=self.namespace, session_id=session_id, **payload
+                        ))
+                return
+            except IntegrityError:
+                # Another worker inserted the row first; retry as an update.
+                if attempt:
+                    raise
+
+    def delete(self, session_id: str):
+        with self.engine.begin() as conn:
+            conn.execute(self.table.delete().where(self._where(session_id)))
+
+    def purge(self, where, older_than: float = None) -> int:
+        from datetime import datetime, timezone
+        from sqlalchemy import select
+
+        t = self.table
+        query = select(t.c.session_id, t.c.data).where(t.c.namespace == self.namespace)
+        if older_than is not None:
+            query = query.where(t.c.updated_at < datetime.fromtimestamp(older_than, timezone.utc).replace(tzinfo=None))
+        with self.engine.connect() as conn:
+            victims = [session_id for session_id, data in conn.execute(query) if where(json.loads(data))]
+        for start in range(0, len(victims), 500):
+            with self.engine.begin() as conn:
+                conn.execute(t.delete().where(
+                    (t.c.namespace == self.namespace) & t.c.session_id.in_(victims[start:start + 500])
+                ))
+        return len(victims)
+
+
+class RedisSessionStore(SessionStore):
+    """Sessions as Redis hashes, one JSON-encoded field per session key.
+
+    ``HSET`` is atomic per field, so two requests touching different keys of
+    the same session never lose each other's writes.
+    """
+
+    def __init__(self, namespace: str, url: str, ttl: int = 0, client=None):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = f"wednes:session:{namespace}:"
+        self.ttl = ttl
+
+    def get(self, session_id: str) -> dict:
+        raw = self.client.hgetall(self.prefix + session_id)
+        return {
+            (k.decode() if isinstance(k, bytes) else k): json.loads(v)
+            for k, v in raw.items()
+        }
+
+    def update_many(self, session_id: str, values: dict):
+        if not values:
+            return
+        key = self.prefix + session_id
+        pipe = self.client.pipeline()
+        pipe.hset(key, mapping={k: json.dumps(v) for k, v in values.items()})
+        if self.ttl:
+            pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    def delete(self, session_id: str):
+        self.client.delete(self.prefix + session_id)
+
+    def purge(self, where, older_than: float = None) -> int:
+        # Hashes carry no write time, so every session is checked.
+        removed = 0
+        for key in self.client.scan_iter(match=self.prefix + "*", count=500):
+            key = key.decode() if isinstance(key, bytes) else key
+            session_id = key[len(self.prefix):]
+            if where(self.get(session_id)):
+                self.delete(session_id)
+                removed += 1
+        return removed
+
+
+def create_session_store(namespace: str, directory: str) -> SessionStore:
+    """Pick the session backend from ``SESSION_BACKEND`` (file, sql or redis)."""
+    backend = os.getenv("SESSION_BACKEND", "file").lower()
+
+    if backend == "file":
+        return FileSessionStore(directory, cache_size=int(os.getenv("SESSION_CACHE_SIZE", 256)))
+    if backend == "sql":
+        return SQLSessionStore(namespace)
+    if backend == "redis":
+        url = os.getenv("SESSION_REDIS_URL") or os.getenv("REDIS_URL") or "redis://localhost:6379/0"
+        return RedisSessionStore(namespace, url, ttl=int(os.getenv("SESSION_TTL_SECONDS", 0)))
+    raise ValueError(f"Unknown SESSION_BACKEND: {backend}")
@@ -0,0 +1,15 @@
+import json
+from fastapi.responses import StreamingResponse
+
+
+def sse_response(events) -> StreamingResponse:
+    """Wrap an iterator of ``(event, data)`` pairs as a Server-Sent Events stream."""
+    def _encode():
+        for event, data in events:
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    return StreamingResponse(
+        _encode(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,72 @@
+import logging
+import os
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, TemplateError, TemplateNotFound
+
+logger = logging.getLogger("templates")
+
+
+class TemplateRegistry:
+    """All ``*.j2`` component templates of a builder, compiled once.
+
+    Templates are addressed by ``(section, variant)``, e.g. ``("llm", "groq")``
+    for ``llm/groq.j2``. Variant names are whitespace-stripped so stray
+    characters in filenames do not make a template unreachable.
+    """
+
+    def __init__(self, root: str, bytecode_cache_dir: str = None):
+        self.root = os.path.abspath(root)
+        options = {}
+        if bytecode_cache_dir:
+            os.makedirs(bytecode_cache_dir, exist_ok=True)
+            options["bytecode_cache"] = FileSystemBytecodeCache(bytecode_cache_dir)
+
+        self.env = Environment(
+            loader=FileSystemLoader(self.root),
+            trim_blocks=True,
+            lstrip_blocks=True,
+            auto_reload=False,
+            cache_size=-1,
+            **options,
+        )
+        self._templates = {}
+        self._raw = {}
+
+    def load(self):
+        """Compile every template under ``root``; raise listing all broken ones."""
+        errors = {}
+        for dirpath, _, filenames in os.walk(self.root):
+            for fname in sorted(filenames):
+                if not fname.endswith(".j2"):
+                    continue
+                rel = os.path.relpath(os.path.join(dirpath, fname), self.root).replace(os.sep, "/")
+                section, _, variant = rel[:-len(".j2")].rpartition("/")
+                try:
+                    self._templates[(section, variant.strip())] = self.env.get_template(rel)
+                except TemplateError as exc:
+                    errors[rel] = str(exc)
+
+        if errors:
+            details = "; ".join(f"{name}: {err}" for name, err in sorted(errors.items()))
+            raise RuntimeError(f"Invalid templates in {self.root}: {details}")
+        logger.info(f"[templates] Loaded {len(self._templates)} templates from {self.root}")
+        return self
+
+    def has(self, section: str, variant: str) -> bool:
+        return (section, variant) in self._templates
+
+    def get(self, section: str, variant: str):
+        try:
+            return self._templates[(section, variant)]
+        except KeyError:
+            raise TemplateNotFound(f"{section}/{variant}.j2") from None
+
+    def render(self, section: str, variant: str, **context) -> str:
+        return self.get(section, variant).render(**context)
+
+    def raw(self, rel_path: str) -> str:
+        """Unrendered text of a file under ``root`` (e.g. structure references)."""
+        if rel_path not in self._raw:
+            with open(os.path.join(self.root, rel_path), "r") as fh:
+                self._raw[rel_path] = fh.read()
+        return self._raw[rel_path]
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import tempfile
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+CHUNK_SIZE = 1024 * 1024
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", 512 * 1024 * 1024))
+
+TEXT_TYPES = {"text/plain"}
+EXCEL_TYPES = {"application/zip", "application/x-ole-storage"}
+IMAGE_TYPES = {"image/png", "image/jpeg", "image/gif", "image/webp"}
+
+IMAGE_EXTENSIONS = {"image/png": ".png", "image/jpeg": ".jpg", "image/gif": ".gif", "image/webp": ".webp"}
+
+_MAGIC = [
+    (b"%PDF-", "application/pdf"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"PK\x03\x04", "application/zip"),  # xlsx/docx
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "application/x-ole-storage"),  # legacy xls
+]
+
+
+def sniff_mime(head: bytes) -> str:
+    """Best-effort content type from the first bytes of a file."""
+    for magic, mime in _MAGIC:
+        if head.startswith(magic):
+            return mime
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    # Any encoding but UTF-16/32 leaves text free of NUL bytes.
+    if b"\x00" not in head:
+        return "text/plain"
+    return "application/octet-stream"
+
+
+async def save_upload(file: UploadFile, dest_path: str, max_bytes: int = UPLOAD_MAX_BYTES,
+                      allowed_types=None, blobs=None) -> dict:
+    """Stream ``file`` to ``dest_path`` chunk by chunk and return its metadata.
+
+    The data goes to a temp file next to ``dest_path`` and is moved into
+    place only once it is complete, within ``max_bytes`` (413 otherwise)
+    and of an ``allowed_types`` content type (415 otherwise), so a failed
+    upload never replaces an existing file. With a ``BlobStore`` in
+    ``blobs`` the data is stored once by hash and ``dest_path`` links to it.
+    """
+    dest_dir = os.path.dirname(os.path.abspath(dest_path))
+    os.makedirs(dest_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=dest_dir, suffix=".upload")
+
+    digest, size, mime = hashlib.sha256(), 0, None
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            def write(chunk: bytes):
+                digest.update(chunk)
+                fh.write(chunk)
+
+            while True:
+                chunk = await file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if mime is None:
+                    mime = sniff_mime(chunk[:4096])
+                    if allowed_types and mime not in allowed_types:
+                        raise HTTPException(status_code=415, detail=f"Unsupported file content ({mime}).")
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(status_code=413, detail=f"File exceeds the {max_bytes} byte limit.")
+                await run_in_threadpool(write, chunk)
+
+        if not size:
+            raise HTTPException(status_code=400, detail="Uploaded file is empty.")
+        if blobs is not None:
+            await run_in_threadpool(blobs.adopt, tmp_path, digest.hexdigest(), dest_path)
+        else:
+            await run_in_threadpool(os.replace, tmp_path, dest_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+    return {"path": dest_path, "size": size, "sha256": digest.hexdigest(), "mime": mime}
+
+
+class UploadSizeLimitMiddleware:
+    """Reject request bodies larger than ``max_bytes`` before they are parsed.
+
+    Checks ``Content-Length`` up front and counts streamed bytes for chunked
+    requests, so oversized multipart uploads are never spooled to disk.
+    """
+
+    def __init__(self, app, max_bytes: int = UPLOAD_MAX_BYTES):
+        self.app = app
+        # Multipart framing and form fields travel in the same body.
+        self.max_bytes = max_bytes + 64 * 1024
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        for name, value in scope.get("headers", []):
+            if name == b"content-length" and value.isdigit() and int(value) > self.max_bytes:
+                return await self._reject(send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=413, detail="Request body too large.")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    @staticmethod
+    async def _reject(send):
+        body = b'{"detail":"Request body too large."}'
+        await send({"type": "http.response.start", "status": 413,
+                    "headers": [(b"content-type", b"application/json"),
+                                (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
@@ -1,14 +1,19 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import RedirectResponse, JSONResponse
+from fastapi import FastAPI, HTTPException, Depends, Form, File, UploadFile, Response
+from fastapi.responses import RedirectResponse, JSONResponse, FileResponse
+from starlette.concurrency import run_in_threadpool
 import subprocess
-import threading
 import time
-import requests
 import socket
 import os
 import signal
 import psutil
 from typing import Optional
+from common.readiness import probe_http, wait_until_ready
+from common.uploads import sniff_mime, IMAGE_TYPES
+from common.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, encode_cursor, decode_cursor
+from auth.utils import get_current_user_id
+from . import service
+from .gemini import DEFAULT_MODEL_ID
 
 app = FastAPI(
     title="AI Image Generator API",
@@ -20,6 +25,8 @@ app = FastAPI(
 streamlit_process = None
 streamlit_port = 8501
 streamlit_url = f"http://localhost:{streamlit_port}"
+STREAMLIT_LOG = os.path.join(os.path.dirname(__file__), "streamlit.log")
+IMG_MAX_UPLOAD_BYTES = int(os.getenv("IMG_MAX_UPLOAD_BYTES", 10 * 1024 * 1024))
 
 def find_free_port():
     """Find a free port for Streamlit"""
@@ -53,7 +60,7 @@ def kill_process_on_port(port: int):
     return False
 
 def start_streamlit_app():
-    """Start the Streamlit application"""
+    """Start the Streamlit application; readiness is awaited by the caller"""
     global streamlit_process, streamlit_port, streamlit_url
     
     try:
@@ -83,36 +90,15 @@ def start_streamlit_app():
         ]
 
         print(f"Starting Streamlit app with command: {' '.join(cmd)}")
-        streamlit_process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            preexec_fn=os.setsid if os.name != 'nt' else None
-        )
-        
-        # Wait for Streamlit to start
-        max_attempts = 30
-        for attempt in range(max_attempts):
-            try:
-                response = requests.get(streamlit_url, timeout=2)
-                if response.status_code == 200:
-                    print(f"Streamlit app started successfully on {streamlit_url}")
-                    return True
-            except requests.exceptions.RequestException:
-                pass
-            
-            if streamlit_process.poll() is not None:
-                stdout, stderr = streamlit_process.communicate()
-                print(f"Streamlit process exited with code {streamlit_process.returncode}")
-                print(f"STDOUT: {stdout.decode()}")
-                print(f"STDERR: {stderr.decode()}")
-                return False
-            
-            time.sleep(1)
-            print(f"Waiting for Streamlit to start... Attempt {attempt + 1}/{max_attempts}")
-        
-        print("Streamlit failed to start within timeout period")
-        return False
+        # Output goes to a file: unread pipes would fill up and stall the app.
+        with open(STREAMLIT_LOG, "wb") as log_file:
+            streamlit_process = subprocess.Popen(
+                cmd,
+                stdout=log_file,
+                stderr=subprocess.STDOUT,
+                preexec_fn=os.setsid if os.name != 'nt' else None
+            )
+        return True
         
     except Exception as e:
         print(f"Error starting Streamlit: {e}")
@@ -150,6 +136,9 @@ async def root():
         "description": "FastAPI wrapper for Streamlit AI Image Generator",
         "version": "1.0.0",
         "endpoints": {
+            "generate": "/generate",
+            "edit": "/edit",
+            "gallery": "/gallery",
             "launch_app": "/launch-streamlit-app",
             "stop_app": "/stop-streamlit-app",
             "app_status": "/app-status",
@@ -187,59 +176,39 @@ async def launch_streamlit_app():
             )
         
         # If already running, return existing URL
-        if streamlit_process and streamlit_process.poll() is None:
-            try:
-                response = requests.get(streamlit_url, timeout=2)
-                if response.status_code == 200:
-                    return {
-                        "success": True,
-                        "message": "Streamlit app is already running",
-                        "url": streamlit_url,
-                        "port": streamlit_port,
-                        "redirect_url": streamlit_url
-                    }
-            except:
-                pass
-        
-        # Start the Streamlit app in a separate thread
-        def start_app():
-            start_streamlit_app()
-        
-        thread = threading.Thread(target=start_app)
-        thread.daemon = True
-        thread.start()
+        if streamlit_process and streamlit_process.poll() is None and await probe_http(streamlit_port):
+            return {
+                "success": True,
+                "message": "Streamlit app is already running",
+                "url": streamlit_url,
+                "port": streamlit_port,
+                "redirect_url": streamlit_url
+            }
         
-        # Wait a bit for the app to start
-        time.sleep(3)
+        # Port clean-up and spawning block, so keep them off the event loop
+        started = await run_in_threadpool(start_streamlit_app)
         
-        # Check if the app started successfully
-        max_attempts = 20
-        for attempt in range(max_attempts):
-            try:
-                if streamlit_process and streamlit_process.poll() is None:
-                    response = requests.get(streamlit_url, timeout=2)
-                    if response.status_code == 200:
-                        return {
-                            "success": True,
-                            "message": "Streamlit AI Image Generator & Editor launched successfully!",
-                            "url": streamlit_url,
-                            "port": streamlit_port,
-                            "redirect_url": streamlit_url,
-                            "instructions": [
-                                "1. Click on the URL above or copy it to your browser",
-                                "2. Enter your Google AI Studio API key in the sidebar",
-                                "3. Start generating and editing images!",
-                                "4. Use the tabs to switch between Generate, Edit, and Gallery"
-                            ]
-                        }
-            except requests.exceptions.RequestException:
-                pass
-            
-            time.sleep(0.5)
+        # Return as soon as Streamlit is actually serving
+        if started and await wait_until_ready(streamlit_port, process=streamlit_process):
+            return {
+                "success": True,
+                "message": "Streamlit AI Image Generator & Editor launched successfully!",
+                "url": streamlit_url,
+                "port": streamlit_port,
+                "redirect_url": streamlit_url,
+                "instructions": [
+                    "1. Click on the URL above or copy it to your browser",
+                    "2. Enter your Google AI Studio API key in the sidebar",
+                    "3. Start generating and editing images!",
+                    "4. Use the tabs to switch between Generate, Edit, and Gallery"
+                ]
+            }
         
         # If we get here, the app didn't start successfully
         if streamlit_process:
-            stop_streamlit_app()
+            if streamlit_process.poll() is not None:
+                print(f"Streamlit process exited with code {streamlit_process.returncode}, see {STREAMLIT_LOG}")
+            await run_in_threadpool(stop_streamlit_app)
         
         raise HTTPException(
             status_code=500,
@@ -266,7 +235,7 @@ async def stop_streamlit_app_endpoint():
     
     try:
         if streamlit_process and streamlit_process.poll() is None:
-            stop_streamlit_app()
+            await run_in_threadpool(stop_streamlit_app)
             return {
                 "success": True,
                 "message": "Streamlit app stopped successfully"
@@ -295,19 +264,14 @@ async def app_status():
     global streamlit_process, streamlit_url
     
     try:
-        if streamlit_process and streamlit_process.poll() is None:
-            # Check if the app is actually responding
-            try:
-                response = requests.get(streamlit_url, timeout=2)
-                if response.status_code == 200:
-                    return {
-                        "running": True,
-                        "url": streamlit_url,
-                        "port": streamlit_port,
-                        "message": "Streamlit app is running and accessible"
-                    }
-            except requests.exceptions.RequestException:
-                pass
+        # Check if the app is actually responding
+        if streamlit_process and streamlit_process.poll() is None and await probe_http(streamlit_port):
+            return {
+                "running": True,
+                "url": streamlit_url,
+                "port": streamlit_port,
+                "message": "Streamlit app is running and accessible"
+            }
         
         return {
             "running": False,
@@ -333,19 +297,118 @@ async def redirect_to_app():
     """
     global streamlit_process, streamlit_url
     
-    if streamlit_process and streamlit_process.poll() is None:
-        try:
-            response = requests.get(streamlit_url, timeout=2)
-            if response.status_code == 200:
-                return RedirectResponse(url=streamlit_url)
-        except requests.exceptions.RequestException:
-            pass
+    if streamlit_process and streamlit_process.poll() is None and await probe_http(streamlit_port):
+        return RedirectResponse(url=streamlit_url)
     
     raise HTTPException(
         status_code=404,
         detail="Streamlit app is not running. Please use /launch-streamlit-app first."
     )
 
+@app.post("/generate",
+          summary="Generate Image",
+          description="Generates an image from a text prompt")
+async def generate_image_endpoint(
+    prompt: str = Form(...),
+    model_id: str = Form(DEFAULT_MODEL_ID),
+    api_key: Optional[str] = Form(None),
+    user_id: int = Depends(get_current_user_id),
+):
+    """
+    Generate an image from ``prompt``.
+    
+    Uses ``api_key`` if given, otherwise the Gemini key stored for the account.
+    
+    Returns:
+        - mime_type: Content type of the image
+        - image_base64: The image, base64 encoded
+    """
+    if not prompt.strip():
+        raise HTTPException(status_code=400, detail="Please enter a description for the image")
+    return await service.generate(user_id, prompt, model_id, api_key)
+
+@app.post("/edit",
+          summary="Edit Image",
+          description="Edits an uploaded image following a text instruction")
+async def edit_image_endpoint(
+    prompt: str = Form(...),
+    image: UploadFile = File(...),
+    model_id: str = Form(DEFAULT_MODEL_ID),
+    api_key: Optional[str] = Form(None),
+    user_id: int = Depends(get_current_user_id),
+):
+    """
+    Edit ``image`` following ``prompt``; same response as ``/generate``.
+    """
+    if not prompt.strip():
+        raise HTTPException(status_code=400, detail="Please enter editing instructions")
+    image_bytes = await image.read(IMG_MAX_UPLOAD_BYTES + 1)
+    if len(image_bytes) > IMG_MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Image exceeds the {IMG_MAX_UPLOAD_BYTES} byte limit.")
+    mime_type = sniff_mime(image_bytes[:4096])
+    if mime_type not in IMAGE_TYPES:
+        raise HTTPException(status_code=415, detail=f"Unsupported file content ({mime_type}).")
+    return await service.edit(user_id, prompt, image_bytes, mime_type, model_id, api_key)
+
+@app.get("/images/{image_id}",
+         summary="Get Image",
+         description="Serves an image from the current user's gallery by its id")
+async def get_image(image_id: str, user_id: int = Depends(get_current_user_id)):
+    # Ids are hashes of the prompt and are shared between users, so knowing
+    # one is not enough: the image has to be in the caller's own gallery.
+    owned = await run_in_threadpool(service.store.in_gallery, service.gallery_owner(user_id), image_id)
+    meta = await run_in_threadpool(service.store.get, image_id) if owned else None
+    if meta is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    # An id always names the same bytes, but only this user may see them.
+    return FileResponse(meta["path"], media_type=meta["mime_type"],
+                        headers={"Cache-Control": "private, max-age=31536000, immutable"})
+
+@app.get("/gallery",
+         summary="Image Gallery",
+         description="Images generated or edited by the current user, newest first")
+async def get_gallery(
+    response: Response,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    user_id: int = Depends(get_current_user_id),
+):
+    """
+    Page through the user's gallery; the next page's cursor is in ``X-Next-Cursor``.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    before = decode_cursor(cursor, 1)[0] if cursor else None
+    if before is not None and not isinstance(before, int):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    entries, next_before = await run_in_threadpool(
+        service.store.gallery, service.gallery_owner(user_id), before, limit)
+    if next_before is not None:
+        response.headers["X-Next-Cursor"] = encode_cursor(next_before)
+    return [
+        {
+            "image_id": e["key"],
+            "url": f"/img/images/{e['key']}",
+            "type": e["type"],
+            "prompt": e["prompt"],
+            "mime_type": e["mime_type"],
+            "created_at": e["created_at"],
+        }
+        for e in entries
+    ]
+
+@app.delete("/gallery",
+            summary="Clear Gallery",
+            description="Removes all entries from the current user's gallery")
+async def clear_gallery(user_id: int = Depends(get_current_user_id)):
+    await run_in_threadpool(service.store.clear_gallery, service.gallery_owner(user_id))
+    return {"success": True, "message": "Gallery cleared"}
+
+@app.get("/queue",
+         summary="Image Queue",
+         description="Image jobs running and waiting on this worker")
+async def image_queue():
+    return service.pool.stats()
+
 # Cleanup on shutdown
 @app.on_event("shutdown")
 async def shutdown_event():
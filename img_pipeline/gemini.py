@@ -0,0 +1,122 @@
+"""Gemini image generation and editing, shared by the Streamlit app and the API.
+
+``IMG_CLIENT=stub`` swaps in a local client that draws a small PNG instead
+of calling Google, for tests and offline development.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import struct
+import zlib
+from types import SimpleNamespace
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_ID = "gemini-2.0-flash-preview-image-generation"
+IMG_CLIENT = os.getenv("IMG_CLIENT", "gemini")
+
+
+def make_client(api_key: str):
+    """``(client, types)`` for ``api_key``; raises ImportError without google-genai."""
+    if IMG_CLIENT == "stub":
+        return StubClient(), stub_types
+    from google import genai
+    from google.genai import types
+
+    return genai.Client(api_key=api_key), types
+
+
+def _first_image(response):
+    for part in response.candidates[0].content.parts:
+        if part.inline_data is not None:
+            return part.inline_data.data, part.inline_data.mime_type
+    return None, None
+
+
+def _request(types, prompt, image_bytes=None, mime_type=None) -> dict:
+    contents = prompt if image_bytes is None else [prompt, types.Part.from_bytes(data=image_bytes, mime_type=mime_type)]
+    return {
+        "contents": contents,
+        "config": types.GenerateContentConfig(response_modalities=['Text', 'Image']),
+    }
+
+
+def generate_image(client, types, prompt, model_id=DEFAULT_MODEL_ID):
+    """Generate image using Gemini API"""
+    try:
+        return _first_image(client.models.generate_content(model=model_id, **_request(types, prompt)))
+    except Exception as e:
+        logger.error(f"Error generating image: {str(e)}")
+        raise e
+
+
+def edit_image(client, types, prompt, image_bytes, mime_type, model_id=DEFAULT_MODEL_ID):
+    """Edit image using Gemini API"""
+    try:
+        return _first_image(client.models.generate_content(
+            model=model_id, **_request(types, prompt, image_bytes, mime_type)))
+    except Exception as e:
+        logger.error(f"Error editing image: {str(e)}")
+        raise e
+
+
+async def agenerate_image(client, types, prompt, model_id=DEFAULT_MODEL_ID):
+    """``generate_image`` on the client's native async API."""
+    response = await client.aio.models.generate_content(model=model_id, **_request(types, prompt))
+    return _first_image(response)
+
+
+async def aedit_image(client, types, prompt, image_bytes, mime_type, model_id=DEFAULT_MODEL_ID):
+    """``edit_image`` on the client's native async API."""
+    response = await client.aio.models.generate_content(
+        model=model_id, **_request(types, prompt, image_bytes, mime_type))
+    return _first_image(response)
+
+
+# --- stub client -----------------------------------------------------------------
+
+def _png(width: int, height: int, rgb: tuple) -> bytes:
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+    row = b"\x00" + bytes(rgb) * width
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(row * height))
+            + chunk(b"IEND", b""))
+
+
+class _StubModels:
+    delay = float(os.getenv("IMG_STUB_DELAY_SECONDS", 0))
+
+    def _respond(self, model, contents):
+        # Same prompt, same colour: deterministic output for tests.
+        prompt = contents if isinstance(contents, str) else contents[0]
+        digest = hashlib.sha256(f"{model}:{prompt}".encode()).digest()
+        data = _png(64, 64, tuple(digest[:3]))
+        part = SimpleNamespace(text=None, inline_data=SimpleNamespace(data=data, mime_type="image/png"))
+        return SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))])
+
+    def generate_content(self, model, contents, config=None):
+        return self._respond(model, contents)
+
+
+class _AsyncStubModels(_StubModels):
+    async def generate_content(self, model, contents, config=None):
+        await asyncio.sleep(self.delay)
+        return self._respond(model, contents)
+
+
+class StubClient:
+    """Offline stand-in for ``genai.Client``."""
+
+    def __init__(self):
+        self.models = _StubModels()
+        self.aio = SimpleNamespace(models=_AsyncStubModels())
+
+
+stub_types = SimpleNamespace(
+    GenerateContentConfig=lambda **kwargs: kwargs,
+    Part=SimpleNamespace(from_bytes=lambda data, mime_type: {"data": data, "mime_type": mime_type}),
+)
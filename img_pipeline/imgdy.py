@@ -1,12 +1,14 @@
 import streamlit as st
 import os
 import pathlib
-import tempfile
 from PIL import Image
 import io
 import base64
 from datetime import datetime
 import logging
+import hashlib
+from gemini import make_client, generate_image, edit_image
+from store import shared_image_store
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -71,19 +73,13 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Initialize session state
-if 'generated_images' not in st.session_state:
-    st.session_state.generated_images = []
 if 'api_key_set' not in st.session_state:
     st.session_state.api_key_set = False
 
 def initialize_gemini_client(api_key):
     """Initialize Gemini client with API key"""
     try:
-        from google import genai
-        from google.genai import types
-        
-        client = genai.Client(api_key=api_key)
-        return client, types
+        return make_client(api_key)
     except ImportError:
         st.error("Google GenAI library not installed. Please install it using: pip install google-genai>=1.5.0")
         return None, None
@@ -91,71 +87,21 @@ def initialize_gemini_client(api_key):
         st.error(f"Error initializing Gemini client: {str(e)}")
         return None, None
 
-def generate_image(client, types, prompt, model_id="gemini-2.0-flash-preview-image-generation"):
-    """Generate image using Gemini API"""
-    try:
-        response = client.models.generate_content(
-            model=model_id,
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                response_modalities=['Text', 'Image']
-            )
-        )
-        
-        # Extract image data
-        for part in response.candidates[0].content.parts:
-            if part.inline_data is not None:
-                return part.inline_data.data, part.inline_data.mime_type
-        
-        return None, None
-    except Exception as e:
-        logger.error(f"Error generating image: {str(e)}")
-        raise e
-
-def edit_image(client, types, prompt, uploaded_file, model_id="gemini-2.0-flash-preview-image-generation"):
-    """Edit image using Gemini API"""
-    try:
-        # Reset file pointer to beginning
-        uploaded_file.seek(0)
-        
-        # Convert uploaded file to PIL Image
-        pil_image = Image.open(uploaded_file)
-        
-        # Convert to RGB if necessary (for compatibility)
-        if pil_image.mode in ('RGBA', 'LA', 'P'):
-            pil_image = pil_image.convert('RGB')
-        
-        response = client.models.generate_content(
-            model=model_id,
-            contents=[prompt, pil_image],
-            config=types.GenerateContentConfig(
-                response_modalities=['Text', 'Image']
-            )
-        )
-        
-        # Extract image data
-        for part in response.candidates[0].content.parts:
-            if part.inline_data is not None:
-                return part.inline_data.data, part.inline_data.mime_type
-        
-        return None, None
-    except Exception as e:
-        logger.error(f"Error editing image: {str(e)}")
-        raise e
+def gallery_owner(api_key):
+    """Gallery key for a Streamlit user, who is known only by their API key"""
+    return "key-" + hashlib.sha256(api_key.encode()).hexdigest()
 
-def save_image_to_temp(image_data, filename):
-    """Save image data to temporary file"""
-    try:
-        temp_dir = tempfile.gettempdir()
-        file_path = os.path.join(temp_dir, filename)
-        
-        with open(file_path, 'wb') as f:
-            f.write(image_data)
-        
-        return file_path
-    except Exception as e:
-        logger.error(f"Error saving image: {str(e)}")
-        return None
+def stored_or_new(key, kind, prompt, model_id, produce, api_key):
+    """Image ``key`` from the store, or ``produce()`` it and store it; added to the gallery either way"""
+    store = shared_image_store()
+    image_data, mime_type = store.read(key)
+    if image_data is None:
+        image_data, mime_type = produce()
+        if not image_data:
+            return None, None
+        store.put(key, image_data, mime_type, model_id=model_id, prompt=prompt, type=kind)
+    store.add_to_gallery(gallery_owner(api_key), key, kind, prompt)
+    return image_data, mime_type
 
 def main():
     # Header
@@ -280,7 +226,9 @@ def main():
             
             try:
                 with st.spinner("Generating image... This may take a few moments"):
-                    image_data, mime_type = generate_image(client, types, prompt, model_id)
+                    image_data, mime_type = stored_or_new(
+                        shared_image_store().key(prompt, model_id), 'generated', prompt, model_id,
+                        lambda: generate_image(client, types, prompt, model_id), api_key)
                     
                     if image_data:
                         # Display generated image
@@ -290,14 +238,7 @@ def main():
                         image = Image.open(io.BytesIO(image_data))
                         st.image(image, caption=f"Generated: {prompt}", use_container_width=True)
                         
-                        # Save to session state
                         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        st.session_state.generated_images.append({
-                            'image': image_data,
-                            'prompt': prompt,
-                            'timestamp': timestamp,
-                            'type': 'generated'
-                        })
                         
                         # Download button
                         st.download_button(
@@ -369,8 +310,12 @@ def main():
             
             try:
                 with st.spinner("Editing image... This may take a few moments"):
-                    # Pass the uploaded file directly instead of reading it
-                    edited_data, mime_type = edit_image(client, types, edit_prompt, uploaded_file, model_id)
+                    uploaded_file.seek(0)
+                    source_bytes = uploaded_file.read()
+                    edited_data, mime_type = stored_or_new(
+                        shared_image_store().key(edit_prompt, model_id, source_bytes), 'edited', edit_prompt, model_id,
+                        lambda: edit_image(client, types, edit_prompt, source_bytes, uploaded_file.type, model_id),
+                        api_key)
                     
                     if edited_data:
                         st.success("✅ Image edited successfully!")
@@ -385,14 +330,7 @@ def main():
                         with col2:
                             st.image(edited_image, caption="After", use_container_width=True)
                         
-                        # Save to session state
                         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        st.session_state.generated_images.append({
-                            'image': edited_data,
-                            'prompt': edit_prompt,
-                            'timestamp': timestamp,
-                            'type': 'edited'
-                        })
                         
                         # Download button
                         st.download_button(
@@ -412,38 +350,41 @@ def main():
     with tab3:
         st.header("Image Gallery")
         
-        if not st.session_state.generated_images:
+        # Images are read from the store as they are shown, not kept in session state
+        entries, _ = shared_image_store().gallery(gallery_owner(api_key), limit=60)
+        if not entries:
             st.info("No images generated yet. Create some images in the other tabs!")
             return
         
         # Display images in gallery
         cols = st.columns(3)
         
-        for idx, img_data in enumerate(reversed(st.session_state.generated_images)):
+        for idx, img_data in enumerate(entries):
             col_idx = idx % 3
+            timestamp = datetime.fromtimestamp(img_data['created_at']).strftime("%Y%m%d_%H%M%S")
             
             with cols[col_idx]:
                 # Display image
-                image = Image.open(io.BytesIO(img_data['image']))
-                st.image(image, use_column_width=True)
+                st.image(img_data['path'], use_column_width=True)
                 
                 # Image info
                 st.caption(f"**{img_data['type'].title()}**: {img_data['prompt'][:50]}...")
-                st.caption(f"**Created**: {img_data['timestamp']}")
+                st.caption(f"**Created**: {timestamp}")
                 
                 # Download button
-                st.download_button(
-                    label="📥 Download",
-                    data=img_data['image'],
-                    file_name=f"{img_data['type']}_image_{img_data['timestamp']}.png",
-                    mime="image/png",
-                    key=f"download_{idx}",
-                    use_container_width=True
-                )
+                with open(img_data['path'], 'rb') as fh:
+                    st.download_button(
+                        label="📥 Download",
+                        data=fh,
+                        file_name=f"{img_data['type']}_image_{timestamp}{os.path.splitext(img_data['path'])[1]}",
+                        mime=img_data['mime_type'],
+                        key=f"download_{idx}",
+                        use_container_width=True
+                    )
         
         # Clear gallery button
         if st.button("🗑️ Clear Gallery", use_container_width=True):
-            st.session_state.generated_images = []
+            shared_image_store().clear_gallery(gallery_owner(api_key))
             st.rerun()
     
     # Footer
@@ -0,0 +1,158 @@
+"""Image generation for the API, without a Streamlit process in between.
+
+Requests run on the Gemini client's async API through ``ImageJobPool``,
+which caps calls in flight per process and per user, so one user's batch
+queues behind their own earlier requests instead of everyone else's.
+Results already in the image store are returned without calling Gemini.
+"""
+import asyncio
+import base64
+import hashlib
+import os
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from auth.cache import TTLCache
+from .gemini import aedit_image, agenerate_image, make_client
+from .store import shared_image_store
+
+IMG_MAX_CONCURRENCY = int(os.getenv("IMG_MAX_CONCURRENCY", 8))
+IMG_MAX_PER_USER = int(os.getenv("IMG_MAX_PER_USER", 2))
+IMG_MAX_QUEUED_PER_USER = int(os.getenv("IMG_MAX_QUEUED_PER_USER", 10))
+IMG_TIMEOUT_SECONDS = float(os.getenv("IMG_TIMEOUT_SECONDS", 120))
+
+# Stored provider names under which a user may have saved a Gemini key.
+KEY_PROVIDERS = ("gemini", "google")
+
+
+class ImageJobPool:
+    """Concurrency limits for image jobs: ``max_concurrency`` overall, ``per_user`` per user.
+
+    A user's requests wait on their own semaphore first, so the shared slots
+    are handed out fairly in arrival order. Beyond ``max_queued`` pending
+    requests a user gets 429.
+    """
+
+    def __init__(self, max_concurrency: int = IMG_MAX_CONCURRENCY, per_user: int = IMG_MAX_PER_USER,
+                 max_queued: int = IMG_MAX_QUEUED_PER_USER, timeout: float = IMG_TIMEOUT_SECONDS):
+        self.max_concurrency = max_concurrency
+        self.per_user = per_user
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._users = {}
+        self.running = 0
+
+    async def run(self, user_id, job):
+        """Await ``job()`` within the limits; 504 after ``timeout`` seconds."""
+        user = self._users.setdefault(user_id, {"slots": asyncio.Semaphore(self.per_user), "pending": 0})
+        if user["pending"] >= self.max_queued:
+            raise HTTPException(status_code=429, detail="Too many image requests queued, try again shortly.")
+        user["pending"] += 1
+        try:
+            async with user["slots"], self._slots:
+                self.running += 1
+                try:
+                    return await asyncio.wait_for(job(), self.timeout)
+                except asyncio.TimeoutError:
+                    raise HTTPException(status_code=504, detail="Image generation timed out.")
+                finally:
+                    self.running -= 1
+        finally:
+            user["pending"] -= 1
+            if not user["pending"]:
+                del self._users[user_id]
+
+    def stats(self) -> dict:
+        pending = sum(u["pending"] for u in self._users.values())
+        return {
+            "running": self.running,
+            "queued": pending - self.running,
+            "users": len(self._users),
+            "max_concurrency": self.max_concurrency,
+            "per_user": self.per_user,
+        }
+
+
+pool = ImageJobPool()
+store = shared_image_store()
+# Clients keep their HTTP connections, so reuse them per API key.
+_clients = TTLCache(maxsize=256, ttl=3600)
+
+
+async def _resolve_api_key(user_id: int, api_key: str = None) -> str:
+    if api_key:
+        return api_key
+    from auth.keys import get_provider_key
+
+    for provider in KEY_PROVIDERS:
+        stored = await run_in_threadpool(get_provider_key, user_id, provider)
+        if stored:
+            return stored
+    raise HTTPException(status_code=400, detail="No Gemini API key given and none stored for this account.")
+
+
+def _client(api_key: str):
+    cache_key = hashlib.sha256(api_key.encode()).hexdigest()
+    cached = _clients.get(cache_key)
+    if cached is None:
+        try:
+            cached = make_client(api_key)
+        except ImportError:
+            raise HTTPException(status_code=500, detail="google-genai is not installed on the server.")
+        _clients.set(cache_key, cached)
+    return cached
+
+
+def _result(meta: dict, cached: bool) -> dict:
+    with open(meta["path"], "rb") as fh:
+        image_data = fh.read()
+    return {
+        "image_id": meta["key"],
+        "url": f"/img/images/{meta['key']}",
+        "model_id": meta["model_id"],
+        "mime_type": meta["mime_type"],
+        "cached": cached,
+        "image_base64": base64.b64encode(image_data).decode(),
+    }
+
+
+def gallery_owner(user_id: int) -> str:
+    return f"user-{user_id}"
+
+
+async def _produce(user_id: int, kind: str, key: str, prompt: str, model_id: str, api_key, call) -> dict:
+    """Image ``key`` from the store, or from ``call(client, types)`` within the pool limits."""
+    meta = await run_in_threadpool(store.get, key)
+    cached = meta is not None
+    if not cached:
+        client, types = _client(await _resolve_api_key(user_id, api_key))
+
+        async def job():
+            try:
+                return await call(client, types)
+            except HTTPException:
+                raise
+            except Exception as e:
+                raise HTTPException(status_code=502, detail=f"Image provider error: {str(e)}")
+
+        image_data, mime_type = await pool.run(user_id, job)
+        if not image_data:
+            raise HTTPException(status_code=502, detail="The model returned no image, try rephrasing the prompt.")
+        meta = await run_in_threadpool(store.put, key, image_data, mime_type,
+                                       model_id=model_id, prompt=prompt, type=kind)
+
+    await run_in_threadpool(store.add_to_gallery, gallery_owner(user_id), key, kind, prompt)
+    return await run_in_threadpool(_result, meta, cached)
+
+
+async def generate(user_id: int, prompt: str, model_id: str, api_key: str = None) -> dict:
+    return await _produce(user_id, "generated", store.key(prompt, model_id), prompt, model_id, api_key,
+                          lambda client, types: agenerate_image(client, types, prompt, model_id))
+
+
+async def edit(user_id: int, prompt: str, image_bytes: bytes, mime_type: str, model_id: str,
+               api_key: str = None) -> dict:
+    return await _produce(user_id, "edited", store.key(prompt, model_id, image_bytes), prompt, model_id, api_key,
+                          lambda client, types: aedit_image(client, types, prompt, image_bytes, mime_type, model_id))
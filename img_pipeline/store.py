@@ -0,0 +1,168 @@
+"""Content-addressed store for generated images, with a gallery per owner.
+
+An image is filed under a hash of what produced it (prompt, model and the
+input image for edits), so asking for the same thing again is a disk read
+instead of a Gemini call. Galleries are append-only JSON lines that point
+into the store, so they survive restarts and hold no image data. Kept
+free of app imports: the Streamlit script loads it as a top-level module.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+# The API's DATA_DIR (common/paths.py), repeated here to keep this module standalone.
+_DATA_DIR = os.getenv("DATA_DIR") or os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "var")
+IMG_STORE_DIR = os.getenv("IMG_STORE_DIR") or os.path.join(os.path.abspath(_DATA_DIR), "image_store")
+IMG_STORE_MAX_BYTES = int(os.getenv("IMG_STORE_MAX_BYTES", 1024 ** 3))
+
+EXTENSIONS = {"image/png": ".png", "image/webp": ".webp", "image/jpeg": ".jpg", "image/gif": ".gif"}
+
+
+class ImageStore:
+    """Images on disk by key; least recently used ones go once ``max_bytes`` is exceeded."""
+
+    def __init__(self, directory: str, max_bytes: int = IMG_STORE_MAX_BYTES):
+        self.directory = directory
+        self.objects_dir = os.path.join(directory, "objects")
+        self.galleries_dir = os.path.join(directory, "galleries")
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(prompt: str, model_id: str, input_image: bytes = None) -> str:
+        parts = {
+            "prompt": prompt.strip(),
+            "model_id": model_id,
+            "input_sha256": hashlib.sha256(input_image).hexdigest() if input_image is not None else None,
+        }
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.objects_dir, key[:2], f"{key}.json")
+
+    def get(self, key: str):
+        """Metadata of image ``key`` including its ``path``, or ``None``."""
+        if len(key) != 64 or not all(c in "0123456789abcdef" for c in key):
+            return None
+        try:
+            with open(self._meta_path(key), "r") as fh:
+                meta = json.load(fh)
+            # Bump mtime so eviction treats the entry as recently used.
+            os.utime(meta["path"])
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+        return meta
+
+    def read(self, key: str):
+        meta = self.get(key)
+        if meta is None:
+            return None, None
+        with open(meta["path"], "rb") as fh:
+            return fh.read(), meta["mime_type"]
+
+    def put(self, key: str, data: bytes, mime_type: str, **info) -> dict:
+        directory = os.path.dirname(self._meta_path(key))
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{key}{EXTENSIONS.get(mime_type, '.bin')}")
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp_path, path)
+
+        meta = {"key": key, "path": path, "mime_type": mime_type, "size": len(data),
+                "created_at": time.time(), **info}
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as fh:
+            json.dump(meta, fh)
+        os.replace(tmp_path, self._meta_path(key))
+        self._evict()
+        return meta
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            for dirpath, _, filenames in os.walk(self.objects_dir):
+                for name in filenames:
+                    if name.endswith((".json", ".tmp")):
+                        continue
+                    path = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                key = os.path.splitext(os.path.basename(path))[0]
+                for victim in (self._meta_path(key), path):
+                    try:
+                        os.remove(victim)
+                    except FileNotFoundError:
+                        pass
+                total -= size
+
+    # --- galleries ---------------------------------------------------------------
+
+    def _gallery_path(self, owner: str) -> str:
+        return os.path.join(self.galleries_dir, f"{hashlib.sha256(owner.encode()).hexdigest()[:32]}.jsonl")
+
+    def add_to_gallery(self, owner: str, key: str, kind: str, prompt: str):
+        line = json.dumps({"key": key, "type": kind, "prompt": prompt, "created_at": time.time()}) + "\n"
+        os.makedirs(self.galleries_dir, exist_ok=True)
+        with self._lock, open(self._gallery_path(owner), "a") as fh:
+            fh.write(line)
+
+    def gallery(self, owner: str, before: int = None, limit: int = 50):
+        """``(entries, next_before)``, newest first, from entries older than position ``before``.
+
+        Positions count from the oldest entry, so pages stay stable while new
+        images are added; ``next_before`` is ``None`` on the last page.
+        Images evicted from the store are left out.
+        """
+        try:
+            with open(self._gallery_path(owner), "r") as fh:
+                lines = fh.readlines()
+        except FileNotFoundError:
+            return [], None
+
+        entries = []
+        position = len(lines) if before is None else min(max(before, 0), len(lines))
+        while position > 0 and len(entries) < limit:
+            position -= 1
+            entry = json.loads(lines[position])
+            meta = self.get(entry["key"])
+            if meta is not None:
+                entries.append({**entry, "mime_type": meta["mime_type"], "path": meta["path"]})
+        return entries, position or None
+
+    def in_gallery(self, owner: str, key: str) -> bool:
+        try:
+            with open(self._gallery_path(owner), "r") as fh:
+                return any(json.loads(line)["key"] == key for line in fh)
+        except FileNotFoundError:
+            return False
+
+    def clear_gallery(self, owner: str):
+        try:
+            os.remove(self._gallery_path(owner))
+        except FileNotFoundError:
+            pass
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def shared_image_store() -> ImageStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ImageStore(IMG_STORE_DIR)
+        return _store
@@ -12,25 +12,37 @@ from routes import apikey as apikey_router
 from rag_agent_builder.backend.main import app as rag_app
 from sql_agent_builder.backend.main import app as sql_app
 from img_pipeline.fastapi_app import app as img_app
+from common.uploads import UploadSizeLimitMiddleware
+from common import preview_proxy
+from common.previews import shared_preview_supervisor
 
 
 app = FastAPI(title="Wednes AI - Unified Agent Builder")
 
+app.add_middleware(UploadSizeLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["*"]
+    allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"]
 )
 
 app.include_router(auth_router.router, prefix="/auth", tags=["Auth"])
 app.include_router(agent_router.router, tags=["Agent"])
 app.include_router(user_router.router, tags=["User"])
 app.include_router(apikey_router.router, tags=["API Keys"])
+# Previews of every builder, proxied (HTTP and websockets) to their processes.
+app.include_router(preview_proxy.router)
 from fastapi.staticfiles import StaticFiles
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
+@app.on_event("startup")
+def warm_preview_runner():
+    shared_preview_supervisor().warm_up()
+
+
 app.mount("/rag", rag_app)
 app.mount("/sql", sql_app)
 app.mount("/img", img_app)
@@ -1,13 +1,17 @@
 # backend/generator/codegen.py
 import os
-import re
 import json
 import traceback
 import logging
-import requests
-from jinja2 import Template, Environment, FileSystemLoader
 from ..state.session_store import get_session
 from ..utils.path_utils import get_agent_output_dir
+from ..utils.helpers import templates, SECTION_ORDER
+from common.agent_env import public_config, write_env
+from common.sections import SectionManifest
+from common.assembler import assemble, AssemblyError
+from common.build_cache import BuildCache
+from common.paths import data_path
+from common.llm_client import shared_llm_client
 
 logging.basicConfig(level=logging.INFO)
 
@@ -17,7 +21,12 @@ LLM_MODEL   = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
 
 assert LLM_API_KEY, "Missing GROQ_API_KEY in .env"
 
-SECTION_RE = re.compile(r"# === ([\w\-/\.]+\.j2) ===")
+llm_client = shared_llm_client(LLM_URL, LLM_API_KEY)
+
+SYSTEM_MESSAGE = "You are a senior Python engineer. Output only valid Python code."
+
+BUILD_CACHE_DIR = os.getenv("BUILD_CACHE_DIR") or data_path("rag_agent_builder", "build_cache")
+build_cache = BuildCache(BUILD_CACHE_DIR, max_bytes=int(os.getenv("BUILD_CACHE_MAX_BYTES", 64 * 1024 * 1024)))
 
 def _write_component(output_dir: str, section: str, code: str) -> None:
     file_map = {
@@ -39,12 +48,7 @@ def _write_component(output_dir: str, section: str, code: str) -> None:
     logging.warning(f"[skip] Unknown section: {section}")
 
 def _build_prompt(code_map: dict, system_prompt: str, source: dict) -> str:
-    struct_path = os.path.join(os.path.dirname(__file__), "../templates/combined/main.py.j2")
-    struct_path = os.path.abspath(struct_path)
-    
-    if not os.path.exists(struct_path):
-        raise FileNotFoundError(f"Missing template structure: {struct_path}")
-    structure = open(struct_path, "r").read()
+    structure = templates.raw("combined/main.py.j2")
 
     src_type = source.get("type", "unknown")
     src_human = {
@@ -86,106 +90,186 @@ Use: {src_human}
 ### Component Logic (use inline in main.py)
 {combined}
 """
-def render_agent(session_id: str) -> str:
+def _messages(prompt: str) -> list:
+    return [
+        {"role": "system", "content": SYSTEM_MESSAGE},
+        {"role": "user",   "content": prompt}
+    ]
+
+def _cache_key(prompt: str) -> str:
+    return build_cache.key(prompt=prompt, model=LLM_MODEL, system=SYSTEM_MESSAGE)
+
+def _generate_main(prompt: str, force: bool = False) -> str:
+    """``main.py`` for ``prompt``; ``force`` skips the cache and replaces its entry."""
+    key = _cache_key(prompt)
+    cached = None if force else build_cache.get(key)
+    if cached is not None:
+        logging.info(f"[build_cache] hit {key[:12]}")
+        return cached
+
+    main_code = llm_client.chat(_messages(prompt), model=LLM_MODEL).strip()
+    build_cache.put(key, main_code)
+    return main_code
+
+def _stream_main(prompt: str, force: bool = False):
+    """Yield ``main.py`` as it is generated, token deltas straight from the LLM."""
+    key = _cache_key(prompt)
+    cached = None if force else build_cache.get(key)
+    if cached is not None:
+        logging.info(f"[build_cache] hit {key[:12]}")
+        yield cached
+        return
+
+    chunks = []
+    for delta in llm_client.stream(_messages(prompt), model=LLM_MODEL):
+        chunks.append(delta)
+        yield delta
+
+    # Only reached once the LLM finished; an abandoned or broken stream is not cached.
+    build_cache.put(key, "".join(chunks).strip())
+
+def evict_cached_main(session_id: str) -> bool:
+    """Drop the cached ``main.py`` for the session's current configuration."""
+    _, _, prompt = _prepare_build(session_id)
+    return build_cache.delete(_cache_key(prompt))
+
+BUILD_MODES = {"llm", "template"}
+
+# Modules the skeleton imports that are provided by the rendered components.
+LOCAL_MODULES = {"source", "embedding_model", "vector_db", "llm", "system_prompt", "ui"}
+
+def _assemble_main(out_dir: str) -> str:
+    """Inline the session's components into the main.py skeleton without an LLM.
+
+    Raises ``AssemblyError`` for combinations the skeleton cannot host, e.g.
+    a vector store without ``bootstrap``.
+    """
+    with open(os.path.join(out_dir, "llm.py"), "r") as fh:
+        llm_code = fh.read()
+
+    components, llm_at = [], None
+    for entry in SectionManifest(out_dir).entries(SECTION_ORDER):
+        if entry["section"] == "ui":
+            continue  # the skeleton ships its own UI block
+        if entry["section"] in {"llm", "models"}:
+            # llm.py already combines the model and provider logic; it goes in once.
+            if llm_at is None:
+                llm_at = len(components)
+        else:
+            components.append(entry["code"])
+    components.insert(len(components) if llm_at is None else llm_at, llm_code)
+
+    skeleton = templates.render("combined", "main.py")
+    return assemble(skeleton, components, LOCAL_MODULES).strip()
+
+def _no_progress(stage: str, percent: int) -> None:
+    pass
+
+def _prepare_build(session_id: str):
+    """Render the components of a session and return ``(config, out_dir, prompt)``."""
+    config = get_session(session_id)
+
+    if not config:
+        raise ValueError("No session config found")
+
+    config.setdefault("llm", {}).update({
+        "type":       config.get("llm", {}).get("type")       or config.get("llm_provider"),
+        "api_key":    config.get("llm", {}).get("api_key")    or config.get("llm_key"),
+        "model_name": config.get("llm", {}).get("model_name") or config.get("llm_model"),
+    })
+    if not config["llm"]["api_key"]:
+        from auth.keys import get_session_provider_key
+        # For this build only; the session keeps no copy of stored keys.
+        config["llm"]["api_key"] = get_session_provider_key(session_id, config["llm"]["type"])
+
+    out_dir, _ = get_agent_output_dir(session_id)
+    manifest = SectionManifest(out_dir)
+    entries = manifest.entries(SECTION_ORDER)
+    if not entries and manifest.import_legacy():
+        entries = manifest.entries(SECTION_ORDER)
+    if not entries:
+        raise FileNotFoundError("No rendered components – render components first")
+
+    code_map: dict[str, str] = {}
+    for entry in entries:
+        sid = f"{entry['section']}_{entry['variant']}"
+        code_map[sid] = entry["code"]
+        _write_component(out_dir, sid, entry["code"])
+    manifest.materialize(SECTION_ORDER)
+
+    prov = config["llm"]["type"]
+    llm_logic = templates.render("llm", prov, config=config) \
+                if templates.has("llm", prov) else ""
+
+    model_name  = config["llm"]["model_name"]
+    model_logic = templates.render("models", model_name, config=config) \
+                  if templates.has("models", model_name) \
+                  else f'MODEL_NAME = "{model_name}"'
+
+    with open(os.path.join(out_dir, "llm.py"), "w") as fh:
+        fh.write(model_logic.rstrip() + "\n\n" + llm_logic.rstrip() + "\n")
+
+    prompt = _build_prompt(code_map, config.get("system_prompt", ""), config["source"])
+    return config, out_dir, prompt
+
+def _agent_secrets(config: dict) -> dict:
+    """Credentials the rendered components read from the environment."""
+    secrets = {"LLM_API_KEY": config["llm"]["api_key"]}
+    source = config.get("source", {})
+    if source.get("type") in {"postgres", "mysql"}:
+        secrets.update(DB_USER=source.get("user"), DB_PASSWORD=source.get("password"))
+    elif source.get("type") == "mongo":
+        secrets["MONGO_URI"] = source.get("uri")
+    if config.get("vector_store", {}).get("type") == "pinecone":
+        secrets["PINECONE_API_KEY"] = config["vector_store"].get("api_key")
+    if config.get("embedding", {}).get("type") == "openai":
+        secrets["OPENAI_API_KEY"] = None
+    return secrets
+
+def _finalize_build(config: dict, out_dir: str) -> None:
+    # Credentials go to .env only.
+    json.dump(public_config(config), open(os.path.join(out_dir, "config.json"), "w"), indent=2)
+    write_env(out_dir, {}, _agent_secrets(config))
+
+    reqs = {"python-dotenv", "requests"}
+    reqs |= {"streamlit"}             if config["ui"]["type"] == "streamlit" else {"gradio"}
+    reqs |= {"PyMuPDF"}               if config["source"]["type"] == "pdf" else set()
+    reqs |= {"pandas", "openpyxl"}    if config["source"]["type"] in {"csv", "xls", "xlsx"} else set()
+    reqs |= {"pymongo"}               if config["source"]["type"] == "mongo" else set()
+    reqs |= {"psycopg2-binary"}       if config["source"]["type"] == "postgres" else set()
+    reqs |= {"mysql-connector-python"}if config["source"]["type"] == "mysql" else set()
+    reqs |= {"sentence-transformers"} if config["embedding"]["type"] == "sentence_transformers" else {"openai"}
+    reqs |= {
+        "pinecone":  {"pinecone-client"},
+        "faiss":     {"faiss-cpu", "numpy"},
+        "qdrant":    {"qdrant-client"},
+        "milvus":    {"pymilvus"},
+        "chromadb":  {"chromadb"},
+    }.get(config["vector_store"]["type"], set())
+
+    open(os.path.join(out_dir, "requirements.txt"), "w") \
+        .writelines(sorted(pkg + "\n" for pkg in reqs))
+
+def render_agent(session_id: str, progress=_no_progress, mode: str = "llm", force: bool = False) -> str:
     try:
-        config = get_session(session_id)
-        
-        if not config:
-            raise ValueError("No session config found")
-
-        config.setdefault("llm", {}).update({
-            "type":       config.get("llm", {}).get("type")       or config.get("llm_provider"),
-            "api_key":    config.get("llm", {}).get("api_key")    or config.get("llm_key"),
-            "model_name": config.get("llm", {}).get("model_name") or config.get("llm_model"),
-        })
-
-        out_dir, _ = get_agent_output_dir(session_id)
-        all_path  = os.path.join(out_dir, "all.py")
-        
-        if not os.path.exists(all_path):
-            raise FileNotFoundError("Missing all.py – render components first")
-
-        code_map: dict[str, str] = {}
-        new_all: list[str] = []
-        cur, buf = None, []
-
-        def _flush():
-            if cur is None:
-                return
-            sid       = cur.replace(".j2", "").replace("/", "_")
-            rendered  = Template("".join(buf)).render(config=config)
-            marker    = f"# === {cur} ==="
-            new_all.extend([f"\n{marker}\n", rendered.rstrip(), "\n"])
-            code_map[sid] = rendered
-            _write_component(out_dir, sid, rendered)
-
-        with open(all_path, "r") as fh:
-            for line in fh:
-                m = SECTION_RE.match(line.strip())
-                if m:
-                    _flush()
-                    cur, buf = m.group(1), []
-                else:
-                    buf.append(line)
-            _flush()
-
-        with open(all_path, "w") as fh:
-            fh.writelines(new_all)
-
-        prov = config["llm"]["type"]
-        env_llm   = Environment(loader=FileSystemLoader("backend/templates/llm"))
-        env_model = Environment(loader=FileSystemLoader("backend/templates/models"))
-
-        llm_logic = env_llm.get_template(f"{prov}.j2").render(config=config) \
-                    if os.path.exists(f"backend/templates/llm/{prov}.j2") else ""
-
-        model_name  = config["llm"]["model_name"]
-        model_logic = env_model.get_template(f"{model_name}.j2").render(config=config) \
-                      if os.path.exists(f"backend/templates/models/{model_name}.j2") \
-                      else f'MODEL_NAME = "{model_name}"'
-
-        with open(os.path.join(out_dir, "llm.py"), "w") as fh:
-            fh.write(model_logic.rstrip() + "\n\n" + llm_logic.rstrip() + "\n")
-
-        prompt = _build_prompt(code_map, config.get("system_prompt", ""), config["source"])
-
-        resp = requests.post(
-            LLM_URL,
-            headers={"Authorization": f"Bearer {LLM_API_KEY}",
-                     "Content-Type": "application/json"},
-            json={
-                "model": LLM_MODEL,
-                "messages": [
-                    {"role": "system", "content": "You are a senior Python engineer. Output only valid Python code."},
-                    {"role": "user",   "content": prompt}
-                ]
-            },
-            timeout=60,
-        )
-        resp.raise_for_status()
-        main_code = resp.json()["choices"][0]["message"]["content"].strip()
+        progress("rendering components", 10)
+        config, out_dir, prompt = _prepare_build(session_id)
+
+        main_code = None
+        if mode == "template":
+            progress("assembling main.py", 30)
+            try:
+                main_code = _assemble_main(out_dir)
+            except AssemblyError as exc:
+                logging.warning(f"[render_agent] Template assembly failed, using LLM: {exc}")
+
+        if main_code is None:
+            progress("generating main.py", 30)
+            main_code = _generate_main(prompt, force)
         open(os.path.join(out_dir, "main.py"), "w").write(main_code)
 
-        json.dump(config, open(os.path.join(out_dir, "config.json"), "w"), indent=2)
-
-        reqs = {"python-dotenv", "requests"}
-        reqs |= {"streamlit"}             if config["ui"]["type"] == "streamlit" else {"gradio"}
-        reqs |= {"PyMuPDF"}               if config["source"]["type"] == "pdf" else set()
-        reqs |= {"pandas", "openpyxl"}    if config["source"]["type"] in {"csv", "xls", "xlsx"} else set()
-        reqs |= {"pymongo"}               if config["source"]["type"] == "mongo" else set()
-        reqs |= {"psycopg2-binary"}       if config["source"]["type"] == "postgres" else set()
-        reqs |= {"mysql-connector-python"}if config["source"]["type"] == "mysql" else set()
-        reqs |= {"sentence-transformers"} if config["embedding"]["type"] == "sentence_transformers" else {"openai"}
-        reqs |= {
-            "pinecone":  {"pinecone-client"},
-            "faiss":     {"faiss-cpu", "numpy"},
-            "qdrant":    {"qdrant-client"},
-            "milvus":    {"pymilvus"},
-            "chromadb":  {"chromadb"},
-        }.get(config["vector_store"]["type"], set())
-
-        open(os.path.join(out_dir, "requirements.txt"), "w") \
-            .writelines(sorted(pkg + "\n" for pkg in reqs))
+        progress("writing files", 90)
+        _finalize_build(config, out_dir)
 
         return out_dir
 
@@ -193,3 +277,34 @@ def render_agent(session_id: str) -> str:
         logging.error(f"[render_agent] Error: {exc}")
         traceback.print_exc()
         raise ValueError(f"Build failed: {exc}") from exc
+
+def stream_agent(session_id: str, force: bool = False):
+    """Build like ``render_agent`` but yield ``(event, data)`` pairs while main.py is written."""
+    try:
+        yield "progress", {"stage": "rendering components", "progress": 10}
+        config, out_dir, prompt = _prepare_build(session_id)
+
+        yield "progress", {"stage": "generating main.py", "progress": 30}
+        main_path = os.path.join(out_dir, "main.py")
+        with open(main_path, "w") as fh:
+            for delta in _stream_main(prompt, force):
+                fh.write(delta)
+                fh.flush()
+                yield "token", {"content": delta}
+
+        # The blocking path strips surrounding whitespace; keep main.py identical.
+        with open(main_path, "r") as fh:
+            main_code = fh.read()
+        if main_code != main_code.strip():
+            with open(main_path, "w") as fh:
+                fh.write(main_code.strip())
+
+        yield "progress", {"stage": "writing files", "progress": 90}
+        _finalize_build(config, out_dir)
+
+        yield "done", {"path": out_dir, "session_id": session_id}
+
+    except Exception as exc:
+        logging.error(f"[stream_agent] Error: {exc}")
+        traceback.print_exc()
+        yield "error", {"detail": f"Build failed: {exc}"}
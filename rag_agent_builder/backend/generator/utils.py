@@ -1,8 +1,6 @@
 from ..state.session_store import get_session
-from jinja2 import Environment, FileSystemLoader
-import os
-
-TEMPLATE_DIR = "backend/templates"
+from ..utils.helpers import templates
+from common.sections import SectionManifest
 
 def append_rendered_template(session_id: str, section: str, variant: str):
     config = get_session(session_id)
@@ -22,35 +20,6 @@ def append_rendered_template(session_id: str, section: str, variant: str):
             print(f"[skip] Not rendering model template – model_name missing.")
             return
 
-    env = Environment(loader=FileSystemLoader(TEMPLATE_DIR), trim_blocks=True, lstrip_blocks=True)
-    tpl = env.get_template(template_path)
-    rendered_code = tpl.render(config=config)
-
-    all_py_path = os.path.join(f"generated_agents/{session_id}", "all.py")
-    os.makedirs(os.path.dirname(all_py_path), exist_ok=True)
-
-    marker = f"# === {section}/{variant}.j2 ==="
-    if os.path.exists(all_py_path):
-        with open(all_py_path, "r") as f:
-            lines = f.readlines()
-
-        new_lines = []
-        inside = False
-        for line in lines:
-            if line.strip() == marker:
-                inside = True
-                continue
-            if inside and line.strip().startswith("# ==="):
-                inside = False
-                new_lines.append(line)
-                continue
-            if not inside:
-                new_lines.append(line)
-
-        with open(all_py_path, "w") as f:
-            f.writelines(new_lines)
+    rendered_code = templates.render(section, variant, config=config)
 
-    with open(all_py_path, "a") as f:
-        f.write(f"\n\n{marker}\n")
-        f.write(rendered_code)
-        f.write("\n")
+    SectionManifest(f"generated_agents/{session_id}").put(section, variant, rendered_code)
@@ -12,6 +12,7 @@ app = FastAPI(title="RAG Agent Builder")
 
 # Register all routers
 app.include_router(config_flow.router)
+app.include_router(config_flow.uploads_router, tags=["Config"])
 app.include_router(build.router)
 app.include_router(preview.router)
 app.include_router(download.router)
@@ -1,14 +1,17 @@
-from fastapi import APIRouter, Form, HTTPException
+from fastapi import APIRouter, Form, HTTPException, Request
+from fastapi.responses import JSONResponse
 from ..state.session_store import get_session, update_session
-from ..generator.codegen import render_agent
+from ..state.job_store import jobs
+from ..generator.codegen import render_agent, stream_agent, evict_cached_main, build_cache, BUILD_MODES
+from common.sse import sse_response
+from ..workers.tasks import build_agent_task
 
 router = APIRouter(prefix="/api", tags=["Builder"])
 
 FILE_BASED_SOURCES = {"pdf", "csv", "xls", "xlsx", "txt"}
 DB_BASED_SOURCES = {"sqlite", "postgres", "mysql", "mongo"}
 
-@router.post("/build/agent")
-def build_agent(session_id: str = Form(...)):
+def _validate_build_config(session_id: str) -> None:
     config = get_session(session_id)
     if not config:
         raise HTTPException(status_code=404, detail="No session found")
@@ -46,9 +49,15 @@ def build_agent(session_id: str = Form(...)):
 
     update_session(session_id, "llm", llm_conf)
 
-    for field in ["type", "api_key", "model_name"]:
+    for field in ["type", "model_name"]:
         if not llm_conf.get(field):
             missing.append(f"llm.{field}")
+    # A key stored on the account is looked up again at build time and never
+    # copied into the session.
+    if not llm_conf.get("api_key"):
+        from auth.keys import get_session_provider_key
+        if not get_session_provider_key(session_id, llm_conf.get("type")):
+            missing.append("llm.api_key")
 
     ui_type = config.get("ui", {}).get("type", "")
     if ui_type not in {"streamlit", "gradio"}:
@@ -57,12 +66,53 @@ def build_agent(session_id: str = Form(...)):
     if missing:
         raise HTTPException(status_code=400, detail=f"Missing required configuration: {missing}")
 
+@router.post("/build/agent")
+def build_agent(request: Request, session_id: str = Form(...), mode: str = Form("llm"),
+                force: bool = Form(False)):
+    """Queue a build; ``force`` regenerates main.py even if a cached one exists."""
+    if mode not in BUILD_MODES:
+        raise HTTPException(status_code=400, detail=f"Unsupported build mode: {mode}")
+    _validate_build_config(session_id)
+
+    job_id = jobs.create(session_id, options={"mode": mode, "force": force})
     try:
-        output_path = render_agent(session_id)
-        return {
-            "message": "Agent built successfully.",
-            "path": output_path,
-            "session_id": session_id
-        }
+        jobs.submit(job_id, render_agent, task=build_agent_task)
     except Exception as e:
+        jobs.update(job_id, status="failed", stage="failed", error=str(e))
         raise HTTPException(status_code=500, detail=f"Build failed: {str(e)}")
+
+    return JSONResponse(status_code=202, content={
+        "message": "Agent build queued.",
+        "job_id": job_id,
+        "session_id": session_id,
+        "status_url": str(request.url_for("get_build_status", job_id=job_id)),
+    })
+
+@router.get("/build/cache/stats")
+def get_build_cache_stats():
+    return build_cache.stats()
+
+@router.delete("/build/cache")
+def clear_build_cache():
+    return {"removed": build_cache.clear()}
+
+@router.delete("/build/cache/{session_id}")
+def evict_build_cache(session_id: str):
+    _validate_build_config(session_id)
+    try:
+        removed = evict_cached_main(session_id)
+    except (ValueError, FileNotFoundError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"removed": removed, "session_id": session_id}
+
+@router.get("/build/{job_id}")
+def get_build_status(job_id: str):
+    job = jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Build job not found")
+    return job
+
+@router.get("/build/{session_id}/stream")
+def stream_build(session_id: str, force: bool = False):
+    _validate_build_config(session_id)
+    return sse_response(stream_agent(session_id, force))
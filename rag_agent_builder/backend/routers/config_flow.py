@@ -1,6 +1,11 @@
 from fastapi import APIRouter, Form, UploadFile, File, HTTPException
-from ..state.session_store import update_session, get_session
+from ..state.session_store import update_session, update_session_many, get_session
 from ..utils.helpers import render_and_save_section
+from common.uploads import save_upload, TEXT_TYPES, EXCEL_TYPES
+from common.resumable import ResumableUploads, resumable_router
+from common.blobs import shared_blob_store
+from common.paths import data_path
+from starlette.concurrency import run_in_threadpool
 import os
 import logging
 from uuid import uuid4
@@ -37,30 +42,50 @@ def select_source_type(session_id: str = Form(...), source_type: str = Form(...)
 
     return {"message": f"Source type '{source_type}' recorded and template rendered."}
 
-@router.post("/source/upload")
-async def upload_source_file(session_id: str = Form(...), file: UploadFile = File(...)):
+def _source_upload_target(session_id: str, filename: str):
+    """Destination and accepted content types for the session's source file."""
     cfg = get_session(session_id)
     src_type = cfg.get("source", {}).get("type", "")
 
     if src_type not in {"pdf", "txt", "csv", "excel", "text_file"}:
         raise HTTPException(status_code=400, detail="Current source type does not support file upload.")
 
-    ext = os.path.splitext(file.filename)[1].lower()
+    ext = os.path.splitext(filename or "")[1].lower()
     if not ext:
         raise HTTPException(status_code=400, detail="File must have an extension.")
 
-    dest_dir, _ = get_agent_output_dir(session_id)
-    dest_path = os.path.join(dest_dir, f"data{ext}")
+    allowed = {"pdf": {"application/pdf"}, "excel": EXCEL_TYPES}.get(src_type, TEXT_TYPES)
 
-    with open(dest_path, "wb") as fh:
-        fh.write(await file.read())
+    dest_dir, _ = get_agent_output_dir(session_id)
+    return os.path.join(dest_dir, f"data{ext}"), allowed
 
-    update_session(session_id, "source_file", dest_path)
+def _use_source_file(session_id: str, meta: dict) -> dict:
+    update_session_many(session_id, {
+        "source_file": meta["path"],
+        "source_file_meta": {k: meta[k] for k in ("size", "sha256", "mime")},
+    })
 
     cfg = get_session(session_id)
-    render_and_save_section("source", _tpl_name("source", src_type), cfg, session_id)
+    render_and_save_section("source", _tpl_name("source", cfg["source"]["type"]), cfg, session_id)
 
-    return {"message": f"Uploaded to {dest_path} and template updated."}
+    return {"message": f"Uploaded to {meta['path']} and template updated."}
+
+@router.post("/source/upload")
+async def upload_source_file(session_id: str = Form(...), file: UploadFile = File(...)):
+    # Async only to stream the upload; session I/O and rendering run in the threadpool.
+    dest_path, allowed = await run_in_threadpool(_source_upload_target, session_id, file.filename)
+    meta = await save_upload(file, dest_path, allowed_types=allowed, blobs=shared_blob_store())
+    return await run_in_threadpool(_use_source_file, session_id, meta)
+
+# Resumable uploads for large source files: POST to create, HEAD for the
+# offset, PATCH chunks, then POST .../finalize.
+uploads_router = resumable_router(
+    ResumableUploads(data_path("rag_agent_builder", "uploads")),
+    "/api/source/uploads",
+    target=_source_upload_target,
+    complete=_use_source_file,
+    blobs=shared_blob_store(),
+)
 
 @router.post("/source/db")
 def configure_source_db(
@@ -170,13 +195,23 @@ def set_llm_provider(session_id: str = Form(...), provider: str = Form(...)):
     return {"message": f"LLM provider '{provider}' recorded. Awaiting credentials."}
 
 @router.post("/llm/credentials")
-def set_llm_credentials(session_id: str = Form(...), api_key: str = Form(...), model_name: str = Form(...)):
+def set_llm_credentials(session_id: str = Form(...), api_key: str = Form(None), model_name: str = Form(...)):
     cfg = get_session(session_id)
     llm_cfg = cfg.get("llm", {})
     if not llm_cfg.get("type"):
         raise HTTPException(status_code=400, detail="Set provider first")
 
-    llm_cfg.update({"api_key": api_key, "model_name": model_name})
+    if api_key:
+        llm_cfg["api_key"] = api_key
+    else:
+        # Use the key the owner saved under /apikeys for this provider. It is
+        # resolved at build time, the session keeps no copy.
+        from auth.keys import get_session_provider_key
+        if not get_session_provider_key(session_id, llm_cfg["type"]):
+            raise HTTPException(status_code=400, detail=f"No API key given or stored for {llm_cfg['type']}")
+        llm_cfg.pop("api_key", None)
+
+    llm_cfg["model_name"] = model_name
     update_session(session_id, "llm", llm_cfg)
 
     cfg = get_session(session_id)
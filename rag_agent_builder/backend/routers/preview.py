@@ -1,14 +1,13 @@
 import os
-import subprocess
-import time
 from fastapi import APIRouter, HTTPException
+from starlette.concurrency import run_in_threadpool
 from starlette.responses import JSONResponse
 from ..utils.path_utils import get_agent_output_dir
-from ..utils.process_utils import kill_process_on_port
+from common.previews import shared_preview_supervisor
 
 
 router = APIRouter()
-preview_processes = {}
+previews = shared_preview_supervisor()
 
 def sanitize_main_py(main_path: str):
     with open(main_path, "r") as f:
@@ -28,7 +27,7 @@ def detect_ui_framework(main_path: str) -> str:
     return "unknown"
 
 @router.post("/previews/{session_id}/start")
-def start_preview(session_id: str):
+async def start_preview(session_id: str):
     agent_path, _ = get_agent_output_dir(session_id)
     main_path = os.path.join(agent_path, "main.py")
 
@@ -37,50 +36,31 @@ def start_preview(session_id: str):
 
     sanitize_main_py(main_path)
 
-    # Kill previous process if exists
-    prev = preview_processes.get(session_id)
-    if prev and prev.poll() is None:
-        prev.terminate()
-
     ui = detect_ui_framework(main_path)
+    await run_in_threadpool(previews.start, session_id, "rag", agent_path, ui)
 
-    if ui == "streamlit":
-        kill_process_on_port(8501)
-        cmd = [
-            "streamlit", "run", "main.py",
-            "--server.port", "8501",
-            "--server.headless", "true"
-        ]
-        preview_url = "http://localhost:8501"
-
-    elif ui == "gradio":
-        cmd = ["python", "main.py"]
-        preview_url = "http://127.0.0.1:7860/"
-
-    else:
-        raise HTTPException(status_code=400, detail="Unknown UI framework in main.py")
-
-    # Log output to file
-    log_path = os.path.join(agent_path, "preview.log")
-    try:
-        with open(log_path, "w") as log_file:
-            process = subprocess.Popen(
-                cmd,
-                cwd=agent_path,
-                stdout=log_file,
-                stderr=log_file,
-                env=os.environ.copy()
-            )
-            preview_processes[session_id] = process
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to launch preview: {str(e)}")
-
-    time.sleep(2)
+    # Answer as soon as the app is serving rather than after a fixed delay.
+    if not await previews.wait_ready(session_id):
+        status = previews.status(session_id, "rag")
+        if status["status"] == "exited":
+            raise HTTPException(status_code=500, detail=f"Preview exited during startup, see {status['log_file']}")
+        return JSONResponse({"message": f"{ui.capitalize()} preview is still starting", **status}, status_code=202)
 
     return JSONResponse({
         "message": f"{ui.capitalize()} preview started",
-        "session_id": session_id,
-        "preview_url": preview_url,
-        "pid": process.pid,
-        "log_file": f"/{agent_path}/preview.log"
+        **previews.status(session_id, "rag"),
     })
+
+@router.get("/previews")
+def list_previews():
+    return previews.list("rag")
+
+@router.get("/previews/{session_id}")
+def preview_status(session_id: str):
+    return previews.status(session_id, "rag")
+
+@router.post("/previews/{session_id}/stop")
+def stop_preview(session_id: str):
+    if not previews.stop(session_id, "rag"):
+        raise HTTPException(status_code=404, detail="No preview for this session.")
+    return {"message": "Preview stopped", "session_id": session_id}
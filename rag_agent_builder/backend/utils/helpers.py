@@ -1,9 +1,17 @@
 import os
-from jinja2 import Environment, FileSystemLoader, TemplateNotFound
+from jinja2 import TemplateNotFound
 from ..utils.path_utils import get_agent_output_dir
+from common.sections import SectionManifest
+from common.templates import TemplateRegistry
 
 TEMPLATE_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../templates"))
 
+# Compiled once at import so broken templates fail the app at boot.
+templates = TemplateRegistry(TEMPLATE_ROOT, os.getenv("TEMPLATE_BYTECODE_CACHE_DIR")).load()
+
+# Order in which components are stitched into all.py / the build prompt.
+SECTION_ORDER = ["source", "embedding", "vector_store", "models", "llm", "prompt", "ui"]
+
 FILE_MAP = {
     "source":       "source.py",
     "embedding":    "embedding_model.py",
@@ -15,11 +23,10 @@ FILE_MAP = {
 }
 
 def render_and_save_section(section: str, template: str, config: dict, session_id: str):
-    env = Environment(loader=FileSystemLoader(TEMPLATE_ROOT), trim_blocks=True, lstrip_blocks=True)
     rel_path = f"{section}/{template}.j2"
 
     try:
-        tpl = env.get_template(rel_path)
+        tpl = templates.get(section, template)
     except TemplateNotFound as exc:
         raise FileNotFoundError(f"Template not found: {rel_path}") from exc
 
@@ -34,27 +41,6 @@ def render_and_save_section(section: str, template: str, config: dict, session_i
                 fh.write(rendered)
             break
 
-    marker = f"# === {section}/{template}.j2 ==="
-    all_path = os.path.join(sess_dir, "all.py")
-    new_lines, inside = [], False
-
-    if os.path.exists(all_path):
-        with open(all_path, "r") as fh:
-            for line in fh:
-                if line.strip() == marker:
-                    inside = True
-                    continue
-                if inside and line.strip().startswith("# ==="):
-                    inside = False
-                if not inside:
-                    new_lines.append(line)
-
-    if new_lines and not new_lines[-1].endswith("\n"):
-        new_lines[-1] += "\n"
-
-    new_lines.extend([f"\n{marker}\n", rendered])
-
-    with open(all_path, "w") as fh:
-        fh.writelines(new_lines)
+    SectionManifest(sess_dir).put(section, template, rendered)
 
     return rendered
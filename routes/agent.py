@@ -1,8 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from auth.database import get_db
-from auth.utils import get_current_user
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import and_, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from auth.database import get_async_db
+from auth.utils import get_current_user_id
 from auth import models
+from common.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, set_next_cursor
 from pydantic import BaseModel
 import uuid, os, datetime
 
@@ -13,14 +16,16 @@ class PipelineCreate(BaseModel):
     agent_type: str  # "rag" or "sql"
 
 @router.post("/pipelines", tags=["Agent"])
-def create_pipeline(payload: PipelineCreate, db: Session = Depends(get_db), user=Depends(get_current_user)):
-    existing = db.query(models.Pipeline).filter_by(user_id=user.id, name=payload.name).first()
+async def create_pipeline(payload: PipelineCreate, db: AsyncSession = Depends(get_async_db), user_id: int = Depends(get_current_user_id)):
+    existing = (await db.execute(
+        select(models.Pipeline.id).filter_by(user_id=user_id, name=payload.name)
+    )).first()
     if existing:
         raise HTTPException(status_code=400, detail="Agent name already exists")
 
     session_id = str(uuid.uuid4())
     new_pipeline = models.Pipeline(
-        user_id=user.id,
+        user_id=user_id,
         name=payload.name,
         agent_type=payload.agent_type,
         config="{}",
@@ -28,7 +33,12 @@ def create_pipeline(payload: PipelineCreate, db: Session = Depends(get_db), user
         created_at=datetime.datetime.utcnow()
     )
     db.add(new_pipeline)
-    db.commit()
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Lost a race with a concurrent create of the same name.
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Agent name already exists")
 
     builder_root = os.path.join(os.getcwd(), f"{payload.agent_type}_agent_builder")
     os.makedirs(os.path.join(builder_root, "generated_agents", session_id), exist_ok=True)
@@ -36,5 +46,34 @@ def create_pipeline(payload: PipelineCreate, db: Session = Depends(get_db), user
     return {"msg": "Agent created", "session_id": session_id}
 
 @router.get("/pipelines", tags=["Agent"])
-def get_user_pipelines(db: Session = Depends(get_db), user=Depends(get_current_user)):
-    return db.query(models.Pipeline).filter_by(user_id=user.id).all()
+async def get_user_pipelines(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = Query(None),
+    include_config: bool = Query(False),
+    db: AsyncSession = Depends(get_async_db),
+    user_id: int = Depends(get_current_user_id)
+):
+    """Newest first; pass the ``X-Next-Cursor`` response header back as ``cursor`` for the next page."""
+    P = models.Pipeline
+    columns = [P.id, P.user_id, P.name, P.agent_type, P.session_id, P.created_at]
+    if include_config:
+        columns.append(P.config)
+
+    query = select(*columns).where(P.user_id == user_id)
+    if cursor:
+        created_at, last_id = decode_cursor(cursor, 2)
+        try:
+            created_at = datetime.datetime.fromisoformat(created_at)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if not isinstance(last_id, int) or isinstance(last_id, bool):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.where(or_(
+            P.created_at < created_at,
+            and_(P.created_at == created_at, P.id < last_id),
+        ))
+    query = query.order_by(P.created_at.desc(), P.id.desc()).limit(limit + 1)
+
+    rows = [dict(row) for row in (await db.execute(query)).mappings()]
+    return set_next_cursor(response, rows, limit, lambda row: (row["created_at"].isoformat(), row["id"]))
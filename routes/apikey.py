@@ -1,33 +1,54 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from auth.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from auth.database import get_async_db
 from auth.models import ApiKey
-from auth.utils import get_current_user, encrypt_api_key, decrypt_api_key
+from auth.utils import get_current_user_id
+from auth.keys import encrypt_api_key, invalidate_provider_key
 from auth.schemas import APIKeyCreate, APIKeyOut
+from common.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, set_next_cursor
 
 router = APIRouter()
 
 @router.post("/apikeys", response_model=dict)
-def store_api_key(payload: APIKeyCreate, db: Session = Depends(get_db), user=Depends(get_current_user)):
+async def store_api_key(payload: APIKeyCreate, db: AsyncSession = Depends(get_async_db), user_id: int = Depends(get_current_user_id)):
     encrypted = encrypt_api_key(payload.key)
 
-    db_key = ApiKey(user_id=user.id, provider=payload.provider, key=encrypted)
+    db_key = ApiKey(user_id=user_id, provider=payload.provider, key=encrypted)
     db.add(db_key)
-    db.commit()
-    db.refresh(db_key)
+    await db.commit()
+    invalidate_provider_key(user_id, payload.provider)
 
     return {"msg": "API key stored successfully", "id": db_key.id}
 
 @router.get("/apikeys", response_model=list[APIKeyOut])
-def list_api_keys(db: Session = Depends(get_db), user=Depends(get_current_user)):
-    return db.query(ApiKey).filter(ApiKey.user_id == user.id).all()
+async def list_api_keys(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = Query(None),
+    db: AsyncSession = Depends(get_async_db),
+    user_id: int = Depends(get_current_user_id)
+):
+    query = select(ApiKey.id, ApiKey.provider, ApiKey.created_at).where(ApiKey.user_id == user_id)
+    if cursor:
+        (last_id,) = decode_cursor(cursor, 1)
+        if not isinstance(last_id, int) or isinstance(last_id, bool):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.where(ApiKey.id < last_id)
+    query = query.order_by(ApiKey.id.desc()).limit(limit + 1)
+
+    rows = [dict(row) for row in (await db.execute(query)).mappings()]
+    return set_next_cursor(response, rows, limit, lambda row: (row["id"],))
 
 @router.delete("/apikeys/{key_id}", response_model=dict)
-def delete_api_key(key_id: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
-    api_key = db.query(ApiKey).filter(ApiKey.id == key_id, ApiKey.user_id == user.id).first()
+async def delete_api_key(key_id: int, db: AsyncSession = Depends(get_async_db), user_id: int = Depends(get_current_user_id)):
+    api_key = (await db.execute(
+        select(ApiKey).where(ApiKey.id == key_id, ApiKey.user_id == user_id)
+    )).scalars().first()
     if not api_key:
         raise HTTPException(status_code=404, detail="API key not found")
 
-    db.delete(api_key)
-    db.commit()
+    await db.delete(api_key)
+    await db.commit()
+    invalidate_provider_key(user_id, api_key.provider)
     return {"msg": "API key deleted"}
@@ -1,41 +1,44 @@
 from fastapi import APIRouter, Depends, UploadFile, File, Form
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.responses import JSONResponse
 from auth import schemas, models
-from auth.database import get_db
-from auth.utils import get_current_user
+from auth.database import get_async_db
+from auth.utils import get_current_user, invalidate_user
+from common.uploads import save_upload, IMAGE_TYPES, IMAGE_EXTENSIONS
 import os
 from uuid import uuid4
 
 router = APIRouter()
 
 UPLOAD_DIR = "static/uploads"
+AVATAR_MAX_BYTES = int(os.getenv("AVATAR_MAX_BYTES", 5 * 1024 * 1024))
 
 @router.get("/users/me", tags=["User"], response_model=schemas.UserProfile)
-def get_profile(db: Session = Depends(get_db), user: models.User = Depends(get_current_user)):
+async def get_profile(user: models.User = Depends(get_current_user)):
     return user
 
 @router.put("/users/me", tags=["User"])
-def update_profile(
+async def update_profile(
     full_name: str = Form(...),
     phone_number: str = Form(None),
     bio: str = Form(None),
     file: UploadFile = File(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user: models.User = Depends(get_current_user)
 ):
     # Save uploaded image if provided
     if file:
-        ext = os.path.splitext(file.filename)[1]
-        filename = f"{uuid4().hex}{ext}"
-        filepath = os.path.join(UPLOAD_DIR, filename)
-        with open(filepath, "wb") as buffer:
-            buffer.write(file.file.read())
+        filepath = os.path.join(UPLOAD_DIR, f"{uuid4().hex}.upload")
+        meta = await save_upload(file, filepath, max_bytes=AVATAR_MAX_BYTES, allowed_types=IMAGE_TYPES)
+        # Name the file after its sniffed type, not the client-supplied extension.
+        filename = f"{meta['sha256'][:32]}{IMAGE_EXTENSIONS[meta['mime']]}"
+        os.replace(filepath, os.path.join(UPLOAD_DIR, filename))
         user.profile_picture_url = f"/{UPLOAD_DIR}/{filename}"
 
     user.full_name = full_name
     user.phone_number = phone_number
     user.bio = bio
-    db.commit()
+    await db.commit()
+    invalidate_user(user.email)
 
     return JSONResponse(content={"msg": "Profile updated successfully"})
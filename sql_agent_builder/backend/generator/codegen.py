@@ -1,10 +1,16 @@
 import os
+import json
 import traceback
 import logging
-import requests
 from dotenv import load_dotenv
 from ..state.session_store import get_session
 from ..utils.path_utils import get_agent_output_dir  # ✅ Path utility
+from ..utils.helpers import templates, SECTION_ORDER
+from common.agent_env import public_config, write_env
+from common.sections import SectionManifest
+from common.build_cache import BuildCache
+from common.paths import data_path
+from common.llm_client import shared_llm_client
 
 load_dotenv()
 
@@ -16,15 +22,16 @@ assert LLM_API_KEY, "Missing GROQ_API_KEY in .env"
 LLM_URL = os.getenv("GROQ_URL", "https://api.groq.com/openai/v1/chat/completions")
 LLM_MODEL = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
 
+llm_client = shared_llm_client(LLM_URL, LLM_API_KEY)
 
-def build_final_prompt(combined_code: str, system_prompt: str, ui: str, source_type: str, source_details: dict) -> str:
-    # ✅ Correct template path
-    template_path = "sql_agent_builder/backend/templates/combined/main_embed.py"
-    if not os.path.exists(template_path):
-        raise FileNotFoundError(f"Structure template not found at: {template_path}")
+SYSTEM_MESSAGE = "You are a senior Python engineer. Only output valid Python code—no markdown, no comments."
+
+BUILD_CACHE_DIR = os.getenv("BUILD_CACHE_DIR") or data_path("sql_agent_builder", "build_cache")
+build_cache = BuildCache(BUILD_CACHE_DIR, max_bytes=int(os.getenv("BUILD_CACHE_MAX_BYTES", 64 * 1024 * 1024)))
 
-    with open(template_path, "r") as f:
-        structure_reference = f.read()
+
+def build_final_prompt(combined_code: str, system_prompt: str, ui: str, source_type: str, source_details: dict) -> str:
+    structure_reference = templates.raw("combined/main_embed.py")
 
     source_info = ""
     if source_type == "csv":
@@ -65,81 +72,139 @@ Output: a valid main.py Python script.
 """
 
 
-def render_agent(session_id: str) -> str:
+def llm_messages(prompt: str) -> list:
+    return [
+        {"role": "system", "content": SYSTEM_MESSAGE},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def cache_key(prompt: str) -> str:
+    return build_cache.key(prompt=prompt, model=LLM_MODEL, system=SYSTEM_MESSAGE)
+
+
+def generate_main_code(prompt: str, force: bool = False) -> str:
+    """main.py for ``prompt``; ``force`` skips the cache and replaces its entry."""
+    key = cache_key(prompt)
+    cached = None if force else build_cache.get(key)
+    if cached is not None:
+        logging.info(f"[build_cache] hit {key[:12]}")
+        return cached
+
+    main_code = llm_client.chat(llm_messages(prompt), model=LLM_MODEL)
+    build_cache.put(key, main_code)
+    return main_code
+
+
+def stream_main_code(prompt: str, force: bool = False):
+    key = cache_key(prompt)
+    cached = None if force else build_cache.get(key)
+    if cached is not None:
+        logging.info(f"[build_cache] hit {key[:12]}")
+        yield cached
+        return
+
+    chunks = []
+    for delta in llm_client.stream(llm_messages(prompt), model=LLM_MODEL):
+        chunks.append(delta)
+        yield delta
+
+    # Only reached once the LLM finished; an abandoned or broken stream is not cached.
+    build_cache.put(key, "".join(chunks))
+
+
+def evict_cached_main(session_id: str) -> bool:
+    """Drop the cached main.py for the session's current configuration."""
+    _, _, prompt = prepare_build(session_id)
+    return build_cache.delete(cache_key(prompt))
+
+
+def _no_progress(stage: str, percent: int) -> None:
+    pass
+
+
+def prepare_build(session_id: str):
     config = get_session(session_id)
     output_dir, _ = get_agent_output_dir(session_id)  # ✅ use central path utility
-    all_py_path = os.path.join(output_dir, "all.py")
+
+    required = ["source_type", "source_details", "llm_provider", "llm_model", "system_prompt", "framework", "ui"]
+    missing = [r for r in required if r not in config or not config[r]]
+    if missing:
+        raise ValueError(f"Missing required configurations: {', '.join(missing)}")
+
+    if not config.get("llm_key"):
+        from auth.keys import get_session_provider_key
+        # For the agent's .env only: the session, the sections and llm.py keep
+        # no copy of stored keys, the rendered client reads LLM_API_KEY.
+        config["llm_key"] = get_session_provider_key(session_id, config["llm_provider"])
+
+    manifest = SectionManifest(output_dir)
+    if not manifest.entries():
+        manifest.import_legacy()
+    combined_code = manifest.combined(SECTION_ORDER)
+    if not combined_code:
+        raise FileNotFoundError("No rendered components – render components first")
+    manifest.materialize(SECTION_ORDER)
+
+    prompt = build_final_prompt(
+        combined_code=combined_code,
+        system_prompt=config["system_prompt"],
+        ui=config["ui"],
+        source_type=config["source_type"],
+        source_details=config["source_details"]
+    )
+    return config, output_dir, prompt
+
+
+def finalize_build(config: dict, output_dir: str) -> None:
+    with open(os.path.join(output_dir, "config.json"), "w") as f:
+        # Credentials go to .env only.
+        json.dump(public_config(config), f, indent=2)
+
+    details = config.get("source_details", {})
+    source_type = config.get("source_type")
+    settings, secrets = {}, {"LLM_API_KEY": config.get("llm_key")}
+    if source_type in ["postgres", "mysql"]:
+        settings.update(DB_HOST=details.get("db_host"), DB_NAME=details.get("db_name"),
+                        DB_PORT=details.get("db_port"))
+        secrets.update(DB_USER=details.get("db_user"), DB_PASSWORD=details.get("db_password"))
+    elif source_type == "sqlite":
+        settings["SQLITE_PATH"] = details.get("db_path")
+    elif source_type in ["csv", "excel"]:
+        settings["FILE_PATH"] = details.get("file_path")
+    write_env(output_dir, settings, secrets)
+
+    with open(os.path.join(output_dir, "requirements.txt"), "w") as f:
+        f.write("\n".join([
+            "streamlit",
+            "gradio",
+            "python-dotenv",
+            "pandas",
+            "psycopg2-binary",
+            "requests",
+            "openpyxl",
+            "sqlite3",
+            "mysql-connector-python",
+            "pandasai",
+            "langchain-groq"
+        ]))
+
+
+def render_agent(session_id: str, progress=_no_progress, force: bool = False) -> str:
+    progress("rendering components", 10)
 
     try:
-        required = ["source_type", "source_details", "llm_provider", "llm_model", "system_prompt", "framework", "ui"]
-        missing = [r for r in required if r not in config or not config[r]]
-        if missing:
-            raise ValueError(f"Missing required configurations: {', '.join(missing)}")
-
-        with open(all_py_path, "r") as f:
-            combined_code = f.read()
-
-        prompt = build_final_prompt(
-            combined_code=combined_code,
-            system_prompt=config["system_prompt"],
-            ui=config["ui"],
-            source_type=config["source_type"],
-            source_details=config["source_details"]
-        )
-
-        response = requests.post(
-            LLM_URL,
-            headers={"Authorization": f"Bearer {LLM_API_KEY}"},
-            json={
-                "model": LLM_MODEL,
-                "messages": [
-                    {"role": "system", "content": "You are a senior Python engineer. Only output valid Python code—no markdown, no comments."},
-                    {"role": "user", "content": prompt}
-                ]
-            },
-            timeout=60,
-        )
-        response.raise_for_status()
-        main_code = response.json()["choices"][0]["message"]["content"]
+        config, output_dir, prompt = prepare_build(session_id)
+
+        progress("generating main.py", 30)
+        main_code = generate_main_code(prompt, force)
 
         # Save generated files
+        progress("writing files", 90)
         with open(os.path.join(output_dir, "main.py"), "w") as f:
             f.write(main_code)
 
-        with open(os.path.join(output_dir, "config.json"), "w") as f:
-            import json
-            json.dump(config, f, indent=2)
-
-        with open(os.path.join(output_dir, ".env"), "w") as f:
-            f.write(f"LLM_API_KEY={config.get('llm_key', '')}\n")
-            details = config.get("source_details", {})
-            source_type = config.get("source_type")
-
-            if source_type in ["postgres", "mysql"]:
-                f.write(f"DB_HOST={details.get('db_host')}\n")
-                f.write(f"DB_NAME={details.get('db_name')}\n")
-                f.write(f"DB_USER={details.get('db_user')}\n")
-                f.write(f"DB_PASSWORD={details.get('db_password')}\n")
-                f.write(f"DB_PORT={details.get('db_port')}\n")
-            elif source_type == "sqlite":
-                f.write(f"SQLITE_PATH={details.get('db_path')}\n")
-            elif source_type in ["csv", "excel"]:
-                f.write(f"FILE_PATH={details.get('file_path')}\n")
-
-        with open(os.path.join(output_dir, "requirements.txt"), "w") as f:
-            f.write("\n".join([
-                "streamlit",
-                "gradio",
-                "python-dotenv",
-                "pandas",
-                "psycopg2-binary",
-                "requests",
-                "openpyxl",
-                "sqlite3",
-                "mysql-connector-python",
-                "pandasai",
-                "langchain-groq"
-            ]))
+        finalize_build(config, output_dir)
 
         return output_dir
 
@@ -147,3 +212,27 @@ def render_agent(session_id: str) -> str:
         logging.error(f"[render_agent] Agent generation failed: {str(e)}")
         traceback.print_exc()
         raise ValueError(f"Failed to generate agent: {traceback.format_exc()}")
+
+
+def stream_agent(session_id: str, force: bool = False):
+    """Build like render_agent but yield (event, data) pairs while main.py is written."""
+    try:
+        yield "progress", {"stage": "rendering components", "progress": 10}
+        config, output_dir, prompt = prepare_build(session_id)
+
+        yield "progress", {"stage": "generating main.py", "progress": 30}
+        with open(os.path.join(output_dir, "main.py"), "w") as f:
+            for delta in stream_main_code(prompt, force):
+                f.write(delta)
+                f.flush()
+                yield "token", {"content": delta}
+
+        yield "progress", {"stage": "writing files", "progress": 90}
+        finalize_build(config, output_dir)
+
+        yield "done", {"agent_path": output_dir, "session_id": session_id}
+
+    except Exception as e:
+        logging.error(f"[stream_agent] Agent generation failed: {str(e)}")
+        traceback.print_exc()
+        yield "error", {"detail": f"Failed to generate agent: {str(e)}"}
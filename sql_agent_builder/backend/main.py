@@ -20,6 +20,7 @@ def read_root():
 
 # Register all routers
 app.include_router(config_flow.router, prefix="/config", tags=["Config"])
+app.include_router(config_flow.uploads_router, prefix="/config", tags=["Config"])
 app.include_router(build.router, prefix="/build", tags=["Builder"])
 app.include_router(preview.router, prefix="/previews", tags=["Preview"])
 app.include_router(download.router, tags=["Download"])
@@ -1,67 +1,119 @@
-from fastapi import APIRouter, Form, HTTPException
+from fastapi import APIRouter, Form, HTTPException, Request
+from fastapi.responses import JSONResponse
 from ..state.session_store import get_session
-from ..generator.codegen import render_agent
+from ..state.job_store import jobs
+from ..generator.codegen import render_agent, stream_agent, evict_cached_main, build_cache
+from common.sse import sse_response
+from ..workers.tasks import build_agent_task
 import os
-from starlette.status import HTTP_200_OK, HTTP_400_BAD_REQUEST, HTTP_404_NOT_FOUND, HTTP_500_INTERNAL_SERVER_ERROR
+from starlette.status import HTTP_202_ACCEPTED, HTTP_400_BAD_REQUEST, HTTP_404_NOT_FOUND, HTTP_500_INTERNAL_SERVER_ERROR
 
 router = APIRouter(prefix="/api", tags=["Builder"])
 
+def validate_build_config(session_id: str) -> None:
+    config = get_session(session_id)
+    if not config:
+        raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail="No session found")
+
+    required_fields = ["source", "llm", "model", "framework", "ui"]
+    missing_fields = [field for field in required_fields if field not in config or not config[field]]
+
+    if missing_fields:
+        raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=f"Missing required configuration: {missing_fields}")
+
+    # Check if source details are properly configured
+    source_type = config.get("source_type")
+    source_details = config.get("source_details")
+    if not source_details:
+        raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail="Source details are missing")
+
+    if source_type in ["csv", "excel"]:
+        if "file_path" not in source_details:
+            raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail="Source file path is missing")
+
+    elif source_type in ["postgres", "mysql", "sqlite"]:
+        required_keys = ["db_host", "db_user", "db_password", "db_port", "db_name", "table_name"]
+        if source_type == "sqlite":
+            required_keys = ["db_path", "table_name"]
+
+        missing = [key for key in required_keys if not source_details.get(key)]
+        if missing:
+            raise HTTPException(
+                status_code=HTTP_400_BAD_REQUEST,
+                detail=f"Database credentials are incomplete: missing {missing}"
+            )
+
+    # Check if LLM configuration is complete; a key stored on the account is
+    # looked up again at build time and never copied into the session.
+    llm_key = config.get("llm_key")
+    if not llm_key and config.get("llm_provider"):
+        from auth.keys import get_session_provider_key
+        llm_key = get_session_provider_key(session_id, config["llm_provider"])
+    if not all([config.get("llm_provider"), llm_key, config.get("llm_model")]):
+        raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail="LLM configuration is incomplete")
+
+    # Check if UI is valid
+    if config.get("ui") not in ["streamlit", "gradio"]:
+        raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail="Invalid UI selection")
+
+
 @router.post("/build/agent")
-def build_agent(session_id: str = Form(...)):
+def build_agent(request: Request, session_id: str = Form(...), force: bool = Form(False)):
     try:
-        config = get_session(session_id)
-        if not config:
-            raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail="No session found")
-
-        required_fields = ["source", "llm", "model", "framework", "ui"]
-        missing_fields = [field for field in required_fields if field not in config or not config[field]]
-
-        if missing_fields:
-            raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=f"Missing required configuration: {missing_fields}")
-
-        # Check if source details are properly configured
-        source_type = config.get("source_type")
-        source_details = config.get("source_details")
-        if not source_details:
-            raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail="Source details are missing")
-
-        if source_type in ["csv", "excel"]:
-            if "file_path" not in source_details:
-                raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail="Source file path is missing")
-
-        elif source_type in ["postgres", "mysql", "sqlite"]:
-            required_keys = ["db_host", "db_user", "db_password", "db_port", "db_name", "table_name"]
-            if source_type == "sqlite":
-                required_keys = ["db_path", "table_name"]
-
-            missing = [key for key in required_keys if not source_details.get(key)]
-            if missing:
-                raise HTTPException(
-                    status_code=HTTP_400_BAD_REQUEST,
-                    detail=f"Database credentials are incomplete: missing {missing}"
-                )
-
-        # Check if LLM configuration is complete
-        if not all([config.get("llm_provider"), config.get("llm_key"), config.get("llm_model")]):
-            raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail="LLM configuration is incomplete")
-
-        # Check if UI is valid
-        if config.get("ui") not in ["streamlit", "gradio"]:
-            raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail="Invalid UI selection")
-
-        # Render the agent
-        agent_path = render_agent(session_id)
-        if not agent_path:
-            raise HTTPException(status_code=HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to build agent")
-
-        return {
-            "status_code": HTTP_200_OK,
-            "message": "Agent built successfully",
-            "agent_path": agent_path,
-            "session_id": session_id
-        }
+        validate_build_config(session_id)
+
+        # Queue the build; the client polls the status URL. ``force``
+        # regenerates main.py even if a cached one exists.
+        job_id = jobs.create(session_id, options={"force": force})
+        try:
+            jobs.submit(job_id, render_agent, task=build_agent_task)
+        except Exception as e:
+            jobs.update(job_id, status="failed", stage="failed", error=str(e))
+            raise
+
+        return JSONResponse(status_code=HTTP_202_ACCEPTED, content={
+            "status_code": HTTP_202_ACCEPTED,
+            "message": "Agent build queued",
+            "job_id": job_id,
+            "session_id": session_id,
+            "status_url": str(request.url_for("get_build_status", job_id=job_id)),
+        })
 
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {str(e)}")
+
+
+@router.get("/build/cache/stats")
+def get_build_cache_stats():
+    return build_cache.stats()
+
+
+@router.delete("/build/cache")
+def clear_build_cache():
+    return {"removed": build_cache.clear()}
+
+
+@router.delete("/build/cache/{session_id}")
+def evict_build_cache(session_id: str):
+    validate_build_config(session_id)
+    try:
+        removed = evict_cached_main(session_id)
+    except (ValueError, FileNotFoundError) as e:
+        raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=str(e))
+    return {"removed": removed, "session_id": session_id}
+
+
+@router.get("/build/{job_id}")
+def get_build_status(job_id: str):
+    job = jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail="Build job not found")
+    return job
+
+
+@router.get("/build/{session_id}/stream")
+def stream_build(session_id: str, force: bool = False):
+    validate_build_config(session_id)
+    return sse_response(stream_agent(session_id, force))
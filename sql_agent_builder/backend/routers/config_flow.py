@@ -1,51 +1,74 @@
 from fastapi import APIRouter, Form, HTTPException, UploadFile, File
-from ..state.session_store import update_session, get_session
+from ..state.session_store import update_session, update_session_many, get_session
 from ..utils.helpers import render_and_save_section
+from common.uploads import save_upload, TEXT_TYPES, EXCEL_TYPES
+from common.resumable import ResumableUploads, resumable_router
+from common.blobs import shared_blob_store
+from common.paths import data_path
+from starlette.concurrency import run_in_threadpool
 import os
 from urllib.parse import urlparse
-import shutil
 from ..utils.path_utils import get_agent_output_dir
 
 router = APIRouter()
 
 @router.post("/source")
 def set_source(session_id: str = Form(...), source_type: str = Form(...)):
-    update_session(session_id, "source_type", source_type)
-    update_session(session_id, "source", source_type)
+    update_session_many(session_id, {"source_type": source_type, "source": source_type})
     return {"message": f"Source type '{source_type}' set."}
 
+def _file_source_target(session_id: str, filename: str = None):
+    """Destination and accepted content types for a CSV/Excel source file."""
+    source_type = get_session(session_id).get("source_type")
+    if source_type not in ["csv", "excel"]:
+        raise HTTPException(status_code=400, detail="Resumable uploads need a CSV or Excel source type.")
+
+    output_path, _ = get_agent_output_dir(session_id)
+    filename = "data.csv" if source_type == "csv" else "data.xlsx"
+    return os.path.join(output_path, filename), TEXT_TYPES if source_type == "csv" else EXCEL_TYPES
+
+def _use_file_source(session_id: str, meta: dict) -> dict:
+    update_session(session_id, "source_details", {"file_path": os.path.basename(meta["path"])})
+    config = get_session(session_id)
+    render_and_save_section("source", config["source_type"], config, session_id)
+    return {"message": f"{config['source_type'].upper()} file uploaded and source.py rendered."}
+
+# Resumable CSV/Excel uploads: POST to create, HEAD for the offset, PATCH
+# chunks, then POST .../finalize.
+uploads_router = resumable_router(
+    ResumableUploads(data_path("sql_agent_builder", "uploads")),
+    "/source-details/uploads",
+    target=_file_source_target,
+    complete=_use_file_source,
+    blobs=shared_blob_store(),
+)
+
 @router.post("/source-details")
-def upload_source_details(
+async def upload_source_details(
     session_id: str = Form(...),
     file: UploadFile = File(None),
     db_uri: str = Form(None),
     db_name: str = Form(None),
     table_name: str = Form(None)
 ):
-    config = get_session(session_id)
+    # Async only to stream the upload; session I/O and rendering run in the threadpool.
+    config = await run_in_threadpool(get_session, session_id)
     source_type = config.get("source_type")
 
     if not source_type:
         raise HTTPException(status_code=400, detail="Source type must be set before uploading source details.")
 
-    output_path, _ = get_agent_output_dir(session_id)
-
     if source_type in ["csv", "excel"]:
         if not file:
             raise HTTPException(status_code=400, detail="File is required for CSV/Excel source.")
 
         try:
-            filename = "data.csv" if source_type == "csv" else "data.xlsx"
-            output_file = os.path.join(output_path, filename)
-
-            with open(output_file, "wb") as f_out:
-                shutil.copyfileobj(file.file, f_out)
-
-            update_session(session_id, "source_details", {"file_path": filename})
-            render_and_save_section("source", source_type, config, session_id)
-
-            return {"message": f"{source_type.upper()} file uploaded and source.py rendered."}
+            output_file, allowed = await run_in_threadpool(_file_source_target, session_id)
+            meta = await save_upload(file, output_file, allowed_types=allowed, blobs=shared_blob_store())
+            return await run_in_threadpool(_use_file_source, session_id, meta)
 
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error saving file: {str(e)}")
 
@@ -87,8 +110,7 @@ def upload_db_config(
 
 @router.post("/llm")
 def set_llm(session_id: str = Form(...), llm_provider: str = Form(...)):
-    update_session(session_id, "llm_provider", llm_provider)
-    update_session(session_id, "llm", llm_provider)
+    update_session_many(session_id, {"llm_provider": llm_provider, "llm": llm_provider})
 
     config = get_session(session_id)
     try:
@@ -115,8 +137,7 @@ def set_llm_key(session_id: str = Form(...), api_key: str = Form(...)):
 
 @router.post("/model")
 def set_model(session_id: str = Form(...), model: str = Form(...)):
-    update_session(session_id, "llm_model", model)
-    update_session(session_id, "model", model)
+    update_session_many(session_id, {"llm_model": model, "model": model})
 
     config = get_session(session_id)
     try:
@@ -1,13 +1,12 @@
 import os
-import subprocess
-import time
 from fastapi import APIRouter, HTTPException
+from starlette.concurrency import run_in_threadpool
 from starlette.responses import JSONResponse
 from ..utils.path_utils import get_agent_output_dir
-from ..utils.process_kill import kill_process_on_port
+from common.previews import shared_preview_supervisor
 
 router = APIRouter()
-preview_processes = {}
+previews = shared_preview_supervisor()
 
 def sanitize_main_py(main_path: str):
     with open(main_path, "r") as f:
@@ -27,7 +26,7 @@ def detect_ui_framework(main_path: str) -> str:
     return "unknown"
 
 @router.post("/previews/{session_id}/start")
-def start_preview(session_id: str):
+async def start_preview(session_id: str):
     agent_path, _ = get_agent_output_dir(session_id)
     main_path = os.path.join(agent_path, "main.py")
 
@@ -39,55 +38,31 @@ def start_preview(session_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to sanitize main.py: {str(e)}")
 
-    try:
-        ui = detect_ui_framework(main_path)
-
-        if ui == "streamlit":
-            port = 8501
-            preview_url = f"http://localhost:{port}"
-            cmd = [
-                "streamlit", "run", "main.py",
-                "--server.port", str(port),
-                "--server.headless", "true"
-            ]
-        elif ui == "gradio":
-            port = 7860
-            preview_url = f"http://127.0.0.1:{port}/"
-            cmd = ["python", "main.py"]
-        else:
-            raise HTTPException(status_code=400, detail="Unknown UI framework in main.py")
+    ui = detect_ui_framework(main_path)
+    await run_in_threadpool(previews.start, session_id, "sql", agent_path, ui)
 
-        # Kill any process on the desired port before launching
-        kill_process_on_port(port)
+    # Answer as soon as the app is serving rather than after a fixed delay.
+    if not await previews.wait_ready(session_id):
+        status = previews.status(session_id, "sql")
+        if status["status"] == "exited":
+            raise HTTPException(status_code=500, detail=f"Preview exited during startup, see {status['log_file']}")
+        return JSONResponse({"message": f"{ui.capitalize()} preview is still starting", **status}, status_code=202)
 
-        process = subprocess.Popen(
-            cmd,
-            cwd=agent_path,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        preview_processes[session_id] = process
+    return JSONResponse({
+        "message": f"{ui.capitalize()} preview started",
+        **previews.status(session_id, "sql"),
+    })
 
-        log_file = os.path.join(agent_path, "preview.log")
-        with open(log_file, "wb") as f:
-            f.write(f"[{ui.upper()} Preview] Session: {session_id}\n\n".encode())
-            # Start logging process output
-            subprocess.Popen(
-                ["tee", log_file],
-                stdin=process.stdout,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL
-            )
+@router.get("/previews")
+def list_previews():
+    return previews.list("sql")
 
-        time.sleep(2)
+@router.get("/previews/{session_id}")
+def preview_status(session_id: str):
+    return previews.status(session_id, "sql")
 
-        return JSONResponse({
-            "message": f"{ui.capitalize()} preview started",
-            "session_id": session_id,
-            "preview_url": preview_url,
-            "pid": process.pid,
-            "log_file": log_file
-        })
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to start preview: {str(e)}")
+@router.post("/previews/{session_id}/stop")
+def stop_preview(session_id: str):
+    if not previews.stop(session_id, "sql"):
+        raise HTTPException(status_code=404, detail="No preview for this session.")
+    return {"message": "Preview stopped", "session_id": session_id}
@@ -0,0 +1,6 @@
+from common.jobs import BuildJobStore
+from common.paths import data_path
+
+JOB_DIR = data_path("sql_agent_builder", "build_jobs")
+
+jobs = BuildJobStore("sql", JOB_DIR)
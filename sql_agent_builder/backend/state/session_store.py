@@ -1,23 +1,15 @@
-import json
-import os
+from common.paths import data_path
+from common.session_store import create_session_store
 
-# 🔁 Go two levels up from backend/state/ to reach builder root
-BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-SESSION_DIR = os.path.join(BASE_DIR, "session_data")
-os.makedirs(SESSION_DIR, exist_ok=True)
+SESSION_DIR = data_path("sql_agent_builder", "session_data")
 
-def _session_path(session_id: str) -> str:
-    return os.path.join(SESSION_DIR, f"{session_id}.json")
+_store = create_session_store("sql", SESSION_DIR)
 
 def update_session(session_id: str, key: str, value):
-    session = get_session(session_id)
-    session[key] = value
-    with open(_session_path(session_id), "w") as f:
-        json.dump(session, f)
+    _store.update(session_id, key, value)
+
+def update_session_many(session_id: str, values: dict):
+    _store.update_many(session_id, values)
 
 def get_session(session_id: str):
-    try:
-        with open(_session_path(session_id), "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {}
+    return _store.get(session_id)
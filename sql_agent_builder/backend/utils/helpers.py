@@ -1,28 +1,23 @@
 import os
-from jinja2 import Environment, FileSystemLoader
 from ..utils.path_utils import get_agent_output_dir
+from common.sections import SectionManifest
+from common.templates import TemplateRegistry
 
 TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "../templates")
 
-def render_and_save_section(section: str, template: str, config: dict, session_id: str):
-    env = Environment(
-        loader=FileSystemLoader(TEMPLATE_DIR),
-        trim_blocks=True,
-        lstrip_blocks=True,
-    )
+# Order in which components are stitched into all.py / the build prompt.
+SECTION_ORDER = ["source", "llm", "model", "framework", "prompt", "ui"]
+
+# Compiled once at import so broken templates fail the app at boot.
+templates = TemplateRegistry(TEMPLATE_DIR, os.getenv("TEMPLATE_BYTECODE_CACHE_DIR")).load()
 
-    tpl_path = f"{section}/{template}.j2"
-    tpl = env.get_template(tpl_path)
-    content = tpl.render(config=config)
+def render_and_save_section(section: str, template: str, config: dict, session_id: str):
+    content = templates.render(section, template, config=config)
 
     dest_dir, _ = get_agent_output_dir(session_id)
     os.makedirs(dest_dir, exist_ok=True)
 
-    all_py_path = os.path.join(dest_dir, "all.py")
-    with open(all_py_path, "a") as f:
-        f.write(f"\n\n# === {section}/{template}.j2 ===\n")
-        f.write(content)
-        f.write("\n")
+    SectionManifest(dest_dir).put(section, template, content)
 
     section_file_path = os.path.join(dest_dir, f"{section}.py")
     with open(section_file_path, "w") as f:
@@ -1,7 +1,7 @@
-from celery import Celery
+from celery_worker import celery_app
+from ..generator.codegen import render_agent
+from ..state.job_store import jobs
 
-celery_app = Celery("agent_builder", broker="redis://localhost:6379/0")
-
-@celery_app.task
-def example_task():
-    return "Task completed successfully!"
+@celery_app.task(name="sql.build_agent")
+def build_agent_task(job_id: str):
+    return jobs.run(job_id, render_agent)
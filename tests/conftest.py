@@ -0,0 +1,11 @@
+import os
+import tempfile
+
+# Settings the app modules read at import time.
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("GROQ_API_KEY", "test")
+os.environ.setdefault("PREVIEW_WARM_RUNNER", "0")
+os.environ.setdefault("GRADIO_ANALYTICS_ENABLED", "False")
+os.environ.setdefault("PREVIEW_PRELOAD_MODULES", "json")
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp())
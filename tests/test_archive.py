@@ -0,0 +1,56 @@
+import io
+import os
+import zipfile
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+import common.archive as archive
+from common.archive import ArchiveCache, archive_manifest, zip_download
+
+
+def _build(folder):
+    os.makedirs(folder / "sections")
+    (folder / "main.py").write_text("print('hi')\n")
+    (folder / "data.csv").write_text("a,b\n1,2\n")
+    (folder / ".env").write_text("GROQ_API_KEY=secret\n")
+    (folder / "preview.log").write_text("[STREAMLIT Preview]\n")
+    (folder / "sections" / "llm.py").write_text("api_key = 'secret'\n")
+    (folder / "data.csv.upload").write_text("partial")
+
+
+def test_archive_leaves_out_build_internals(tmp_path, monkeypatch):
+    folder = tmp_path / "agent"
+    _build(folder)
+    monkeypatch.setattr(archive, "_cache", ArchiveCache(str(tmp_path / "cache")))
+    app = FastAPI()
+
+    @app.get("/download")
+    def download(request: Request):
+        return zip_download(request, str(folder), "agent.zip")
+
+    response = TestClient(app).get("/download")
+    assert response.status_code == 200
+    names = zipfile.ZipFile(io.BytesIO(response.content)).namelist()
+    assert sorted(names) == ["data.csv", "main.py"]
+    # The response released its archive once sent.
+    assert not archive._cache._in_use
+
+
+def test_eviction_keeps_archives_in_use(tmp_path):
+    folder = tmp_path / "agent"
+    _build(folder)
+    cache = ArchiveCache(str(tmp_path / "cache"), max_bytes=0)
+    files, build_hash = archive_manifest(str(folder))
+    path = cache.acquire(str(folder), files, build_hash)
+    assert os.path.exists(path)
+
+    (folder / "main.py").write_text("print('changed')\n")
+    files, other_hash = archive_manifest(str(folder))
+    other = cache.acquire(str(folder), files, other_hash)
+    assert os.path.exists(path) and os.path.exists(other)
+
+    cache.release(path)
+    cache.release(other)
+    cache._evict()
+    assert not os.path.exists(path) and not os.path.exists(other)
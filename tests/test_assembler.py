@@ -0,0 +1,63 @@
+import ast
+
+import pytest
+
+from common.assembler import AssemblyError, assemble
+from rag_agent_builder.backend.generator.codegen import LOCAL_MODULES
+from rag_agent_builder.backend.utils.helpers import templates
+
+VECTOR_STORES = ["chromadb", "faiss", "milvus", "pinecone", "qdrant"]
+
+CONFIG = {
+    "source": {"type": "csv"},
+    "embedding": {"type": "sentence_transformers", "model_name": "all-MiniLM-L6-v2"},
+    "vector_store": {"url": "http://localhost:19530", "collection_name": "rag_test", "dimensions": 384,
+                     "distance_metric": "cosine", "environment": "us-east-1", "index_name": "rag-test"},
+    "llm": {"type": "groq", "model_name": "llama-3.3-70b-versatile"},
+    "llm_model": "llama-3.3-70b-versatile",
+    "system_prompt": "Answer from the documents.",
+}
+
+
+def _components(vector_store: str) -> list:
+    config = {**CONFIG, "vector_store": {**CONFIG["vector_store"], "type": vector_store}}
+    return [
+        templates.render("source", "csv", config=config),
+        templates.render("embedding", "sentence_transformers", config=config),
+        templates.render("vector_store", vector_store, config=config),
+        templates.render("models", "llama-3.3-70b-versatile", config=config)
+        + "\n" + templates.render("llm", "groq", config=config),
+        templates.render("prompt", "default", config=config),
+    ]
+
+
+@pytest.mark.parametrize("vector_store", VECTOR_STORES)
+def test_every_vector_store_assembles(vector_store):
+    code = assemble(templates.render("combined", "main.py"), _components(vector_store), LOCAL_MODULES)
+    compile(code, "main.py", "exec")
+
+    tree = ast.parse(code)
+    imported = {node.module for node in ast.walk(tree) if isinstance(node, ast.ImportFrom)}
+    assert not imported & LOCAL_MODULES
+    defined = [node.name for node in tree.body if isinstance(node, ast.FunctionDef)]
+    for name in ("bootstrap", "retrieve", "upsert_texts", "ask_llm", "load_data"):
+        assert defined.count(name) == 1, name
+
+
+def test_missing_component_raises():
+    skeleton = "from vector_db import retrieve\nprint(retrieve('q'))\n"
+    with pytest.raises(AssemblyError, match="retrieve"):
+        assemble(skeleton, ["def upsert_texts(texts):\n    pass\n"], {"vector_db"})
+
+
+def test_signature_mismatch_raises():
+    skeleton = "from source import load_data\nload_data(chunk_size=100)\n"
+    with pytest.raises(AssemblyError, match="load_data"):
+        assemble(skeleton, ["def load_data():\n    return []\n"], {"source"})
+
+
+def test_imports_are_hoisted_once():
+    skeleton = "import os\nfrom a import f\nprint(f())\n"
+    code = assemble(skeleton, ["import os\ndef f():\n    return os.sep\n"], {"a"})
+    assert code.count("import os") == 1
+    compile(code, "main.py", "exec")
@@ -0,0 +1,31 @@
+import ipaddress
+
+import pytest
+from starlette.requests import Request
+
+from auth import utils
+
+
+def _request(peer: str, forwarded: str = None) -> Request:
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "client": (peer, 1234), "headers": headers})
+
+
+@pytest.fixture(autouse=True)
+def proxies(monkeypatch):
+    monkeypatch.setattr(utils, "TRUSTED_PROXIES", [ipaddress.ip_network("10.0.0.0/8")])
+
+
+def test_direct_clients_cannot_spoof_their_address():
+    assert utils.client_ip(_request("203.0.113.7", "198.51.100.1")) == "203.0.113.7"
+
+
+def test_clients_behind_a_trusted_proxy_are_told_apart():
+    assert utils.client_ip(_request("10.0.0.2", "198.51.100.1")) == "198.51.100.1"
+    assert utils.client_ip(_request("10.0.0.2", "198.51.100.2")) == "198.51.100.2"
+
+
+def test_only_hops_added_by_trusted_proxies_count():
+    # The client forged the left-most entry; the right-most untrusted hop is the real one.
+    assert utils.client_ip(_request("10.0.0.2", "1.2.3.4, 198.51.100.1, 10.0.0.3")) == "198.51.100.1"
+    assert utils.client_ip(_request("10.0.0.2")) == "10.0.0.2"
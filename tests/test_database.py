@@ -0,0 +1,31 @@
+import pytest
+from sqlalchemy.engine import make_url
+
+from auth.database import _async_url
+
+
+def test_postgres_parameters_are_translated():
+    url, connect_args = _async_url(make_url(
+        "postgresql://u:p@db/app?sslmode=require&connect_timeout=5&application_name=api"
+    ))
+    assert url.drivername == "postgresql+asyncpg"
+    assert dict(url.query) == {}
+    assert connect_args == {"ssl": "require", "timeout": 5.0, "server_settings": {"application_name": "api"}}
+
+
+def test_unsupported_postgres_parameters_are_rejected():
+    with pytest.raises(RuntimeError, match="sslrootcert"):
+        _async_url(make_url("postgresql://u:p@db/app?sslmode=verify-full&sslrootcert=/ca.pem"))
+
+
+def test_mysql_uses_aiomysql():
+    url, connect_args = _async_url(make_url("mysql+mysqlconnector://u:p@db/app?charset=utf8mb4"))
+    assert url.drivername == "mysql+aiomysql"
+    assert url.query == {"charset": "utf8mb4"} and connect_args == {}
+    with pytest.raises(RuntimeError, match="ssl_disabled"):
+        _async_url(make_url("mysql://u:p@db/app?ssl_disabled=true"))
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(RuntimeError, match="ASYNC_DATABASE_URL"):
+        _async_url(make_url("mssql+pyodbc://u:p@db/app"))
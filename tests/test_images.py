@@ -0,0 +1,29 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from auth.utils import get_current_user_id
+from img_pipeline import fastapi_app, gemini, service
+from img_pipeline.store import ImageStore
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(gemini, "IMG_CLIENT", "stub")
+    monkeypatch.setattr(service, "store", ImageStore(str(tmp_path / "images")))
+    user = {"id": 1}
+    fastapi_app.app.dependency_overrides[get_current_user_id] = lambda: user["id"]
+    with TestClient(fastapi_app.app) as client:
+        client.user = user
+        yield client
+    fastapi_app.app.dependency_overrides.clear()
+
+
+def test_images_are_served_only_from_the_callers_gallery(client):
+    image_id = client.post("/generate", data={"prompt": "a red fox", "api_key": "k"}).json()["image_id"]
+
+    own = client.get(f"/images/{image_id}")
+    assert own.status_code == 200
+    assert own.headers["cache-control"].startswith("private")
+
+    client.user["id"] = 2
+    assert client.get(f"/images/{image_id}").status_code == 404
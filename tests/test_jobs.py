@@ -0,0 +1,46 @@
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from common.jobs import BuildJobStore
+
+
+def test_finished_jobs_expire(tmp_path, monkeypatch):
+    monkeypatch.setenv("SESSION_BACKEND", "file")
+    jobs = BuildJobStore("test", str(tmp_path / "jobs"), ttl=3600)
+    old = (datetime.utcnow() - timedelta(hours=2)).isoformat()
+
+    done = jobs.create("s1")
+    jobs.update(done, status="succeeded", finished_at=old)
+    recent = jobs.create("s1")
+    jobs.update(recent, status="failed", finished_at=datetime.utcnow().isoformat())
+    running = jobs.create("s1", created_at=old)
+    jobs.update(running, status="running")
+
+    for name in os.listdir(tmp_path / "jobs"):
+        os.utime(tmp_path / "jobs" / name, (time.time() - 7200,) * 2)
+    assert jobs.purge_finished() == 1
+    assert jobs.get(done) == {}
+    assert jobs.get(recent)["status"] == "failed"
+    assert jobs.get(running)["status"] == "running"
+
+
+def test_recently_finished_jobs_stay(tmp_path, monkeypatch):
+    monkeypatch.setenv("SESSION_BACKEND", "file")
+    jobs = BuildJobStore("test", str(tmp_path / "jobs"), ttl=3600)
+    job_id = jobs.create("s1")
+    jobs.run(job_id, lambda session_id, progress: {"ok": True})
+    assert jobs.purge_finished() == 0
+    assert jobs.get(job_id)["status"] == "succeeded"
+
+
+def test_broker_needs_a_shared_backend(tmp_path, monkeypatch):
+    monkeypatch.setenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
+    monkeypatch.setenv("SESSION_BACKEND", "file")
+    with pytest.raises(RuntimeError, match="SESSION_BACKEND"):
+        BuildJobStore("test", str(tmp_path / "jobs"))
+
+    monkeypatch.setenv("SESSION_BACKEND", "sql")
+    BuildJobStore("test", str(tmp_path / "jobs"))
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from common.llm_client import LLMClient
+
+
+def _completion(content: str) -> dict:
+    return {"choices": [{"message": {"content": content}}]}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is visible
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append({"client": self.client_address, "payload": payload,
+                                     "auth": self.headers["Authorization"]})
+        status, headers, body = self.server.responses.pop(0) if self.server.responses else \
+            (200, {}, json.dumps(_completion("ok")))
+        body = body.encode()
+        self.send_response(status)
+        for name, value in {"Content-Type": "application/json", **headers}.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.requests, server.responses = [], []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(server):
+    client = LLMClient(f"http://127.0.0.1:{server.server_port}/v1/chat/completions", "key",
+                       max_retries=2, http2=False)
+    yield client
+    client.close()
+
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+def test_requests_reuse_pooled_connections(server, client):
+    for _ in range(5):
+        assert client.chat(MESSAGES, model="m") == "ok"
+    assert len({r["client"] for r in server.requests}) == 1
+    assert server.requests[0]["payload"] == {"model": "m", "messages": MESSAGES}
+    assert server.requests[0]["auth"] == "Bearer key"
+
+
+def test_retries_rate_limits_and_server_errors(server, client):
+    server.responses += [(429, {"Retry-After": "0"}, "{}"), (503, {"Retry-After": "0"}, "{}")]
+    assert client.chat(MESSAGES, model="m", api_key="user-key") == "ok"
+    assert len(server.requests) == 3
+    assert server.requests[-1]["auth"] == "Bearer user-key"
+
+
+def test_gives_up_after_max_retries(server, client):
+    server.responses += [(500, {"Retry-After": "0"}, "{}")] * 3
+    with pytest.raises(httpx.HTTPStatusError):
+        client.chat(MESSAGES, model="m")
+    assert len(server.requests) == 3
+
+
+def test_client_errors_are_not_retried(server, client):
+    server.responses.append((401, {}, '{"error": "bad key"}'))
+    with pytest.raises(httpx.HTTPStatusError):
+        client.chat(MESSAGES, model="m")
+    assert len(server.requests) == 1
+
+
+def _sse(*deltas) -> str:
+    events = [json.dumps({"choices": [{"delta": {"content": d}}]}) for d in deltas]
+    return "".join(f"data: {e}\n\n" for e in events) + "data: [DONE]\n\n"
+
+
+def test_stream_yields_deltas(server, client):
+    server.responses.append((200, {"Content-Type": "text/event-stream"}, _sse("def ", "main", "():")))
+    assert list(client.stream(MESSAGES, model="m")) == ["def ", "main", "():"]
+    assert server.requests[0]["payload"]["stream"] is True
+
+
+def test_astream_yields_deltas_on_any_loop(server, client):
+    server.responses.append((429, {"Retry-After": "0"}, "{}"))
+    server.responses.append((200, {"Content-Type": "text/event-stream"}, _sse("a", "b")))
+
+    async def collect():
+        return [delta async for delta in client.astream(MESSAGES, model="m")]
+
+    assert asyncio.run(collect()) == ["a", "b"]
+    assert asyncio.run(client.achat(MESSAGES, model="m")) == "ok"
+
+
+def test_stream_cut_short_is_an_error(server, client):
+    events = json.dumps({"choices": [{"delta": {"content": "def "}}]})
+    server.responses.append((200, {"Content-Type": "text/event-stream"}, f"data: {events}\n\n"))
+    with pytest.raises(httpx.RemoteProtocolError):
+        list(client.stream(MESSAGES, model="m"))
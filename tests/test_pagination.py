@@ -0,0 +1,26 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from auth.utils import get_current_user_id
+from common.pagination import encode_cursor
+from main import app
+
+
+@pytest.fixture
+def client():
+    app.dependency_overrides[get_current_user_id] = lambda: 1
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.parametrize("path, cursor", [
+    ("/apikeys", encode_cursor("x")),
+    ("/apikeys", encode_cursor(True)),
+    ("/apikeys", encode_cursor(1, 2)),
+    ("/pipelines", encode_cursor("2024-01-01T00:00:00", "x")),
+    ("/pipelines", "not-a-cursor"),
+])
+def test_malformed_cursors_are_rejected(client, path, cursor):
+    response = client.get(path, params={"cursor": cursor})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
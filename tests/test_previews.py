@@ -0,0 +1,51 @@
+import asyncio
+import os
+
+import pytest
+
+from common.previews import PreviewSupervisor
+from common.templates import TemplateRegistry
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _gradio_agent(tmp_path, name: str) -> str:
+    """An agent directory whose main.py is the SQL builder's Gradio UI component."""
+    registry = TemplateRegistry(os.path.join(ROOT, "sql_agent_builder", "backend", "templates")).load()
+    agent_path = tmp_path / name
+    agent_path.mkdir()
+    (agent_path / "main.py").write_text(
+        "def load_data():\n    return None\n\n"
+        "def run_query(df, q):\n    return q\n\n"
+        + registry.render("ui", "gradio", config={"ui": "gradio"})
+        + "\n\nif __name__ == \"__main__\":\n    start_ui()\n"
+    )
+    return str(agent_path)
+
+
+def test_gradio_templates_leave_the_port_to_the_environment():
+    for builder in ("rag_agent_builder", "sql_agent_builder"):
+        for dirpath, _, filenames in os.walk(os.path.join(ROOT, builder, "backend", "templates")):
+            for fname in filenames:
+                if not fname.endswith(".j2"):
+                    continue
+                with open(os.path.join(dirpath, fname)) as fh:
+                    assert "server_port=" not in fh.read(), os.path.join(dirpath, fname)
+
+
+def test_two_gradio_previews_run_side_by_side(tmp_path):
+    pytest.importorskip("gradio")
+    supervisor = PreviewSupervisor(ports=range(18700, 18720))
+    try:
+        first = supervisor.start("one", "sql", _gradio_agent(tmp_path, "one"), "gradio")
+        second = supervisor.start("two", "sql", _gradio_agent(tmp_path, "two"), "gradio")
+        assert first["port"] != second["port"]
+
+        async def both_ready():
+            return await asyncio.gather(supervisor.wait_ready("one", deadline=60),
+                                        supervisor.wait_ready("two", deadline=60))
+
+        assert asyncio.run(both_ready()) == [True, True]
+        assert [p["status"] for p in supervisor.list()] == ["running", "running"]
+    finally:
+        supervisor.stop_all()
@@ -0,0 +1,86 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from rag_agent_builder.backend.generator import codegen
+from rag_agent_builder.backend.main import app
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # Agents are written under the working directory.
+    monkeypatch.chdir(tmp_path)
+    return TestClient(app)
+
+
+def _configure(client, session_id, embedding="all-MiniLM-L6-v2", vector_db="chromadb"):
+    steps = [
+        ("/api/source", {"source_type": "csv"}),
+        ("/api/embeddings/model", {"model_name": embedding}),
+        ("/api/vectordb/credentials/local", {"vector_db": vector_db, "url": "localhost:8000"}),
+        ("/api/llm/provider", {"provider": "groq"}),
+        ("/api/llm/credentials", {"api_key": "gsk-test", "model_name": "llama-3.3-70b-versatile"}),
+        ("/api/system-prompt", {"prompt": "Answer from the documents."}),
+        ("/api/ui", {"ui": "streamlit"}),
+    ]
+    for path, data in steps:
+        response = client.post(path, data={"session_id": session_id, **data})
+        assert response.status_code == 200, response.text
+
+
+@pytest.fixture
+def no_llm(monkeypatch):
+    def chat(*args, **kwargs):
+        raise AssertionError("template mode called the LLM")
+
+    monkeypatch.setattr(codegen.llm_client, "chat", chat)
+
+
+@pytest.mark.parametrize("embedding", ["all-MiniLM-L6-v2", "openai-text-embedding-3-small"])
+def test_template_build_leaves_no_jinja(client, no_llm, embedding):
+    _configure(client, "rag-build-1", embedding=embedding)
+    out_dir = codegen.render_agent("rag-build-1", mode="template")
+
+    _, _, prompt = codegen._prepare_build("rag-build-1")
+    assert "{{" not in prompt
+    for name in ("main.py", "embedding_model.py", "all.py"):
+        with open(os.path.join(out_dir, name)) as fh:
+            code = fh.read()
+        assert "{{" not in code and "{%" not in code, name
+    with open(os.path.join(out_dir, "main.py")) as fh:
+        main_code = fh.read()
+    compile(main_code, "main.py", "exec")
+    assert embedding in main_code
+
+
+@pytest.mark.parametrize("vector_db", ["chromadb", "faiss", "milvus", "qdrant"])
+def test_template_build_without_llm(client, no_llm, vector_db):
+    _configure(client, "rag-build-3", vector_db=vector_db)
+    out_dir = codegen.render_agent("rag-build-3", mode="template")
+    with open(os.path.join(out_dir, "main.py")) as fh:
+        main_code = fh.read()
+    compile(main_code, "main.py", "exec")
+    assert main_code.count("def ask_llm(") == 1
+
+
+def test_stored_key_is_not_kept_in_the_session(client, monkeypatch):
+    import auth.keys
+    from rag_agent_builder.backend.state.session_store import get_session
+
+    monkeypatch.setattr(auth.keys, "get_session_provider_key", lambda session_id, provider: "gsk-stored")
+    _configure(client, "rag-build-2")
+    response = client.post("/api/llm/credentials", data={"session_id": "rag-build-2",
+                                                          "model_name": "llama-3.3-70b-versatile"})
+    assert response.status_code == 200, response.text
+
+    assert "api_key" not in get_session("rag-build-2")["llm"]
+    out_dir = codegen.render_agent("rag-build-2", mode="template")
+    assert "gsk-stored" not in str(get_session("rag-build-2"))
+    leaked = []
+    for dirpath, _, filenames in os.walk(out_dir):
+        for name in filenames:
+            with open(os.path.join(dirpath, name), "rb") as fh:
+                if b"gsk-stored" in fh.read():
+                    leaked.append(os.path.relpath(os.path.join(dirpath, name), out_dir))
+    assert leaked == [".env"]
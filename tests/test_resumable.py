@@ -0,0 +1,50 @@
+import hashlib
+import os
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from common.blobs import BlobStore
+from common.resumable import ResumableUploads, resumable_router
+
+DATA = b"a,b\n1,2\n"
+SHA256 = hashlib.sha256(DATA).hexdigest()
+
+
+def _client(tmp_path):
+    blobs = BlobStore(str(tmp_path / "blobs"))
+    app = FastAPI()
+    app.include_router(resumable_router(
+        ResumableUploads(str(tmp_path / "uploads")),
+        "/uploads",
+        target=lambda session_id, filename: (str(tmp_path / "sessions" / session_id / "data.csv"), None),
+        complete=lambda session_id, meta: {"path": meta["path"]},
+        blobs=blobs,
+    ))
+    return TestClient(app)
+
+
+def _upload(client, session_id):
+    created = client.post("/uploads", data={"session_id": session_id, "filename": "data.csv", "sha256": SHA256},
+                          headers={"Upload-Length": str(len(DATA))})
+    if created.status_code == 200:
+        return created
+    upload_id = created.json()["upload_id"]
+    client.patch(f"/uploads/{upload_id}", content=DATA, headers={"Upload-Offset": "0"})
+    return client.post(f"/uploads/{upload_id}/finalize", data={"session_id": session_id})
+
+
+def test_known_hash_links_only_within_the_same_session(tmp_path):
+    client = _client(tmp_path)
+    assert _upload(client, "alice").status_code == 200
+
+    # Alice re-sending the same file skips the transfer.
+    again = client.post("/uploads", data={"session_id": "alice", "filename": "data.csv", "sha256": SHA256},
+                        headers={"Upload-Length": str(len(DATA))})
+    assert again.status_code == 200 and again.json()["deduplicated"]
+
+    # Bob knowing the hash is not enough: he has to send the bytes.
+    probe = client.post("/uploads", data={"session_id": "bob", "filename": "data.csv", "sha256": SHA256},
+                        headers={"Upload-Length": str(len(DATA))})
+    assert probe.status_code == 201
+    assert not os.path.exists(tmp_path / "sessions" / "bob" / "data.csv")
@@ -0,0 +1,42 @@
+import os
+import signal
+import time
+
+import pytest
+
+from common.runner import WarmRunner
+
+
+@pytest.fixture
+def runner(tmp_path):
+    runner = WarmRunner(str(tmp_path / "runner.sock"), start_timeout=10)
+    yield runner
+    runner.stop()
+
+
+def _spawn(runner, tmp_path, body: str):
+    script = tmp_path / "main.py"
+    script.write_text(body)
+    process = runner.spawn(["python", "main.py"], str(tmp_path), {}, str(tmp_path / "preview.log"))
+    assert process is not None
+    return process
+
+
+def test_exit_codes_are_pushed_and_poll_does_no_io(runner, tmp_path):
+    process = _spawn(runner, tmp_path, "import time, sys\ntime.sleep(0.3)\nsys.exit(3)\n")
+    runner.request = None  # any socket round trip from poll() would now fail
+    assert process.poll() is None
+    assert process.wait(timeout=5) == 3
+
+
+def test_previews_count_as_exited_once_their_runner_is_gone(runner, tmp_path):
+    process = _spawn(runner, tmp_path, "import time\ntime.sleep(60)\n")
+    runner.stop()
+    runner.start()
+    assert process.poll() is None
+
+    os.kill(process.pid, signal.SIGKILL)
+    give_up = time.monotonic() + 5
+    while process.poll() is None and time.monotonic() < give_up:
+        time.sleep(0.05)
+    assert process.poll() == -1
@@ -0,0 +1,72 @@
+import threading
+
+import fakeredis
+import pytest
+from sqlalchemy import create_engine
+
+from common.session_store import FileSessionStore, RedisSessionStore, SQLSessionStore
+
+
+@pytest.fixture(params=["file", "sql", "redis"])
+def store(request, tmp_path):
+    if request.param == "file":
+        yield FileSessionStore(str(tmp_path / "sessions"))
+    elif request.param == "sql":
+        engine = create_engine(f"sqlite:///{tmp_path / 'sessions.db'}")
+        yield SQLSessionStore("test", engine=engine)
+        engine.dispose()
+    else:
+        yield RedisSessionStore("test", url=None, client=fakeredis.FakeRedis())
+
+
+def test_missing_session_is_empty(store):
+    assert store.get("nope") == {}
+
+
+def test_updates_merge(store):
+    store.update("s1", "source", {"type": "csv"})
+    store.update_many("s1", {"ui": "gradio", "llm": "groq"})
+    store.update("s1", "ui", "streamlit")
+    assert store.get("s1") == {"source": {"type": "csv"}, "ui": "streamlit", "llm": "groq"}
+    assert store.get("s2") == {}
+
+
+def test_returned_sessions_are_copies(store):
+    store.update("s1", "source", {"type": "csv"})
+    store.get("s1")["source"]["type"] = "pdf"
+    assert store.get("s1") == {"source": {"type": "csv"}}
+
+
+def test_concurrent_updates_are_not_lost(store):
+    def worker(n):
+        for i in range(10):
+            store.update("s1", f"k{n}-{i}", i)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(store.get("s1")) == 80
+
+
+def test_delete(store):
+    store.update("s1", "ui", "gradio")
+    store.delete("s1")
+    store.delete("s1")
+    assert store.get("s1") == {}
+
+
+def test_purge_deletes_matching_sessions(store):
+    store.update_many("s1", {"status": "succeeded"})
+    store.update_many("s2", {"status": "running"})
+    assert store.purge(lambda data: data.get("status") == "succeeded") == 1
+    assert store.get("s1") == {}
+    assert store.get("s2") == {"status": "running"}
+
+
+def test_file_store_drops_idle_locks(tmp_path):
+    store = FileSessionStore(str(tmp_path / "sessions"))
+    for n in range(100):
+        store.update(f"s{n}", "ui", "gradio")
+    assert len(store._locks) == 0
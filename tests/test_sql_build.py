@@ -0,0 +1,71 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from sql_agent_builder.backend.generator import codegen
+from sql_agent_builder.backend.main import app
+from sql_agent_builder.backend.state.session_store import get_session
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # Agents are written under the working directory; main.py comes from a canned LLM.
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(codegen.llm_client, "chat", lambda messages, model=None: "print('agent')\n")
+    return TestClient(app)
+
+
+def _configure(client, session_id, api_key=None):
+    steps = [("/config/source", {"source_type": "csv"})]
+    steps += [("/config/llm", {"llm_provider": "groq"})]
+    if api_key:
+        steps += [("/config/llm-key", {"api_key": api_key})]
+    steps += [
+        ("/config/model", {"model": "llama-3.3-70b-versatile"}),
+        ("/config/system-prompt", {"prompt": "Answer from the table."}),
+        ("/config/framework", {"framework": "sql_query_file"}),
+        ("/config/ui", {"ui": "streamlit"}),
+    ]
+    for path, data in steps:
+        response = client.post(path, data={"session_id": session_id, **data})
+        assert response.status_code == 200, response.text
+    response = client.post("/config/source-details", data={"session_id": session_id},
+                           files={"file": ("data.csv", b"a,b\n1,2\n", "text/csv")})
+    assert response.status_code == 200, response.text
+
+
+def _agent_files(out_dir):
+    for dirpath, _, filenames in os.walk(out_dir):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            with open(path, "rb") as fh:
+                yield os.path.relpath(path, out_dir), fh.read().decode(errors="replace")
+
+
+def test_stored_key_only_reaches_the_env_file(client, monkeypatch):
+    import auth.keys
+
+    monkeypatch.setattr(auth.keys, "get_session_provider_key", lambda session_id, provider: "gsk-stored")
+    _configure(client, "sql-build-1")
+    out_dir = codegen.render_agent("sql-build-1")
+
+    assert "gsk-stored" not in str(get_session("sql-build-1"))
+    leaked = [name for name, content in _agent_files(out_dir) if "gsk-stored" in content]
+    assert leaked == [".env"]
+
+
+def test_download_ships_the_env_template(client):
+    import io
+    import zipfile
+
+    _configure(client, "sql-build-2", api_key="gsk-typed")
+    codegen.render_agent("sql-build-2")
+
+    response = client.get("/builds/sql-build-2/download")
+    assert response.status_code == 200
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert ".env" not in archive.namelist()
+    example = archive.read(".env.example").decode()
+    assert "LLM_API_KEY=\n" in example and "FILE_PATH=data.csv\n" in example
+    assert not any(b"gsk-typed" in archive.read(name) for name in archive.namelist())